@@ -12,6 +12,18 @@ from datetime import datetime
 from bluezero import adapter
 from bluezero import peripheral
 from bluezero import async_tools
+from gi.repository import GLib
+
+from navicap_ipc import ObstacleReceiver, SOCKET_PATH
+from navicap_watch import FileWatcher
+from navicap_classes import load_classes, normalize
+import navicap_proto
+from navicap_notify import NotifyScheduler, MIN_INTERVAL as NOTIFY_MIN_INTERVAL
+from navicap_cfgstore import ConfigStore
+from navicap_gatt import GattValue, notify as gatt_notify
+from navicap_centrals import CentralRegistry, address_from_path
+from navicap_log import EventLog, LOG_DIR, DEBUG
+from navicap_metrics import METRICS, DIAG_EVERY, pack_diag, serve as serve_metrics
 
 # ==================== Defaults / estado base ====================
 DEFAULT_CATEGORIES = [
@@ -35,12 +47,26 @@ CURRENT_CFG = {
 
 CONFIG_PATH = os.path.expanduser('~/navicap/config.json')
 OBSTACLE_FILE = os.path.expanduser('~/navicap/obstacle.json')
+# Sondear obstacle.json ademas del socket (solo para detectores viejos sin IPC)
+OBSTACLE_FILE_WATCH = os.getenv('NAVICAP_OBSTACLE_FILE_WATCH', '0') == '1'
+
+# Eventos BLE (notify, config, conexiones) con buffer y rotacion
+_event_log = EventLog(os.path.join(LOG_DIR, 'ble_events.log'))
+_last_notify_key = None
+
+# Centrales conectados y caracteristicas con notify activo (varios telefonos a la vez)
+_centrals = CentralRegistry()
 
 # ==================== UUIDs ====================
 SERVICE_UUID       = '12345678-1234-1234-1234-123456789abc'
 OBSTACLE_CHAR_UUID = '87654321-4321-4321-4321-cba987654321'  # READ + NOTIFY
 CONFIG_CHAR_UUID   = '11111111-2222-3333-4444-555555555555'  # WRITE (app -> Pi)
 CONFIG_STATE_UUID  = '22222222-3333-4444-5555-666666666666'  # READ + NOTIFY (Pi -> app)
+OBSTACLE_BIN_UUID  = '87654321-4321-4321-4321-cba987654322'  # READ + NOTIFY, formato navicap_proto
+DIAG_CHAR_UUID     = '87654321-4321-4321-4321-cba987654323'  # READ, navicap_metrics.pack_diag
+
+# Caracteristica de diagnostico (latencias, fps, reaperturas) para ver en terreno
+BLE_DIAG = os.getenv('NAVICAP_BLE_DIAG', '0') == '1'
 
 # ==================== Obstacles: estado y watcher ====================
 _last_obstacle_json = {
@@ -49,8 +75,69 @@ _last_obstacle_json = {
     "traffic": "unknown",
     "ts": datetime.utcnow().isoformat() + "Z",
 }
-_obstacle_chr_obj = None
 _last_ob_file_mtime = 0.0
+_obstacle_rx = None
+
+# Formato binario (navicap_proto): class id segun el orden de obj.names
+try:
+    _CLASSES = load_classes()
+except OSError:
+    _CLASSES = []
+_CLASS_IDS = navicap_proto.class_index(_CLASSES)
+_session_t0 = time.monotonic()
+_obstacle_bin_seq = 0
+_last_obstacle_bin = navicap_proto.encode_obstacle("ready", 0.0, "unknown", None, 0, 0, _CLASS_IDS)
+
+# Valores GATT codificados una vez por cambio (lecturas, notify y heartbeat los reusan)
+_obstacle_val = GattValue(json.dumps(_last_obstacle_json, ensure_ascii=False).encode('utf-8'))
+_obstacle_bin_val = GattValue(_last_obstacle_bin)
+
+# Ultimo resumen de metricas del detector ({"diag": ...} por el socket)
+_detector_diag = None
+_detector_diag_t = 0.0
+_diag_val = GattValue(pack_diag(METRICS, None, 0.0))
+
+
+def _on_obstacle_datagram(_fd, _cond):
+    """GLib IO watch: llego uno o mas datagramas del detector."""
+    global _detector_diag, _detector_diag_t
+    try:
+        now = time.monotonic()
+        obstacles = []
+        for m in _obstacle_rx.drain():
+            if "diag" in m:
+                _detector_diag, _detector_diag_t = m["diag"], now
+                continue
+            if "t_sent" in m:
+                METRICS.observe("ipc", now - float(m["t_sent"]))
+            obstacles.append(m)
+        if obstacles:
+            # Solo importa el estado mas nuevo
+            data = obstacles[-1]
+            METRICS.inc("obstacles_coalesced", len(obstacles) - 1)
+            conf = data.get('confidence')
+            publish_obstacle(
+                str(data.get('obstacle', 'unknown')),
+                float(data.get('distance', 0.0)),
+                str(data.get('traffic', 'unknown')),
+                float(conf) if conf is not None else None,
+                t_frame=data.get('t_frame'),
+            )
+    except Exception as e:
+        print(f"[BLE] ERROR leyendo socket de obstaculos: {e}")
+    return True
+
+
+def _start_obstacle_socket() -> bool:
+    global _obstacle_rx
+    try:
+        _obstacle_rx = ObstacleReceiver(SOCKET_PATH)
+    except OSError as e:
+        print(f"[BLE] No se pudo abrir {SOCKET_PATH} ({e}), usando obstacle.json")
+        return False
+    GLib.io_add_watch(_obstacle_rx.fileno(), GLib.IO_IN, _on_obstacle_datagram)
+    print(f"[BLE] Socket de obstaculos activo en: {SOCKET_PATH}")
+    return True
 
 
 def _poll_obstacle_file(_unused=None):
@@ -88,8 +175,9 @@ def _poll_obstacle_file(_unused=None):
         obstacle = str(data.get('obstacle', 'unknown'))
         distance = float(data.get('distance', 0.0))
         traffic = str(data.get('traffic', 'unknown'))
+        conf = data.get('confidence')
 
-        publish_obstacle(obstacle, distance, traffic)
+        publish_obstacle(obstacle, distance, traffic, float(conf) if conf is not None else None)
 
         print(f"[BLE] obstacle.json -> NOTIFY: {obstacle} @ {distance:.2f} m (traffic={traffic})", flush=True)
 
@@ -100,21 +188,33 @@ def _poll_obstacle_file(_unused=None):
     return True
 
 def _obstacle_read_cb():
-    """Devuelve el ltimo JSON de obstaculo como bytes."""
-    data = json.dumps(_last_obstacle_json, ensure_ascii=False)
-    return list(data.encode("utf-8"))
+    """Devuelve el ultimo JSON de obstaculo (solo si no se pudo enlazar _obstacle_val)."""
+    return _obstacle_val.as_list()
 
 
 def _obstacle_notify_cb(notifying, characteristic):
-    """Guarda el characteristic para poder llamar set_value cuando haya notify."""
-    global _obstacle_chr_obj
-    _obstacle_chr_obj = characteristic if notifying else None
+    """Guarda el characteristic para poder notificar (BlueZ avisa OFF solo sin suscriptores)."""
+    _centrals.set_notifying('obstacle', characteristic, notifying)
     print(f"[BLE] notify {'ON' if notifying else 'OFF'} para obstaculos")
 
 
-def publish_obstacle(obstacle: str, distance_m: float, traffic_state: str):
-    """Actualiza valor y notifica si hay suscripcion."""
-    global _last_obstacle_json, _obstacle_chr_obj
+def _obstacle_bin_read_cb():
+    """Devuelve el ultimo obstaculo en formato binario (navicap_proto)."""
+    return _obstacle_bin_val.as_list()
+
+
+def _obstacle_bin_notify_cb(notifying, characteristic):
+    _centrals.set_notifying('obstacle_bin', characteristic, notifying)
+    print(f"[BLE] notify {'ON' if notifying else 'OFF'} para obstaculos (binario)")
+
+
+def publish_obstacle(obstacle: str, distance_m: float, traffic_state: str,
+                     confidence: float | None = None, t_frame: float | None = None):
+    """
+    Actualiza valor (JSON y binario) y notifica si hay suscripcion. `t_frame`
+    (monotonic del frame en el detector) sirve para medir frame -> notify.
+    """
+    global _last_obstacle_json, _last_obstacle_bin, _obstacle_bin_seq
 
     _last_obstacle_json = {
         "obstacle": str(obstacle),
@@ -122,21 +222,76 @@ def publish_obstacle(obstacle: str, distance_m: float, traffic_state: str):
         "traffic": str(traffic_state),
         "ts": datetime.utcnow().isoformat() + "Z",
     }
+    if confidence is not None:
+        _last_obstacle_json["confidence"] = float(confidence)
 
-    payload = json.dumps(_last_obstacle_json, ensure_ascii=False).encode('utf-8')
+    _obstacle_bin_seq = (_obstacle_bin_seq + 1) & 0xFF
+    _last_obstacle_bin = navicap_proto.encode_obstacle(
+        normalize(str(obstacle)), float(distance_m), str(traffic_state), confidence,
+        int((time.monotonic() - _session_t0) * 1000), _obstacle_bin_seq, _CLASS_IDS,
+    )
 
-    if _obstacle_chr_obj is not None:
-        _obstacle_chr_obj.set_value(list(payload))
-        print(f"[BLE] NOTIFY enviado: {payload.decode('utf-8')}")
+    # Una sola codificacion: las lecturas ya ven el valor nuevo
+    _obstacle_val.set(json.dumps(_last_obstacle_json, ensure_ascii=False).encode('utf-8'))
+    _obstacle_bin_val.set(_last_obstacle_bin)
+
+    # La notificacion pasa por el planificador (rafagas, histeresis, urgentes)
+    _obstacle_sched.submit({
+        "obstacle": _last_obstacle_json["obstacle"],
+        "distance": _last_obstacle_json["distance"],
+        "traffic": _last_obstacle_json["traffic"],
+        "json": _obstacle_val.dbus,
+        "bin": _obstacle_bin_val.dbus,
+        "t_frame": t_frame,
+    })
+
+
+def _notify_obstacle(state: dict):
+    """
+    Envio real (llamado por el planificador): un notify por formato, que BlueZ
+    entrega a todos los centrales suscritos a esa caracteristica.
+    """
+    global _last_notify_key
+    t0 = time.monotonic()
+    sent_bin = _centrals.fanout('obstacle_bin', state["bin"], gatt_notify)
+    sent_json = _centrals.fanout('obstacle', state["json"], gatt_notify)
+    now = time.monotonic()
+    METRICS.observe("notify", now - t0)
+    if sent_json and DEBUG:
+        print(f"[BLE] NOTIFY enviado: {bytes(state['json']).decode('utf-8')}")
+    if sent_json or sent_bin:
+        METRICS.inc("notify_sent")
+        if state.get("t_frame") is not None:
+            METRICS.observe("frame_to_notify", now - float(state["t_frame"]))
+        key = (state["obstacle"], state["traffic"])
+        _event_log.log({"ev": "notify", "obstacle": state["obstacle"], "distance": state["distance"],
+                        "traffic": state["traffic"], "centrals": len(_centrals.connected())},
+                       changed=key != _last_notify_key)
+        _last_notify_key = key
     else:
         # Todavia no hay central suscrito (la app no hizo notify ON)
+        METRICS.inc("notify_no_subscriber")
         print("[BLE] publish_obstacle: no hay central suscrito aun")
 
 
+def _glib_timer(delay_s: float, fn):
+    GLib.timeout_add(max(1, int(delay_s * 1000)), fn)
+
+
+_obstacle_sched = NotifyScheduler(_notify_obstacle, _glib_timer)
+
+METRICS.collect("notify_sched", _obstacle_sched.stats)
+METRICS.collect("centrals", lambda: {"connected": len(_centrals.connected()), "fanouts": _centrals.fanouts})
+METRICS.collect("event_log", lambda: {"written": _event_log.written, "dropped": _event_log.dropped})
+
+
+def _refresh_diag(_unused=None):
+    """Recalcula el valor de la caracteristica de diagnostico (solo lectura, sin notify)."""
+    _diag_val.set(pack_diag(METRICS, _detector_diag, time.monotonic() - _detector_diag_t))
+    return True
+
+
 # ==================== Config: normalización, cache, watcher ====================
-_cfg_chr_obj = None         # characteristic READ+NOTIFY de config-state
-_cfg_cache = {}             # espejo de config.json
-_cfg_file_mtime = 0.0
 
 
 def _cfg_default():
@@ -151,67 +306,48 @@ def _cfg_default():
     }
 
 
-def _cfg_load_from_disk():
-    """Carga config.json a _cfg_cache (crea defaults si no existe)."""
-    global _cfg_cache, _cfg_file_mtime
-    try:
-        if os.path.exists(CONFIG_PATH):
-            m = os.path.getmtime(CONFIG_PATH)
-            if m != _cfg_file_mtime:
-                with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-                    _cfg_cache = json.load(f)
-                _cfg_file_mtime = m
-        else:
-            _cfg_cache = _cfg_default()
-            os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
-            with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-                json.dump(_cfg_cache, f, ensure_ascii=False, indent=2)
-            _cfg_file_mtime = os.path.getmtime(CONFIG_PATH)
-    except Exception as e:
-        print(f"[BLE] ERROR cargando config: {e}")
-        _cfg_cache = _cfg_default()
+# Config canonica en memoria; config.json se escribe atomico en otro hilo
+_cfg_store = ConfigStore(CONFIG_PATH, _cfg_default)
+_cfg_val = GattValue()
+_cfg_notified_version = None   # version de _cfg_val que ya recibio el suscriptor
 
 
-def _cfg_save_to_disk(cfg: dict):
-    """Guarda cfg a disco y refresca cache/mtime."""
-    global _cfg_cache, _cfg_file_mtime
-    os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
-    to_save = dict(cfg)
-    to_save["timestamp"] = int(time.time())
-    with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-        json.dump(to_save, f, ensure_ascii=False, indent=2)
-    _cfg_cache = dict(cfg)
-    _cfg_file_mtime = os.path.getmtime(CONFIG_PATH)
-
-
-def _cfg_notify_if_needed():
-    """Empuja _cfg_cache a la característica READ+NOTIFY si hay suscriptor."""
-    if _cfg_chr_obj is not None:
-        payload = json.dumps(_cfg_cache, ensure_ascii=False).encode('utf-8')
-        _cfg_chr_obj.set_value(list(payload))
+def _cfg_notify_if_needed(force: bool = False):
+    """
+    Empuja la config a la característica READ+NOTIFY si hay suscriptor y cambio
+    desde el ultimo envio (o `force`, al activar notify).
+    """
+    global _cfg_notified_version
+    _cfg_val.set(_cfg_store.payload())
+    if _centrals.target('config') is None:
+        return
+    if not force and _cfg_notified_version == _cfg_val.version:
+        return
+    _centrals.fanout('config', _cfg_val.dbus, gatt_notify)
+    _cfg_notified_version = _cfg_val.version
 
 
 def _poll_config_file(_unused=None):
     """Si alguien cambió config.json en disco, recarga y notifica a la app."""
-    before = _cfg_file_mtime
-    _cfg_load_from_disk()
-    if _cfg_file_mtime != before:
+    global CURRENT_CFG
+    # Nuestras propias escrituras tienen el mismo contenido: no cuentan como cambio
+    if _cfg_store.load():
+        CURRENT_CFG = dict(_cfg_store.cfg)
         _cfg_notify_if_needed()
         print("[BLE] Config cambiada en disco -> NOTIFY")
     return True
 
 
 def _cfg_read_cb():
-    _cfg_load_from_disk()
-    return list(json.dumps(_cfg_cache, ensure_ascii=False).encode('utf-8'))
+    # Sin stat ni parseo: el watcher mantiene la cache al dia
+    _cfg_val.set(_cfg_store.payload())
+    return _cfg_val.as_list()
 
 
 def _cfg_notify_cb(notifying, characteristic):
-    global _cfg_chr_obj
-    _cfg_chr_obj = characteristic if notifying else None
+    _centrals.set_notifying('config', characteristic, notifying)
     if notifying:
-        _cfg_load_from_disk()
-        _cfg_notify_if_needed()
+        _cfg_notify_if_needed(force=True)
     print(f"[BLE] notify {'ON' if notifying else 'OFF'} para config")
 
 
@@ -267,30 +403,72 @@ def _config_write_cb(value: bytes, options):
         print("[BLE] Error decodificando bytes de config")
         return
 
+    # Quien escribio (BlueZ manda el objeto del device en las opciones)
+    addr = address_from_path((options or {}).get('device'))
+    central = _centrals.touch(addr)
+    if central is not None:
+        central.writes += 1
+        _apply_central_prefs(addr, raw)
+
     new_cfg, enabled_now, disabled_now = _normalize_and_merge_config(raw)
 
-    # Actualiza globals y disco
+    # Actualiza memoria; el guardado a disco va en segundo plano
     global CURRENT_CFG
     CURRENT_CFG = dict(new_cfg)
     try:
-        _cfg_save_to_disk(CURRENT_CFG)
+        if not _cfg_store.set(CURRENT_CFG):
+            # La app suele repetir la misma escritura: nada que guardar ni notificar
+            print("[BLE] Config recibida sin cambios")
+            return
         _cfg_notify_if_needed()  # eco para el central suscrito
         if enabled_now:
             print(f"[BLE] Obstaculos ACTIVADOS: {', '.join(enabled_now)}")
         if disabled_now:
             print(f"[BLE] Obstaculos DESACTIVADOS: {', '.join(disabled_now)}")
-        print(f"[BLE] Config recibida y guardada en {CONFIG_PATH}: {CURRENT_CFG}")
+        print(f"[BLE] Config recibida, guardando en {CONFIG_PATH}: {CURRENT_CFG}")
+        _event_log.log({"ev": "config", "cfg": CURRENT_CFG,
+                        "enabled": enabled_now, "disabled": disabled_now})
     except Exception as e:
         print(f"[BLE] Error guardando config: {e}")
 
 
+def _apply_central_prefs(addr: str, raw_json: str):
+    """
+    Preferencias que manda un central y no van a config.json:
+    {"notify_min_interval": 2.0}. No es un ajuste por central: BlueZ entrega
+    cada notify a todos los suscritos, asi que el intervalo efectivo es el
+    menor pedido entre los conectados (un cuidador que pide 2 s sigue
+    recibiendo al ritmo del telefono del usuario).
+    """
+    try:
+        payload = json.loads(raw_json)
+    except ValueError:
+        return
+    if not isinstance(payload, dict) or "notify_min_interval" not in payload:
+        return
+    if _centrals.set_prefs(addr, {"min_interval": payload["notify_min_interval"]}):
+        _update_notify_interval()
+
+
+def _update_notify_interval():
+    _obstacle_sched.min_interval = _centrals.min_interval(NOTIFY_MIN_INTERVAL)
+    print(f"[BLE] Intervalo de notify: {_obstacle_sched.min_interval:.2f} s")
+
+
 # ==================== Conexión ====================
 def _on_connect(ble_device):
-    print(f"[BLE] Conectado: {ble_device.address}")
+    addr = str(ble_device.address)
+    _centrals.connect(addr)
+    print(f"[BLE] Conectado: {addr} ({len(_centrals.connected())} centrales)")
+    _event_log.log({"ev": "connect", "address": addr})
+    _update_notify_interval()
 
 
 def _on_disconnect(adapter_address, device_address):
-    print(f"[BLE] Desconectado: {device_address}")
+    _centrals.disconnect(str(device_address))
+    print(f"[BLE] Desconectado: {device_address} ({len(_centrals.connected())} centrales)")
+    _event_log.log({"ev": "disconnect", "address": str(device_address)})
+    _update_notify_interval()
 
 
 # ==================== Peripheral ====================
@@ -304,6 +482,7 @@ def _get_adapter_and_alias():
 
 
 def build_and_publish():
+    global CURRENT_CFG
     adapter_addr, alias = _get_adapter_and_alias()
     local_name = alias
     print(f"[BLE] Publicando Peripheral en {adapter_addr} con nombre '{local_name}'")
@@ -317,7 +496,7 @@ def build_and_publish():
         srv_id=1,
         chr_id=1,
         uuid=OBSTACLE_CHAR_UUID,
-        value=list(json.dumps(_last_obstacle_json).encode('utf-8')),
+        value=_obstacle_val.as_list(),
         notifying=False,
         flags=['read', 'notify'],
         read_callback=_obstacle_read_cb,
@@ -338,13 +517,14 @@ def build_and_publish():
         notify_callback=None,
     )
 
-    # Config state (READ + NOTIFY)
-    _cfg_load_from_disk()
+    # Config state (READ + NOTIFY); la config en disco pasa a ser la base de los merges
+    _cfg_store.load()
+    CURRENT_CFG = dict(_cfg_store.cfg)
     periph.add_characteristic(
         srv_id=1,
         chr_id=3,
         uuid=CONFIG_STATE_UUID,
-        value=list(json.dumps(_cfg_cache, ensure_ascii=False).encode('utf-8')),
+        value=list(_cfg_store.payload()),
         notifying=False,
         flags=['read', 'notify'],
         read_callback=_cfg_read_cb,
@@ -352,18 +532,63 @@ def build_and_publish():
         notify_callback=_cfg_notify_cb,
     )
 
+    # Obstacles binario: READ + NOTIFY (11 bytes, ver navicap_proto)
+    periph.add_characteristic(
+        srv_id=1,
+        chr_id=4,
+        uuid=OBSTACLE_BIN_UUID,
+        value=_obstacle_bin_val.as_list(),
+        notifying=False,
+        flags=['read', 'notify'],
+        read_callback=_obstacle_bin_read_cb,
+        write_callback=None,
+        notify_callback=_obstacle_bin_notify_cb,
+    )
+
+    # Diagnostico: READ (18 bytes, ver navicap_metrics.pack_diag)
+    if BLE_DIAG:
+        periph.add_characteristic(
+            srv_id=1,
+            chr_id=5,
+            uuid=DIAG_CHAR_UUID,
+            value=_diag_val.as_list(),
+            notifying=False,
+            flags=['read'],
+            read_callback=_diag_val.as_list,
+            write_callback=None,
+            notify_callback=None,
+        )
+
+    # Lecturas directo de los valores cacheados (chr_id 1, 3, 4 y 5)
+    chrs = periph.characteristics
+    _obstacle_val.bind(chrs[0])
+    _cfg_val.set(_cfg_store.payload())
+    _cfg_val.bind(chrs[2])
+    _obstacle_bin_val.bind(chrs[3])
+    if BLE_DIAG:
+        _diag_val.bind(chrs[4])
+        async_tools.add_timer_seconds(max(1, int(DIAG_EVERY)), _refresh_diag, None)
+
+    # Metricas locales: python3 navicap_metrics.py
+    serve_metrics("ble")
+
     periph.on_connect = _on_connect
     periph.on_disconnect = _on_disconnect
 
     periph.publish()
 
-    # Timers: obstacle.json y config.json
-    async_tools.add_timer_seconds(0.5, _poll_obstacle_file, None)
-    async_tools.add_timer_seconds(0.5, _poll_config_file, None)
-    print(f"[BLE] Watcher de obstaculos activo en: {OBSTACLE_FILE}")
+    # Watchers por inotify (sondeo cada 0.5 s solo si inotify no esta disponible)
+    watcher = FileWatcher(debounce_ms=50, poll_seconds=0.5)
+    # Obstaculos: socket Unix; obstacle.json solo como respaldo
+    if not _start_obstacle_socket() or OBSTACLE_FILE_WATCH:
+        watcher.watch(OBSTACLE_FILE, _poll_obstacle_file)
+        print(f"[BLE] Watcher de obstaculos activo en: {OBSTACLE_FILE}")
+    watcher.watch(CONFIG_PATH, _poll_config_file)
+    print(f"[BLE] Watcher de config activo en: {CONFIG_PATH} "
+          f"({'inotify' if watcher.uses_inotify else 'sondeo'})")
 
 
-    # Heartbeat liviano para mantener viva la suscripción (opcional)
+    # Heartbeat: solo re-notifica si la config cambio y hay alguien suscrito
     def _heartbeat(_unused=None):
         _cfg_notify_if_needed()
         return True
@@ -388,7 +613,7 @@ def _start_demo():
         o, d, t = obstacles[idx["i"] % len(obstacles)]
         idx["i"] += 1
         publish_obstacle(o, d, t)
-        return _obstacle_chr_obj is not None
+        return _centrals.any_target('obstacle', 'obstacle_bin')
 
     async_tools.add_timer_seconds(2, _tick, None)
 
@@ -409,6 +634,7 @@ def main():
 
     def _sigint(_sig, _frm):
         print("\n[BLE] Saliendo...")
+        _cfg_store.flush()
         # Pedimos al loop que pare y luego salimos
         try:
             loop.quit()
@@ -417,6 +643,8 @@ def main():
         sys.exit(0)
 
     signal.signal(signal.SIGINT, _sigint)
+    # systemd stop: misma salida ordenada (atexit vacia el log de eventos)
+    signal.signal(signal.SIGTERM, _sigint)
 
     # ? Crear el event loop de bluezero y arrancarlo
     loop = async_tools.EventLoop()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Backends de inferencia intercambiables detras de `model.detect`.
+
+Todos exponen la misma interfaz que cv2.dnn_DetectionModel, que es lo que usa
+navicap_detect.Detector:
+
+    detect(frame, confThreshold, nmsThreshold) -> (class_ids, confidences, boxes)
+    setInputSize(width, height)
+
+confThreshold puede ser un float o un arreglo con un umbral por clase (una
+sola pasada de la red, NMS por clase).
+
+detect() tambien se puede hacer por etapas, para medir cada una por separado:
+
+    prep = model.prepare(frame)                    # resize/letterbox -> blob
+    rows = model.infer(prep, frame)                # red + decodificacion
+    model.postprocess(rows, frame, conf, nms)      # umbrales + NMS
+
+- OpenCVDarknetBackend: el camino de siempre (readNetFromDarknet, FP32, CPU).
+- OnnxRuntimeBackend: modelo exportado con navicap_convert.py (FP32 o INT8);
+  la red entrega las dos cabezas YOLO crudas y aqui se decodifican con NumPy.
+
+Elegir con NAVICAP_BACKEND=opencv|onnx y NAVICAP_ONNX=<ruta .onnx>.
+"""
+
+import os
+import time
+
+import cv2
+import numpy as np
+
+from navicap_preproc import InputPool
+
+BACKEND = os.getenv('NAVICAP_BACKEND', 'opencv')
+ONNX_PATH = os.getenv('NAVICAP_ONNX', os.path.expanduser('~/navicap/yolov4-tiny-custom.onnx'))
+
+
+# ==================== cfg Darknet ====================
+def parse_cfg(path: str) -> list:
+    """Secciones del .cfg como lista de dicts ({'type': 'convolutional', ...})."""
+    sections = []
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        for raw in f:
+            line = raw.split('#', 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith('['):
+                sections.append({'type': line.strip('[]').strip()})
+            elif '=' in line and sections:
+                k, v = line.split('=', 1)
+                sections[-1][k.strip()] = v.strip()
+    return sections
+
+
+def yolo_heads(sections: list) -> list:
+    """
+    Parametros de cada capa [yolo] en el orden del cfg:
+    dicts con anchors (n,2), scale_x_y y classes.
+    """
+    heads = []
+    for s in sections:
+        if s['type'] != 'yolo':
+            continue
+        anchors = [float(x) for x in s['anchors'].split(',') if x.strip()]
+        anchors = np.array(anchors, dtype=np.float32).reshape(-1, 2)
+        mask = [int(x) for x in s['mask'].split(',')]
+        heads.append({
+            'anchors': anchors[mask],
+            'scale_x_y': float(s.get('scale_x_y', 1.0)),
+            'classes': int(s['classes']),
+        })
+    return heads
+
+
+# ==================== Decodificacion YOLO ====================
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def decode_head(raw: np.ndarray, head: dict, in_w: int, in_h: int) -> np.ndarray:
+    """
+    Salida cruda de una cabeza (1, A*(5+C), gh, gw) -> filas (A*gh*gw, 5+C) con el
+    mismo formato que la capa yolo de OpenCV: cx, cy, w, h (normalizados),
+    objectness y score por clase (= sigmoid(clase) * objectness).
+    """
+    anchors = head['anchors']
+    s = head['scale_x_y']
+    nc = head['classes']
+    na = len(anchors)
+    _, _, gh, gw = raw.shape
+    # (gh, gw, A, 5+C): mismo orden de filas que la capa yolo de OpenCV
+    p = raw.reshape(na, 5 + nc, gh, gw).transpose(2, 3, 0, 1)
+    gx = np.arange(gw, dtype=np.float32)[None, :, None]
+    gy = np.arange(gh, dtype=np.float32)[:, None, None]
+    out = np.empty((gh, gw, na, 5 + nc), dtype=np.float32)
+    out[..., 0] = (_sigmoid(p[..., 0]) * s - (s - 1) / 2 + gx) / gw
+    out[..., 1] = (_sigmoid(p[..., 1]) * s - (s - 1) / 2 + gy) / gh
+    out[..., 2] = np.exp(p[..., 2]) * anchors[None, None, :, 0] / in_w
+    out[..., 3] = np.exp(p[..., 3]) * anchors[None, None, :, 1] / in_h
+    obj = _sigmoid(p[..., 4])
+    out[..., 4] = obj
+    out[..., 5:] = _sigmoid(p[..., 5:]) * obj[..., None]
+    return out.reshape(-1, 5 + nc)
+
+
+def postprocess(rows: np.ndarray, frame_w: int, frame_h: int,
+                conf_threshold, nms_threshold: float):
+    """
+    Filas decodificadas -> (ids, confs, boxes) como DetectionModel.detect: clase
+    por fila, umbral de confianza, NMS por clase, cajas x,y,w,h en px.
+
+    `conf_threshold` puede ser un float o un arreglo con un umbral por clase; en
+    ese caso cada fila se queda con la mejor clase que supera su propio umbral.
+    """
+    empty = (np.empty((0,), np.int32), np.empty((0,), np.float32), np.empty((0, 4), np.int32))
+    if rows.size == 0:
+        return empty
+    thr = np.asarray(conf_threshold, dtype=np.float32)
+    # score de clase = prob * objectness: filas con objectness bajo el menor umbral no pasan
+    rows = rows[rows[:, 4] >= thr.min()]
+    if rows.size == 0:
+        return empty
+    scores = rows[:, 5:]
+    if thr.ndim:
+        scores = np.where(scores >= thr, scores, 0.0)
+    ids = scores.argmax(axis=1)
+    confs = scores[np.arange(len(ids)), ids]
+    keep = confs >= (thr[ids] if thr.ndim else thr)
+    if thr.ndim:
+        keep &= confs > 0
+    if not keep.any():
+        return empty
+    r, ids, confs = rows[keep], ids[keep], confs[keep]
+    # Misma aritmetica entera y recorte al frame que DetectionModel
+    cx = (r[:, 0] * frame_w).astype(np.int32)
+    cy = (r[:, 1] * frame_h).astype(np.int32)
+    w = (r[:, 2] * frame_w).astype(np.int32)
+    h = (r[:, 3] * frame_h).astype(np.int32)
+    x = np.clip(cx - w // 2, 0, frame_w - 1)
+    y = np.clip(cy - h // 2, 0, frame_h - 1)
+    w = np.clip(w, 1, frame_w - x)
+    h = np.clip(h, 1, frame_h - y)
+    boxes = np.stack([x, y, w, h], axis=1).astype(np.int32)
+    idx = cv2.dnn.NMSBoxesBatched(boxes.tolist(), confs.tolist(), ids.tolist(),
+                                  float(thr.min()), nms_threshold)
+    idx = np.array(idx, dtype=np.int64).reshape(-1)
+    return ids[idx].astype(np.int32), confs[idx].astype(np.float32), boxes[idx]
+
+
+def detect_staged(model, frame, confThreshold, nmsThreshold: float):
+    """
+    detect() por etapas y cronometrado: ((ids, confs, boxes), segundos por
+    etapa {"preprocess", "forward", "nms"}).
+    """
+    t0 = time.perf_counter()
+    prep = model.prepare(frame)
+    t1 = time.perf_counter()
+    rows = model.infer(prep, frame)
+    t2 = time.perf_counter()
+    out = model.postprocess(rows, frame, confThreshold, nmsThreshold)
+    t3 = time.perf_counter()
+    return out, {"preprocess": t1 - t0, "forward": t2 - t1, "nms": t3 - t2}
+
+
+def batch_blob(images: list, size: tuple) -> np.ndarray:
+    """Lote NCHW RGB 0-1 (como DetectionModel) para infer_batch."""
+    return cv2.dnn.blobFromImages(images, 1/255.0, size, swapRB=True, crop=False)
+
+
+# ==================== Backends ====================
+class OpenCVDarknetBackend:
+    """
+    Red Darknet en OpenCV DNN (FP32, backend OpenCV, CPU).
+
+    Una pasada cruda (net.forward sobre las capas yolo) con el blob preasignado
+    de navicap_preproc y decodificacion con `postprocess` (mismo resultado que
+    cv2.dnn_DetectionModel, sin sus asignaciones por frame). La capa yolo de
+    OpenCV pone en 0 los scores bajo su `thresh` (0.2 por defecto), asi que el
+    .cfg se carga con thresh=min_thresh para no perder clases permisivas como
+    el semaforo.
+    """
+
+    name = 'opencv'
+
+    def __init__(self, cfg_path: str, wts_path: str, size: int, min_thresh: float | None = None):
+        if min_thresh is None:
+            net = cv2.dnn.readNetFromDarknet(cfg_path, wts_path)
+        else:
+            with open(cfg_path, 'r', encoding='utf-8', errors='ignore') as f:
+                cfg = f.read().replace('[yolo]', f'[yolo]\nthresh={min_thresh:.4f}')
+            net = cv2.dnn.readNetFromDarknet(np.frombuffer(cfg.encode(), np.uint8),
+                                             np.fromfile(wts_path, np.uint8))
+        net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.net = net
+        self.out_names = net.getUnconnectedOutLayersNames()
+        self.inputs = InputPool()
+        self.size = (size, size)
+
+    def setInputSize(self, width: int, height: int):
+        self.size = (int(width), int(height))
+
+    def prepare(self, frame) -> np.ndarray:
+        """Blob de entrada en el buffer reusado de navicap_preproc."""
+        return self.inputs.get(*self.size).prepare(frame)
+
+    def infer(self, blob: np.ndarray, frame) -> np.ndarray:
+        """Filas decodificadas de las capas yolo (una pasada), normalizadas al frame."""
+        self.net.setInput(blob)
+        outs = self.net.forward(self.out_names)
+        rows = np.concatenate([o.reshape(-1, o.shape[-1]) for o in outs], axis=0)
+        return self.inputs.get(*self.size).unmap(rows, frame.shape[1], frame.shape[0])
+
+    def forward(self, frame) -> np.ndarray:
+        return self.infer(self.prepare(frame), frame)
+
+    def infer_batch(self, blob: np.ndarray) -> list:
+        """Filas de cada imagen del lote (coordenadas normalizadas de esa imagen), un solo net.forward."""
+        self.net.setInput(blob)
+        outs = self.net.forward(self.out_names)
+        if blob.shape[0] == 1:
+            return [np.concatenate([o.reshape(-1, o.shape[-1]) for o in outs], axis=0)]
+        return [np.concatenate([o[i] for o in outs], axis=0) for i in range(blob.shape[0])]
+
+    def forward_batch(self, images: list, size: tuple) -> list:
+        return self.infer_batch(batch_blob(images, size))
+
+    def postprocess(self, rows: np.ndarray, frame, confThreshold, nmsThreshold: float):
+        return postprocess(rows, frame.shape[1], frame.shape[0], confThreshold, nmsThreshold)
+
+    def detect(self, frame, confThreshold, nmsThreshold: float):
+        return self.postprocess(self.forward(frame), frame, confThreshold, nmsThreshold)
+
+
+class OnnxRuntimeBackend:
+    """
+    ONNX Runtime sobre el modelo de navicap_convert.py (entrada 'images' NCHW RGB
+    0-1 de tamaño dinamico; salidas = cabezas YOLO crudas en el orden del cfg).
+    """
+
+    name = 'onnx'
+
+    def __init__(self, onnx_path: str, cfg_path: str, size: int, threads: int = 0,
+                 optimized_path: str | None = None):
+        import onnxruntime as ort  # opcional: solo si se usa este backend
+        self.session = None
+        if optimized_path and os.path.exists(optimized_path):
+            # Grafo ya optimizado en un arranque anterior: se carga sin volver a optimizar
+            try:
+                self.session = self._session(ort, optimized_path, threads,
+                                             ort.GraphOptimizationLevel.ORT_DISABLE_ALL)
+            except Exception as e:
+                print(f"[MODEL] Grafo optimizado invalido ({e}); se regenera")
+                os.remove(optimized_path)
+        if self.session is None:
+            self.session = self._session(ort, onnx_path, threads,
+                                         ort.GraphOptimizationLevel.ORT_ENABLE_ALL, optimized_path)
+        self.input_name = self.session.get_inputs()[0].name
+        self.batched = not isinstance(self.session.get_inputs()[0].shape[0], int)
+        self.heads = yolo_heads(parse_cfg(cfg_path))
+        self.inputs = InputPool()
+        self.size = (size, size)
+
+    @staticmethod
+    def _session(ort, path: str, threads: int, level, save_to: str | None = None):
+        so = ort.SessionOptions()
+        so.graph_optimization_level = level
+        if threads:
+            so.intra_op_num_threads = threads
+        if save_to:
+            os.makedirs(os.path.dirname(save_to) or '.', exist_ok=True)
+            so.optimized_model_filepath = save_to
+        return ort.InferenceSession(path, sess_options=so, providers=['CPUExecutionProvider'])
+
+    def setInputSize(self, width: int, height: int):
+        self.size = (int(width), int(height))
+
+    def prepare(self, frame) -> np.ndarray:
+        # Igual que DetectionModel: resize, BGR->RGB, escala 1/255, NCHW (buffer reusado)
+        return self.inputs.get(*self.size).prepare(frame)
+
+    def forward_blob(self, blob: np.ndarray) -> np.ndarray:
+        """Filas decodificadas de todas las cabezas (como net.forward de OpenCV)."""
+        outs = self.session.run(None, {self.input_name: blob})
+        h, w = blob.shape[2], blob.shape[3]
+        return np.concatenate([decode_head(o, hd, w, h) for o, hd in zip(outs, self.heads)], axis=0)
+
+    def infer(self, blob: np.ndarray, frame) -> np.ndarray:
+        rows = self.forward_blob(blob)
+        return self.inputs.get(*self.size).unmap(rows, frame.shape[1], frame.shape[0])
+
+    def forward(self, frame) -> np.ndarray:
+        return self.infer(self.prepare(frame), frame)
+
+    def infer_batch(self, blob: np.ndarray) -> list:
+        """Como OpenCVDarknetBackend.infer_batch; .onnx viejos (lote fijo 1) van de a uno."""
+        n = blob.shape[0]
+        if not self.batched:
+            return [self.forward_blob(blob[i:i + 1]) for i in range(n)]
+        outs = self.session.run(None, {self.input_name: blob})
+        h, w = blob.shape[2], blob.shape[3]
+        return [np.concatenate([decode_head(o[i:i + 1], hd, w, h) for o, hd in zip(outs, self.heads)], axis=0)
+                for i in range(n)]
+
+    def forward_batch(self, images: list, size: tuple) -> list:
+        return self.infer_batch(batch_blob(images, size))
+
+    def postprocess(self, rows: np.ndarray, frame, confThreshold, nmsThreshold: float):
+        return postprocess(rows, frame.shape[1], frame.shape[0], confThreshold, nmsThreshold)
+
+    def detect(self, frame, confThreshold, nmsThreshold: float):
+        return self.postprocess(self.forward(frame), frame, confThreshold, nmsThreshold)
+
+
+def make_backend(name: str, cfg_path: str, wts_path: str, size: int, onnx_path: str = ONNX_PATH,
+                 min_thresh: float | None = None, optimized_path: str | None = None,
+                 tiles: bool = False):
+    """
+    Crea el backend por nombre ('opencv' u 'onnx'). `min_thresh` es el menor
+    umbral por clase que se va a pedir a detect(); `optimized_path` es donde
+    ONNX Runtime guarda/lee su grafo optimizado (navicap_startup.ModelCache).
+    `tiles` envuelve el backend en navicap_tiles.TiledBackend.
+    """
+    if name == 'onnx':
+        model = OnnxRuntimeBackend(onnx_path, cfg_path, size, optimized_path=optimized_path)
+    elif name == 'opencv':
+        model = OpenCVDarknetBackend(cfg_path, wts_path, size, min_thresh)
+    else:
+        raise ValueError(f"Backend desconocido: {name}")
+    if tiles:
+        from navicap_tiles import TiledBackend  # importa este modulo: import local
+        model = TiledBackend(model)
+    return model
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Replay y benchmark del pipeline de deteccion sin camara, HC-SR04 ni Raspberry.
+
+Pasa un video grabado o una carpeta de imagenes por el mismo navicap_detect.Detector
+que usa el servicio, con una traza de distancia grabada (CSV "t,distancia_m") o
+sintetica, y reporta percentiles de latencia por etapa, FPS y tiempo de CPU.
+
+Ejemplos:
+    python3 navicap_bench.py --video paseo.mp4 --weights yolov4-tiny-custom_best.weights
+    python3 navicap_bench.py --images frames/ --distance-trace dist.csv --json out.json
+    python3 navicap_bench.py --video paseo.mp4 --size 416 --fixed-size --detect-every 1
+    python3 navicap_bench.py --video paseo.mp4 --backend onnx --onnx yolov4-tiny-custom.int8.onnx
+    python3 navicap_bench.py --video paseo.mp4 --mode pipelined   # CPU solo del proceso principal
+
+En modo pipelined los frames se entregan al ritmo de --fps (como la camara) y
+al final se esperan las inferencias en vuelo, para que pasadas YOLO, pushes y
+latencias reflejen inferencia real y no solo el tracker.
+"""
+
+import argparse
+import bisect
+import glob
+import itertools
+import json
+import math
+import os
+import platform
+import resource
+import sys
+import time
+
+import cv2
+
+import navicap_detect
+from navicap_classes import load_classes
+from navicap_config import DetectorConfig
+from navicap_governor import Governor
+from navicap_pipeline import PipelineEngine
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+# ==================== Fuentes ====================
+def iter_video(path: str):
+    """(frame, segundos de decode) por cada frame del video."""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise SystemExit(f"No se pudo abrir el video: {path}")
+    try:
+        while True:
+            t0 = time.perf_counter()
+            ok, frame = cap.read()
+            dt = time.perf_counter() - t0
+            if not ok:
+                break
+            yield frame, dt
+    finally:
+        cap.release()
+
+
+def iter_images(folder: str):
+    paths = sorted(p for ext in ('jpg', 'jpeg', 'png', 'bmp')
+                   for p in glob.glob(os.path.join(folder, f'*.{ext}')))
+    if not paths:
+        raise SystemExit(f"No hay imagenes en {folder}")
+    for p in paths:
+        t0 = time.perf_counter()
+        frame = cv2.imread(p, cv2.IMREAD_COLOR)
+        dt = time.perf_counter() - t0
+        if frame is not None:
+            yield frame, dt
+
+
+class DistanceTrace:
+    """Distancia en funcion del tiempo del replay: CSV grabado, constante o sintetica."""
+
+    def __init__(self, csv_path: str | None = None, constant: float | None = None):
+        self.ts, self.ds = [], []
+        self.constant = constant
+        if csv_path:
+            with open(csv_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.strip().split(',')
+                    if len(parts) < 2:
+                        continue
+                    try:
+                        t, d = float(parts[0]), float(parts[1])
+                    except ValueError:
+                        continue  # cabecera
+                    self.ts.append(t); self.ds.append(d)
+
+    def at(self, t: float) -> float:
+        if self.ts:
+            i = bisect.bisect_right(self.ts, t) - 1
+            return self.ds[max(0, i)]
+        if self.constant is not None:
+            return self.constant
+        # Sintetica: acercarse de 4 m a 0.4 m cada 10 s (diente de sierra)
+        return 4.0 - 3.6 * ((t % 10.0) / 10.0)
+
+
+# ==================== Publicadores ====================
+class NullPublisher:
+    """Arma el mismo JSON que push_obstacle pero no escribe nada."""
+
+    def __init__(self):
+        self.pushes = 0
+
+    def __call__(self, obstacle, distance_m, traffic="unknown", confidence=None, frame_ts=None):
+        data = {"obstacle": str(obstacle), "distance": float(distance_m), "traffic": str(traffic)}
+        if confidence is not None:
+            data["confidence"] = float(confidence)
+        if frame_ts is not None:
+            data["t_frame"] = float(frame_ts)
+        json.dumps(data, ensure_ascii=False)
+        self.pushes += 1
+
+
+# ==================== Estadisticas ====================
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"n": 0}
+    v = sorted(values)
+
+    def pct(p):
+        return v[min(len(v) - 1, max(0, int(math.ceil(p / 100.0 * len(v))) - 1))]
+
+    return {
+        "n": len(v),
+        "mean_ms": round(1000.0 * sum(v) / len(v), 3),
+        "p50_ms": round(1000.0 * pct(50), 3),
+        "p90_ms": round(1000.0 * pct(90), 3),
+        "p99_ms": round(1000.0 * pct(99), 3),
+        "max_ms": round(1000.0 * v[-1], 3),
+    }
+
+
+def current_rss_kb() -> int:
+    """RSS actual (ru_maxrss solo da el pico)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def run(args) -> dict:
+    classes = load_classes(args.names)
+    margs = navicap_detect.model_args(args.cfg, args.weights, args.size,
+                                      backend=args.backend, onnx_path=args.onnx, tiles=args.tiles)
+    model = navicap_detect.make_model_backend(**margs) if args.mode == 'serial' else None
+    cfg = DetectorConfig(classes, path=args.config)
+    governor = Governor(sizes=(args.size,), initial=args.size) if args.fixed_size else None
+    publisher = navicap_detect.push_obstacle if args.publish == 'real' else NullPublisher()
+    det = navicap_detect.Detector(model, classes, cfg, publish=publisher,
+                                  input_size=args.size, governor=governor)
+    if args.detect_every is not None:
+        det.sched.every = max(1, args.detect_every)
+    trace = DistanceTrace(args.distance_trace, args.distance)
+
+    source = iter_video(args.video) if args.video else iter_images(args.images)
+    engine = None
+    step = det.step
+    if args.mode == 'pipelined':
+        # El ring de memoria compartida se dimensiona con el primer frame
+        first = next(source, None)
+        if first is None:
+            raise SystemExit("Fuente sin frames")
+        source = itertools.chain([first], source)
+        engine = PipelineEngine(det, margs, frame_bytes=first[0].nbytes, nms=navicap_detect.NMS)
+        if not engine.start():
+            engine.stop()
+            raise SystemExit("No arrancaron los workers de inferencia")
+        step = engine.process
+    stages = {"decode": [], "frame": []}
+    pushes = yolo = 0
+    n = 0
+    rss_warm = None
+
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    last = None
+    for frame, t_decode in source:
+        if args.frames and n >= args.frames:
+            break
+        frame_ts = n / args.fps
+        if engine is not None:
+            # Ritmo de camara: sin esto el tracker corre solo y los workers nunca responden
+            delay = wall0 + frame_ts - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        t0 = time.perf_counter()
+        out = step(frame, frame_ts, trace.at(frame_ts))
+        stages["frame"].append(time.perf_counter() - t0)
+        stages["decode"].append(t_decode)
+        for k, v in det.times.items():
+            stages.setdefault(k, []).append(v)
+        pushes += out["pushed"]
+        yolo += out["detected"]
+        n += 1
+        last = (frame, frame_ts, trace.at(frame_ts))
+        if n == 10:
+            rss_warm = current_rss_kb()   # despues de reservar buffers y calentar la red
+    if engine is not None and last is not None:
+        # Resultados en vuelo: se cuentan antes de parar los workers
+        for out in engine.drain(*last):
+            pushes += out["pushed"]
+            yolo += out["detected"]
+    wall = time.perf_counter() - wall0
+    cpu = time.process_time() - cpu0
+    pipeline = None
+    if engine is not None:
+        pipeline = engine.stats()
+        engine.stop()
+
+    return {
+        "source": args.video or args.images,
+        "frames": n,
+        "yolo_passes": yolo,
+        "pushes": pushes,
+        "backend": args.backend,
+        "mode": args.mode,
+        "pipeline": pipeline,
+        "model": args.onnx if args.backend == 'onnx' else args.weights,
+        "input_size": args.size,
+        "fixed_size": bool(args.fixed_size),
+        "tiles": getattr(det.model, "tiles_run", None) if det.model is not None else None,
+        "final_size": det.cur_size,
+        "detect_every": det.sched.every,
+        "wall_s": round(wall, 3),
+        "fps": round(n / wall, 2) if wall > 0 else 0.0,
+        "cpu_s": round(cpu, 3),
+        "cpu_util": round(cpu / wall, 3) if wall > 0 else 0.0,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "rss_growth_kb": current_rss_kb() - rss_warm if rss_warm is not None else None,
+        "stages": {k: percentiles(v) for k, v in stages.items()},
+        "host": {"machine": platform.machine(), "python": platform.python_version(),
+                 "opencv": cv2.__version__},
+    }
+
+
+def print_report(res: dict):
+    print(f"[BENCH] {res['frames']} frames, {res['yolo_passes']} pasadas YOLO, {res['pushes']} pushes")
+    print(f"[BENCH] backend {res['backend']} ({os.path.basename(res['model'])})")
+    print(f"[BENCH] {res['fps']} FPS, CPU {res['cpu_s']} s ({res['cpu_util'] * 100:.0f}%), "
+          f"tamaño {res['input_size']} -> {res['final_size']}")
+    print(f"[BENCH] RSS max {res['max_rss_kb']} kB, crecimiento tras warm-up {res['rss_growth_kb']} kB")
+    if res.get("pipeline"):
+        print(f"[BENCH] pipeline {res['pipeline']}")
+    print(f"{'etapa':<10} {'n':>6} {'media':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}  (ms)")
+    for name, st in res["stages"].items():
+        if not st.get("n"):
+            continue
+        print(f"{name:<10} {st['n']:>6} {st['mean_ms']:>9.2f} {st['p50_ms']:>9.2f} "
+              f"{st['p90_ms']:>9.2f} {st['p99_ms']:>9.2f} {st['max_ms']:>9.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay/benchmark del pipeline NaviCap")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--video", help="Video grabado (mp4/avi/mjpg)")
+    src.add_argument("--images", help="Carpeta con imagenes (orden alfabetico)")
+    parser.add_argument("--cfg", default=os.path.join(HERE, 'yolov4-tiny-custom.cfg'))
+    parser.add_argument("--weights", default=os.path.join(HERE, 'yolov4-tiny-custom_best.weights'))
+    parser.add_argument("--names", default=os.path.join(HERE, 'obj.names'))
+    parser.add_argument("--mode", choices=("serial", "pipelined"), default="serial",
+                        help="serial = det.step(); pipelined = inferencia en procesos aparte")
+    parser.add_argument("--backend", choices=("opencv", "onnx"), default=navicap_detect.BACKEND)
+    parser.add_argument("--onnx", default=os.path.join(HERE, 'yolov4-tiny-custom.onnx'),
+                        help="Modelo ONNX (FP32 o INT8) para --backend onnx")
+    parser.add_argument("--tiles", action="store_true",
+                        help="Frame completo a --size + recortes (NAVICAP_TILE_*)")
+    parser.add_argument("--config", default=None, help="config.json a aplicar (por defecto: todas las clases)")
+    parser.add_argument("--size", type=int, default=navicap_detect.INPUT_SIZE, help="Tamaño de entrada inicial")
+    parser.add_argument("--fixed-size", action="store_true", help="Desactiva el gobernador de tamaño")
+    parser.add_argument("--detect-every", type=int, default=None, help="YOLO cada N frames (1 = siempre)")
+    parser.add_argument("--fps", type=float, default=navicap_detect.FPS, help="FPS del material grabado")
+    parser.add_argument("--frames", type=int, default=0, help="Maximo de frames (0 = todos)")
+    parser.add_argument("--distance-trace", default=None, help="CSV t,distancia_m")
+    parser.add_argument("--distance", type=float, default=None, help="Distancia constante en m")
+    parser.add_argument("--publish", choices=("null", "real"), default="null",
+                        help="null: solo arma el JSON; real: push_obstacle (socket + obstacle.json + log)")
+    parser.add_argument("--json", default=None, help="Escribe los resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    for p in (args.cfg, args.onnx if args.backend == 'onnx' else args.weights, args.names):
+        if not os.path.exists(p):
+            raise SystemExit(f"Falta archivo: {p}")
+
+    res = run(args)
+    print_report(res)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(res, f, ensure_ascii=False, indent=2)
+        print(f"[BENCH] resultados en {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
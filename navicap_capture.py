@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Captura de camara en un hilo propio con buffer de 1 slot ("el ultimo frame gana").
+
+El hilo de captura lee la camara todo el tiempo y deja solo el frame mas nuevo;
+la inferencia toma ese frame cuando termina la pasada anterior. Los frames que
+se sobrescriben sin que nadie los consuma se cuentan como descartados.
+"""
+
+import threading
+import time
+
+from navicap_metrics import METRICS
+
+
+class LatestFrameGrabber:
+    """
+    Hilo de captura. `opener` es una funcion sin argumentos que devuelve un
+    cv2.VideoCapture abierto (p.ej. lambda: open_camera(CAM_INDEX)).
+    Si `read()` de la camara falla, se libera y se reabre con `opener`.
+    `decode` (opcional) convierte lo leido en el frame BGR dentro de este hilo
+    (p.ej. navicap_preproc.MjpgDecoder con la camara entregando JPEG crudo).
+    """
+
+    def __init__(self, opener, reopen_delay: float = 0.2, decode=None):
+        self._opener = opener
+        self._reopen_delay = reopen_delay
+        self._decode = decode
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_ts = 0.0
+        self._seq = 0          # contador de frames publicados en el slot
+        self._taken_seq = 0    # ultimo seq entregado a read()
+        self._running = False
+        self._thread = None
+        self.cap = None
+        # Estadisticas
+        self.frames = 0        # frames leidos de la camara
+        self.dropped = 0       # frames sobrescritos sin ser consumidos
+        self.reopens = 0       # reaperturas de camara
+        self.decode_errors = 0 # JPEG corruptos descartados
+
+    def start(self) -> bool:
+        """Abre la camara y lanza el hilo. Devuelve True si la camara abrio."""
+        self.cap = self._opener()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="navicap-capture", daemon=True)
+        self._thread.start()
+        return self.cap.isOpened()
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def is_opened(self) -> bool:
+        return self.cap is not None and self.cap.isOpened()
+
+    def _reopen(self):
+        try:
+            if self.cap is not None:
+                self.cap.release()
+        except Exception:
+            pass
+        time.sleep(self._reopen_delay)
+        self.cap = self._opener()
+        self.reopens += 1
+        print(f"[CAP] Camara reabierta (reopens={self.reopens})")
+
+    def _run(self):
+        while self._running:
+            ok, frame = self.cap.read()
+            if not ok:
+                if self._running:
+                    self._reopen()
+                continue
+            ts = time.monotonic()
+            if self._decode is not None:
+                frame = self._decode(frame)
+                METRICS.observe("decode", time.monotonic() - ts)
+                if frame is None:
+                    self.decode_errors += 1
+                    continue
+            with self._cond:
+                if self._seq != self._taken_seq:
+                    self.dropped += 1
+                self._frame = frame
+                self._frame_ts = ts
+                self._seq += 1
+                self.frames += 1
+                self._cond.notify_all()
+
+    def read(self, timeout: float = 1.0):
+        """
+        Espera un frame mas nuevo que el ultimo entregado.
+        Devuelve (frame, ts_monotonic) o (None, 0.0) si vence el timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._running and self._seq == self._taken_seq:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return None, 0.0
+                self._cond.wait(left)
+            if self._seq == self._taken_seq:
+                return None, 0.0
+            self._taken_seq = self._seq
+            frame, ts = self._frame, self._frame_ts
+            self._frame = None  # el consumidor es dueño del frame
+            return frame, ts
+
+    def stats(self) -> dict:
+        return {"frames": self.frames, "dropped": self.dropped, "reopens": self.reopens,
+                "decode_errors": self.decode_errors}
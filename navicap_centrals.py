@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registro de centrales conectados (telefono del usuario, del cuidador...) y de
+las suscripciones notify por caracteristica.
+
+BlueZ lleva la cuenta de suscriptores de cada caracteristica: llama
+StartNotify con el primero y StopNotify recien cuando no queda ninguno, y un
+PropertiesChanged de Value llega a todos los suscritos. Por eso el envio es
+uno por caracteristica (cada formato se codifica una vez) y las preferencias
+de cada central se combinan: el intervalo efectivo es el del central mas
+exigente (notify_min_interval es un piso compartido, no un ritmo por
+central; no hay forma de espaciar los avisos para uno solo), y el formato de cada central es la caracteristica a la que se
+suscribe (JSON o binaria).
+"""
+
+import re
+import time
+
+_DEV_PATH = re.compile(r'dev_([0-9A-Fa-f]{2}(?:_[0-9A-Fa-f]{2}){5})')
+
+
+def address_from_path(path) -> str | None:
+    """'/org/bluez/hci0/dev_AA_BB_CC_DD_EE_FF' -> 'AA:BB:CC:DD:EE:FF'."""
+    m = _DEV_PATH.search(str(path or ''))
+    return m.group(1).replace('_', ':').upper() if m else None
+
+
+class Central:
+    __slots__ = ("address", "connected", "since", "last_seen", "writes", "prefs")
+
+    def __init__(self, address: str, now: float):
+        self.address = address
+        self.connected = False
+        self.since = now
+        self.last_seen = now
+        self.writes = 0
+        self.prefs = {}        # min_interval
+
+    def as_dict(self) -> dict:
+        return {"address": self.address, "connected": self.connected,
+                "since": round(self.since, 1), "writes": self.writes, "prefs": dict(self.prefs)}
+
+
+class CentralRegistry:
+    """
+    Centrales por direccion + caracteristica notificando por clave
+    ('obstacle', 'obstacle_bin', 'config'). `target(key)` es lo que antes era
+    el global `_..._chr_obj`, pero solo se borra cuando BlueZ avisa que no
+    queda ningun suscriptor (no cuando se desconecta un central cualquiera).
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self.centrals = {}
+        self._targets = {}     # clave -> characteristic con notify activo
+        self.fanouts = 0
+
+    # ---------- conexiones ----------
+    def _get(self, address: str) -> Central:
+        c = self.centrals.get(address)
+        if c is None:
+            c = self.centrals[address] = Central(address, self._clock())
+        return c
+
+    def connect(self, address: str) -> Central:
+        c = self._get(str(address).upper())
+        c.connected = True
+        c.since = c.last_seen = self._clock()
+        return c
+
+    def disconnect(self, address: str):
+        c = self.centrals.get(str(address).upper())
+        if c is not None:
+            c.connected = False
+            c.last_seen = self._clock()
+        # Las suscripciones no se tocan: BlueZ llama StopNotify cuando se va el ultimo
+
+    def touch(self, address: str | None) -> Central | None:
+        """Marca actividad (lectura/escritura con `device` en las opciones)."""
+        if not address:
+            return None
+        c = self._get(address)
+        c.connected = True
+        c.last_seen = self._clock()
+        return c
+
+    def connected(self) -> list:
+        return [c for c in self.centrals.values() if c.connected]
+
+    # ---------- preferencias ----------
+    def set_prefs(self, address: str | None, prefs: dict) -> bool:
+        """Guarda preferencias del central (min_interval). True si cambiaron."""
+        c = self.centrals.get(address) if address else None
+        if c is None:
+            return False
+        clean = {}
+        try:
+            if "min_interval" in prefs:
+                clean["min_interval"] = max(0.1, float(prefs["min_interval"]))
+        except (TypeError, ValueError):
+            pass
+        new = {**c.prefs, **clean}
+        if new == c.prefs:
+            return False
+        c.prefs = new
+        return True
+
+    def min_interval(self, default: float) -> float:
+        """
+        Intervalo de notify efectivo: el menor entre los centrales conectados;
+        uno sin preferencia cuenta como `default`.
+        """
+        asked = [c.prefs.get("min_interval", default) for c in self.connected()]
+        return min(asked) if asked else default
+
+    # ---------- suscripciones ----------
+    def set_notifying(self, key: str, characteristic, notifying: bool):
+        if notifying:
+            self._targets[key] = characteristic
+        else:
+            self._targets.pop(key, None)
+
+    def target(self, key: str):
+        return self._targets.get(key)
+
+    def any_target(self, *keys) -> bool:
+        return any(k in self._targets for k in keys)
+
+    def fanout(self, key: str, value, send) -> bool:
+        """send(chr, value) si hay suscriptores en `key`; el valor ya viene codificado."""
+        chr_obj = self._targets.get(key)
+        if chr_obj is None:
+            return False
+        send(chr_obj, value)
+        self.fanouts += 1
+        return True
+
+    def stats(self) -> dict:
+        return {"centrals": [c.as_dict() for c in self.centrals.values()],
+                "notifying": sorted(self._targets), "fanouts": self.fanouts}
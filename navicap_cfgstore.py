@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Config canonica de ble_server en memoria, con persistencia atomica fuera del
+loop de GLib.
+
+- `set()` descarta escrituras identicas (la app suele mandar la misma config
+  dos veces seguidas).
+- El guardado va a un hilo: tmp + fsync + rename, asi config.json nunca queda
+  a medias para el detector ni bloquea las notificaciones.
+- `payload()` devuelve el JSON ya codificado; solo se regenera si la config cambia.
+"""
+
+import json
+import os
+import threading
+import time
+
+
+class ConfigStore:
+    """config.json como dict en memoria + bytes cacheados + guardado en segundo plano."""
+
+    def __init__(self, path: str, defaults_fn):
+        self.path = path
+        self.defaults_fn = defaults_fn
+        self.cfg = {}
+        self.version = 0          # sube con cada cambio real
+        self.saves = 0
+        self.deduped = 0
+        self._payload = None
+        self._pending = None      # (version, dict) por guardar
+        self._busy = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._writer, name="navicap-cfg", daemon=True)
+        self._thread.start()
+
+    # ---------- lectura ----------
+    def load(self) -> bool:
+        """
+        Lee config.json (crea defaults si no existe). Devuelve True si el
+        contenido difiere de lo que hay en memoria (p.ej. lo edito otro proceso).
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                cfg = json.load(f)
+        except FileNotFoundError:
+            return self.set(self.defaults_fn())
+        except (OSError, ValueError) as e:
+            print(f"[BLE] ERROR cargando config: {e}")
+            if not self.cfg:
+                self._apply(self.defaults_fn())
+                return True
+            return False
+        cfg.pop("timestamp", None)
+        if cfg == self.cfg:
+            return False
+        self._apply(cfg)
+        return True
+
+    def payload(self) -> bytes:
+        """JSON de la config (sin `timestamp`) listo para GATT."""
+        if self._payload is None:
+            self._payload = json.dumps(self.cfg, ensure_ascii=False).encode('utf-8')
+        return self._payload
+
+    # ---------- escritura ----------
+    def set(self, cfg: dict) -> bool:
+        """Reemplaza la config y agenda el guardado. False si era identica (no se escribe)."""
+        cfg = dict(cfg)
+        cfg.pop("timestamp", None)
+        if cfg == self.cfg:
+            self.deduped += 1
+            return False
+        self._apply(cfg)
+        with self._cond:
+            self._pending = (self.version, dict(cfg))
+            self._cond.notify()
+        return True
+
+    def _apply(self, cfg: dict):
+        self.cfg = cfg
+        self.version += 1
+        self._payload = None
+
+    def _writer(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                _version, cfg = self._pending
+                self._pending = None
+                self._busy = True
+            try:
+                self._write_atomic(cfg)
+                self.saves += 1
+            except OSError as e:
+                print(f"[BLE] Error guardando config: {e}")
+            finally:
+                with self._cond:
+                    self._busy = False
+
+    def _write_atomic(self, cfg: dict):
+        to_save = dict(cfg)
+        to_save["timestamp"] = int(time.time())
+        d = os.path.dirname(self.path) or '.'
+        os.makedirs(d, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(to_save, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        # El rename tambien tiene que llegar a la SD
+        fd = os.open(d, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def flush(self, timeout: float = 2.0) -> bool:
+        """Espera a que no quede nada pendiente (al salir)."""
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+            with self._cond:
+                if self._pending is None and not self._busy:
+                    return True
+            time.sleep(0.01)
+        return False
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Nombres de clases de NaviCap (obj.names) y sus alias en español/ingles."""
+
+import os
+
+NAMES_PATH = os.path.expanduser('~/navicap/obj.names')
+
+# ---------- Aliases de clases ----------
+ALIASES = {
+    "persona": "person", "person": "person",
+    "perro": "dog", "dog": "dog",
+    "bicicleta": "bicycle", "bicycle": "bicycle",
+    "auto": "car", "car": "car",
+    "moto": "motorcycle", "motorcycle": "motorcycle",
+    "puerta": "door", "door": "door",
+    "escalera": "stairs", "stairs": "stairs",
+    "escalera_mecanica": "escalator", "escalera mecanica": "escalator", "escalator": "escalator",
+    "semaforo": "traffic_light", "semaforo": "traffic_light", "traffic light": "traffic_light",
+    "semáforo": "traffic_light",
+    "traffic_light": "traffic_light",
+    "arbol": "tree", "arbol": "tree", "tree": "tree", "árbol": "tree"
+}
+OBSTACLE_GROUP = {"person", "stairs", "motorcycle", "door", "escalator"}
+
+def normalize(lbl: str) -> str:
+    return ALIASES.get(lbl.strip(), lbl.strip())
+
+def load_classes(path: str = NAMES_PATH) -> list:
+    """Lista de clases normalizadas en el orden de obj.names (indice = class id)."""
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        return [normalize(x) for x in f.read().splitlines() if x.strip()]
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lectura de config.json (la que escribe ble_server.py) desde el detector, con
+recarga en caliente: clases de alerta activas y ventana de distancia.
+
+La ventana [min_distance, max_distance] solo corta por arriba: un obstaculo
+mas cerca que min_distance es el mas importante y nunca se suprime.
+"""
+
+import json
+import math
+import os
+import time
+
+from navicap_watch import Inotify, IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE, IN_DELETE
+
+CONFIG_PATH = os.path.expanduser('~/navicap/config.json')
+
+
+class DetectorConfig:
+    """
+    Vista del detector sobre config.json. `poll()` es barato y se llama en cada
+    frame: con inotify solo lee eventos pendientes; sin inotify compara mtime
+    como maximo cada `check_every` segundos.
+    """
+
+    def __init__(self, classes: list, path: str = CONFIG_PATH, check_every: float = 1.0):
+        self.classes = classes
+        self.path = path
+        self.check_every = check_every
+        self.alerts_enabled = None       # None = todas las clases
+        self.enabled_ids = set(range(len(classes)))
+        self.min_distance = 0.0
+        self.max_distance = math.inf
+        self._mtime = None
+        self._next_check = 0.0
+        self._ino = None
+        if path is None:
+            return
+        try:
+            ino = Inotify()
+            ino.add_watch(os.path.dirname(path) or '.', IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE)
+            self._ino = ino
+        except OSError:
+            pass
+        self.reload()
+
+    def reload(self):
+        try:
+            self._mtime = os.path.getmtime(self.path)
+            with open(self.path, 'r', encoding='utf-8') as f:
+                cfg = json.load(f)
+        except (OSError, ValueError) as e:
+            # Sin config (o a medio escribir): se mantiene lo ultimo valido
+            print(f"[CFG] No se pudo leer {self.path}: {e}")
+            return
+        alerts = cfg.get("alerts_enabled")
+        if isinstance(alerts, list):
+            self.alerts_enabled = set(str(x) for x in alerts)
+            self.enabled_ids = {i for i, c in enumerate(self.classes) if c in self.alerts_enabled}
+        else:
+            self.alerts_enabled = None
+            self.enabled_ids = set(range(len(self.classes)))
+        try:
+            self.min_distance = float(cfg.get("min_distance", 0.0))
+            self.max_distance = float(cfg.get("max_distance", math.inf))
+        except (TypeError, ValueError):
+            self.min_distance, self.max_distance = 0.0, math.inf
+        print(f"[CFG] alerts={sorted(self.alerts_enabled) if self.alerts_enabled is not None else 'todas'} "
+              f"ventana=[{self.min_distance}, {self.max_distance}] m")
+
+    def poll(self) -> bool:
+        """Recarga si config.json cambio. Devuelve True si hubo recarga."""
+        if self.path is None:
+            return False
+        name = os.path.basename(self.path)
+        if self._ino is not None:
+            if any(n == name for _wd, _m, n in self._ino.read_events()):
+                self.reload()
+                return True
+            return False
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.check_every
+        try:
+            m = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        if m != self._mtime:
+            self.reload()
+            return True
+        return False
+
+    def class_enabled(self, label: str) -> bool:
+        return self.alerts_enabled is None or label in self.alerts_enabled
+
+    def in_window(self, distance_m: float) -> bool:
+        """
+        Si se avisa un obstaculo a `distance_m` m. Solo se descarta lo que esta
+        mas lejos que max_distance. Mas cerca que min_distance se avisa igual,
+        con la distancia real (ble_server lo manda como urgente bajo
+        NAVICAP_NOTIFY_URGENT_M). Sin eco del HC-SR04 (inf) la distancia es
+        desconocida y se avisa lo que ve la camara.
+        """
+        if math.isinf(distance_m) or math.isnan(distance_m):
+            return True
+        return distance_m <= self.max_distance
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Conversor offline: yolov4-tiny-custom.cfg/.weights (Darknet) -> ONNX, con
+cuantizacion INT8 post-entrenamiento opcional y chequeo de paridad contra
+el camino OpenCV/Darknet.
+
+La red exportada termina en las convoluciones previas a cada [yolo] (cabezas
+crudas); la decodificacion la hace navicap_backends.decode_head. BatchNorm se
+pliega en las convoluciones. Entrada 'images' NCHW con lote, alto y ancho dinamicos
+(los tiles de navicap_tiles van en un solo lote).
+
+Ejemplos:
+    python3 navicap_convert.py --out yolov4-tiny-custom.onnx
+    python3 navicap_convert.py --out yolov4-tiny-custom.onnx \\
+        --int8 yolov4-tiny-custom.int8.onnx --calib frames/ --size 416
+    python3 navicap_convert.py --out yolov4-tiny-custom.onnx --check-parity frames/
+
+Requiere `onnx` (y `onnxruntime` para --int8 / --check-parity); no hacen falta
+en la Raspberry si el .onnx se genera en otro equipo.
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+import numpy as np
+
+from navicap_backends import parse_cfg
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BN_EPS = 1e-5
+# Sube cuando cambia el grafo exportado (invalida los .onnx de navicap_startup.ModelCache)
+CONVERT_VERSION = 2
+
+
+class _Weights:
+    """Lector secuencial del .weights de Darknet."""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            major, minor, _rev = np.frombuffer(f.read(12), dtype=np.int32)
+            seen_bytes = 8 if (major * 10 + minor) >= 2 and major < 1000 and minor < 1000 else 4
+            f.read(seen_bytes)
+            self.data = np.frombuffer(f.read(), dtype=np.float32)
+        self.pos = 0
+
+    def take(self, n: int) -> np.ndarray:
+        if self.pos + n > len(self.data):
+            raise ValueError("El .weights es mas corto de lo que pide el .cfg")
+        out = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return out
+
+    @property
+    def left(self) -> int:
+        return len(self.data) - self.pos
+
+
+def darknet_to_onnx(cfg_path: str, wts_path: str, opset: int = 13):
+    """Construye el ModelProto ONNX equivalente a la red Darknet."""
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    sections = parse_cfg(cfg_path)
+    if not sections or sections[0]['type'] not in ('net', 'network'):
+        raise ValueError("El .cfg debe empezar con [net]")
+    wts = _Weights(wts_path)
+
+    nodes, inits, outputs = [], [], []
+    names, chans = [], []        # tensor de salida y canales de cada capa
+    cur, c = 'images', int(sections[0].get('channels', 3))
+
+    def const(name, arr):
+        inits.append(numpy_helper.from_array(np.asarray(arr), name))
+        return name
+
+    for i, s in enumerate(sections[1:]):
+        t = s['type']
+        out = f'l{i}_{t}'
+        if t == 'convolutional':
+            f_ = int(s['filters']); k = int(s['size']); st = int(s.get('stride', 1))
+            pad = k // 2 if int(s.get('pad', 0)) else int(s.get('padding', 0))
+            bn = int(s.get('batch_normalize', 0))
+            if bn:
+                beta, gamma = wts.take(f_), wts.take(f_)
+                mean, var = wts.take(f_), wts.take(f_)
+            else:
+                beta = wts.take(f_)
+            w = wts.take(f_ * c * k * k).reshape(f_, c, k, k)
+            if bn:
+                scale = gamma / np.sqrt(var + BN_EPS)
+                w = w * scale[:, None, None, None]
+                b = beta - mean * scale
+            else:
+                b = beta
+            wn = const(f'{out}_W', w.astype(np.float32))
+            bname = const(f'{out}_B', b.astype(np.float32))
+            act = s.get('activation', 'linear')
+            conv_out = out if act == 'linear' else f'{out}_pre'
+            nodes.append(helper.make_node('Conv', [cur, wn, bname], [conv_out], kernel_shape=[k, k],
+                                          strides=[st, st], pads=[pad, pad, pad, pad]))
+            if act == 'leaky':
+                nodes.append(helper.make_node('LeakyRelu', [conv_out], [out], alpha=0.1))
+            elif act == 'relu':
+                nodes.append(helper.make_node('Relu', [conv_out], [out]))
+            elif act == 'mish':
+                sp = f'{out}_sp'; th = f'{out}_th'
+                nodes.append(helper.make_node('Softplus', [conv_out], [sp]))
+                nodes.append(helper.make_node('Tanh', [sp], [th]))
+                nodes.append(helper.make_node('Mul', [conv_out, th], [out]))
+            elif act != 'linear':
+                raise ValueError(f"Activacion no soportada: {act}")
+            c = f_
+        elif t == 'route':
+            idx = [int(x) for x in s['layers'].split(',')]
+            idx = [j if j >= 0 else i + j for j in idx]
+            groups = int(s.get('groups', 1)); gid = int(s.get('group_id', 0))
+            if len(idx) == 1:
+                src, sc = names[idx[0]], chans[idx[0]]
+                if groups > 1:
+                    part = sc // groups
+                    nodes.append(helper.make_node(
+                        'Slice', [src, const(f'{out}_st', np.array([gid * part], np.int64)),
+                                  const(f'{out}_en', np.array([(gid + 1) * part], np.int64)),
+                                  const(f'{out}_ax', np.array([1], np.int64))], [out]))
+                    c = part
+                else:
+                    nodes.append(helper.make_node('Identity', [src], [out]))
+                    c = sc
+            else:
+                nodes.append(helper.make_node('Concat', [names[j] for j in idx], [out], axis=1))
+                c = sum(chans[j] for j in idx)
+        elif t == 'maxpool':
+            k = int(s['size']); st = int(s.get('stride', 1))
+            p = int(s.get('padding', k - 1))
+            nodes.append(helper.make_node('MaxPool', [cur], [out], kernel_shape=[k, k], strides=[st, st],
+                                          pads=[p // 2, p // 2, p - p // 2, p - p // 2]))
+        elif t == 'upsample':
+            st = float(s.get('stride', 2))
+            nodes.append(helper.make_node('Resize', [cur, '', const(f'{out}_sc', np.array([1, 1, st, st], np.float32))],
+                                          [out], mode='nearest'))
+        elif t == 'yolo':
+            # La cabeza es la salida de la capa anterior
+            head = f'yolo_{len(outputs)}'
+            nodes.append(helper.make_node('Identity', [cur], [head]))
+            n = len(outputs)
+            outputs.append(helper.make_tensor_value_info(head, TensorProto.FLOAT, ['batch', c, f'h{n}', f'w{n}']))
+        else:
+            raise ValueError(f"Capa no soportada: [{t}]")
+        names.append(out if t != 'yolo' else cur)
+        chans.append(c)
+        cur = names[-1]
+
+    if wts.left:
+        print(f"[CONV] Aviso: sobran {wts.left} floats en el .weights")
+    inp = helper.make_tensor_value_info('images', TensorProto.FLOAT, ['batch', int(sections[0].get('channels', 3)),
+                                                                     'height', 'width'])
+    graph = helper.make_graph(nodes, 'yolov4_tiny_navicap', [inp], outputs, initializer=inits)
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', opset)],
+                              producer_name='navicap_convert')
+    model.ir_version = 8  # lo soportan onnxruntime/OpenCV viejos (Raspberry Pi OS)
+    onnx.checker.check_model(model)
+    return model
+
+
+def _sample_frames(folder: str, limit: int):
+    import cv2
+    paths = sorted(p for ext in ('jpg', 'jpeg', 'png', 'bmp')
+                   for p in glob.glob(os.path.join(folder, f'*.{ext}')))
+    for p in paths[:limit]:
+        frame = cv2.imread(p, cv2.IMREAD_COLOR)
+        if frame is not None:
+            yield p, frame
+
+
+def quantize_int8(fp32_path: str, int8_path: str, calib_dir: str, size: int, limit: int = 100):
+    """Cuantizacion estatica INT8 (QDQ, pesos por canal) calibrada con frames de ejemplo."""
+    import cv2
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_static)
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._it = (
+                {'images': cv2.dnn.blobFromImage(f, 1/255.0, (size, size), swapRB=True, crop=False)}
+                for _p, f in _sample_frames(calib_dir, limit)
+            )
+
+        def get_next(self):
+            return next(self._it, None)
+
+    quantize_static(fp32_path, int8_path, _Reader(), quant_format=QuantFormat.QDQ,
+                    per_channel=True, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+
+def check_parity(cfg_path: str, wts_path: str, onnx_path: str, folder: str, size: int,
+                 conf: float = 0.25, nms: float = 0.35, limit: int = 20) -> dict:
+    """
+    Compara ONNX vs OpenCV/Darknet sobre imagenes: diferencia maxima de las filas
+    decodificadas y cuantas detecciones finales coinciden (misma clase, IoU >= 0.9).
+    """
+    import cv2
+    from navicap_backends import OnnxRuntimeBackend, OpenCVDarknetBackend
+    from navicap_track import iou
+
+    ref = OpenCVDarknetBackend(cfg_path, wts_path, size)
+    test = OnnxRuntimeBackend(onnx_path, cfg_path, size)
+    out_names = ref.net.getUnconnectedOutLayersNames()
+    max_diff, total, matched = 0.0, 0, 0
+    for _p, frame in _sample_frames(folder, limit):
+        blob = cv2.dnn.blobFromImage(frame, 1/255.0, (size, size), swapRB=True, crop=False)
+        ref.net.setInput(blob)
+        rows_ref = np.concatenate([o.reshape(-1, o.shape[-1]) for o in ref.net.forward(out_names)], axis=0)
+        rows_test = test.forward_blob(blob)
+        # Solo se comparan coordenadas y objectness: OpenCV pone en 0 los scores bajo su umbral interno
+        max_diff = max(max_diff, float(np.abs(rows_ref[:, :5] - rows_test[:, :5]).max()))
+        r_ids, r_conf, r_box = ref.detect(frame, conf, nms)
+        t_ids, t_conf, t_box = test.detect(frame, conf, nms)
+        r_ids = np.array(r_ids).reshape(-1); t_ids = np.array(t_ids).reshape(-1)
+        total += len(r_ids)
+        for cid, b in zip(r_ids, np.array(r_box).reshape(-1, 4)):
+            if any(tc == cid and iou(tuple(b), tuple(tb)) >= 0.9
+                   for tc, tb in zip(t_ids, np.array(t_box).reshape(-1, 4))):
+                matched += 1
+    return {"max_row_diff": max_diff, "ref_detections": total, "matched": matched}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Darknet -> ONNX (+INT8) para NaviCap")
+    parser.add_argument("--cfg", default=os.path.join(HERE, 'yolov4-tiny-custom.cfg'))
+    parser.add_argument("--weights", default=os.path.join(HERE, 'yolov4-tiny-custom_best.weights'))
+    parser.add_argument("--out", default=os.path.join(HERE, 'yolov4-tiny-custom.onnx'))
+    parser.add_argument("--int8", default=None, help="Ruta del modelo INT8 a generar")
+    parser.add_argument("--calib", default=None, help="Carpeta con frames para calibrar INT8")
+    parser.add_argument("--calib-limit", type=int, default=100)
+    parser.add_argument("--size", type=int, default=416, help="Tamaño de entrada para calibrar/comparar")
+    parser.add_argument("--check-parity", default=None, metavar="DIR",
+                        help="Compara el .onnx (y el INT8 si se genero) contra OpenCV/Darknet")
+    args = parser.parse_args(argv)
+
+    import onnx
+    model = darknet_to_onnx(args.cfg, args.weights)
+    onnx.save(model, args.out)
+    print(f"[CONV] ONNX FP32 escrito en {args.out}")
+
+    if args.int8:
+        if not args.calib:
+            raise SystemExit("--int8 necesita --calib con frames de ejemplo")
+        quantize_int8(args.out, args.int8, args.calib, args.size, args.calib_limit)
+        print(f"[CONV] ONNX INT8 escrito en {args.int8}")
+
+    if args.check_parity:
+        for path in filter(None, (args.out, args.int8)):
+            res = check_parity(args.cfg, args.weights, path, args.check_parity, args.size)
+            print(f"[CONV] paridad {os.path.basename(path)}: {res}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,10 +4,27 @@ import os
 # Evitar backend GStreamer en OpenCV (reduce warnings/errores en RPi)
 os.environ.setdefault('OPENCV_VIDEOIO_PRIORITY_GSTREAMER', '0')
 
-import time, math, statistics
+import time
 import cv2
-import RPi.GPIO as GPIO
 from navicap_publish import push_obstacle
+from navicap_capture import LatestFrameGrabber
+from navicap_ranging import UltrasonicRanger, make_backend
+from navicap_classes import load_classes
+from navicap_track import IoUTracker, DetectScheduler, SCENE_DIFF
+from navicap_governor import Governor, SIZES
+from navicap_config import DetectorConfig
+from navicap_backends import BACKEND, ONNX_PATH, detect_staged, make_backend as make_model_backend
+from navicap_post import ClassTable, as_arrays
+from navicap_traffic import TrafficLightState
+# Prints por deteccion ([DET], [TL]) fuera del camino caliente salvo NAVICAP_DEBUG=1
+from navicap_log import install_sigterm, DEBUG
+from navicap_pipeline import PIPELINE, PipelineEngine, AsyncPublisher
+from navicap_startup import ModelCache, StartupTimer, warm_up, warmup_sizes
+from navicap_metrics import METRICS, DIAG_EVERY, detector_summary, serve as serve_metrics
+from navicap_publish import push_diag, open_channels
+from navicap_tiles import TILES, TILE_BASE
+from navicap_preproc import MjpgDecoder, decode_reduction
+from navicap_thermal import make_scheduler as make_thermal
 
 # ---------- Paths ----------
 BASE  = os.path.expanduser('~/navicap')
@@ -21,234 +38,357 @@ FRAME_W, FRAME_H, FPS = 640, 480, 15
 
 # ---------- HC-SR04 (modo BCM) ----------
 TRIG_PIN, ECHO_PIN = 23, 24
-
-# ---------- Aliases de clases ----------
-ALIASES = {
-    "persona": "person", "person": "person",
-    "perro": "dog", "dog": "dog",
-    "bicicleta": "bicycle", "bicycle": "bicycle",
-    "auto": "car", "car": "car",
-    "moto": "motorcycle", "motorcycle": "motorcycle",
-    "puerta": "door", "door": "door",
-    "escalera": "stairs", "stairs": "stairs",
-    "escalera_mecanica": "escalator", "escalator": "escalator",
-    "semaforo": "traffic_light", "semaforo": "traffic_light", "traffic light": "traffic_light",
-    "semáforo": "traffic_light",
-    "traffic_light": "traffic_light",
-    "arbol": "tree", "arbol": "tree", "tree": "tree", "árbol": "tree"
-}
-OBSTACLE_GROUP = {"person", "stairs", "motorcycle", "door", "escalator"}
-
-def normalize(lbl: str) -> str:
-    return ALIASES.get(lbl.strip(), lbl.strip())
-
-# ---------- Cargar clases ----------
-with open(NAMES, 'r', encoding='utf-8', errors='ignore') as f:
-    CLASSES = [normalize(x) for x in f.read().splitlines() if x.strip()]
+GPIO_BACKEND = os.getenv('NAVICAP_GPIO', 'rpi')              # 'pigpio' (ticks de hardware) o 'fake' sin RPi.GPIO
+RANGE_PERIOD = float(os.getenv('NAVICAP_RANGE_PERIOD', '0.06'))  # s entre pings
 
 # ---------- YOLO tiny (OpenCV DNN) ----------
-net = cv2.dnn.readNetFromDarknet(CFG, WTS)
-net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
-net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
-
-# Tamaño mayor mejora objetos chicos (semaforitos)
+# Tamaño inicial; luego el gobernador elige entre NAVICAP_YOLO_SIZES segun latencia/contexto
 INPUT_SIZE = int(os.getenv('NAVICAP_YOLO_SIZE', '608'))  # prueba 736 si aun cuesta
-model = cv2.dnn_DetectionModel(net)
-model.setInputParams(size=(INPUT_SIZE, INPUT_SIZE), scale=1/255.0, swapRB=True)
 
 # Umbrales por clase
 CONF_GENERAL = 0.35
 CONF_TLIGHT  = 0.12   # mas permisivo para semaforo
 NMS          = 0.35
 
-def open_camera(idx: int):
+# Etapas de una pasada de YOLO (Detector.times / METRICS "stage_*"); "detect" es su suma
+DETECT_STAGES = ("preprocess", "forward", "nms", "detect")
+
+def build_model(cfg_path: str = CFG, wts_path: str = WTS, size: int = INPUT_SIZE,
+                backend: str = BACKEND, onnx_path: str = ONNX_PATH, cache: ModelCache | None = None):
+    """
+    Crea el backend de inferencia (no toca camara ni GPIO). NAVICAP_BACKEND=opencv
+    usa los pesos Darknet; =onnx usa el modelo de navicap_convert.py (FP32 o INT8).
+    """
+    return make_model_backend(**model_args(cfg_path, wts_path, size, backend, onnx_path, cache))
+
+def model_args(cfg_path: str = CFG, wts_path: str = WTS, size: int = INPUT_SIZE,
+               backend: str = BACKEND, onnx_path: str = ONNX_PATH, cache: ModelCache | None = None,
+               tiles: bool = TILES) -> dict:
+    """
+    Argumentos de make_backend (los workers de navicap_pipeline arman su propio
+    modelo). Con `cache` y backend onnx: si falta el .onnx se convierte desde
+    cfg/weights, y ORT reusa su grafo optimizado entre arranques. `tiles`:
+    frame completo a baja resolucion + recortes (navicap_tiles).
+    """
+    args = {"name": backend, "cfg_path": cfg_path, "wts_path": wts_path, "size": size,
+            "onnx_path": onnx_path, "min_thresh": min(CONF_GENERAL, CONF_TLIGHT), "tiles": tiles}
+    if cache is not None and backend == 'onnx':
+        if not os.path.exists(onnx_path):
+            args["onnx_path"] = cache.onnx_for(cfg_path, wts_path) or onnx_path
+        if os.path.exists(args["onnx_path"]):
+            args["optimized_path"] = cache.ort_optimized_for(args["onnx_path"])
+    return args
+
+def open_camera(idx: int, raw_mjpg: bool = False):
     cap = cv2.VideoCapture(idx, cv2.CAP_V4L2)
     if not cap.isOpened():
         cap = cv2.VideoCapture(idx)  # fallback
     # Preferir MJPG (si la camara lo soporta)
     cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    if raw_mjpg:
+        # JPEG sin decodificar: lo decodifica reducido navicap_preproc.MjpgDecoder
+        cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
     cap.set(cv2.CAP_PROP_FRAME_WIDTH,  FRAME_W)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_H)
     cap.set(cv2.CAP_PROP_FPS,          FPS)
+    # Cola V4L2 minima: el hilo de captura ya guarda el ultimo frame
+    cap.set(cv2.CAP_PROP_BUFFERSIZE,   1)
     return cap
 
-cap = open_camera(CAM_INDEX)
-
-# ---------- HC-SR04 ----------
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(TRIG_PIN, GPIO.OUT)
-GPIO.setup(ECHO_PIN, GPIO.IN)
-GPIO.output(TRIG_PIN, GPIO.LOW)
-time.sleep(0.05)
-
-def distance_m(samples=3, timeout=0.03) -> float:
-    vals = []
-    for _ in range(samples):
-        GPIO.output(TRIG_PIN, True); time.sleep(10e-6); GPIO.output(TRIG_PIN, False)
-        t0 = time.monotonic()
-        while GPIO.input(ECHO_PIN) == 0:
-            if time.monotonic() - t0 > timeout:
-                break
-        start = time.monotonic()
-        while GPIO.input(ECHO_PIN) == 1:
-            if time.monotonic() - start > timeout:
-                break
-        dur = time.monotonic() - start
-        d = (dur * 343.0) / 2.0  # ida/vuelta
-        if 0.02 <= d <= 5.0:
-            vals.append(d)
-        time.sleep(0.005)
-    return statistics.median(vals) if vals else math.inf
-
-# ---------- Color de semaforo ----------
-def traffic_color_hsv(frame, box):
-    x, y, w, h = map(int, box)
-    # Ampliar ROI 25% para capturar el foco completo
-    pad = int(max(w, h) * 0.25)
-    x0 = max(0, x - pad); y0 = max(0, y - pad)
-    x1 = min(frame.shape[1], x + w + pad)
-    y1 = min(frame.shape[0], y + h + pad)
-    roi = frame[y0:y1, x0:x1]
-    if roi.size == 0:
-        return 'unknown'
-    hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-
-    # Rangos tolerantes
-    red1  = cv2.inRange(hsv, (0,   70, 80), (10, 255, 255))
-    red2  = cv2.inRange(hsv, (165, 70, 80), (180,255, 255))
-    green = cv2.inRange(hsv, (35,  60, 80), (90, 255, 255))
-    rpx = cv2.countNonZero(red1) + cv2.countNonZero(red2)
-    gpx = cv2.countNonZero(green)
-
-    area = roi.shape[0] * roi.shape[1]
-    if area == 0:
-        return 'unknown'
-    # si la ROI es chica, acepta 0.5% del area
-    if max(rpx, gpx) / area < 0.005:
-        return 'unknown'
-    return 'red' if rpx > gpx else 'green'
-
-def pick_best(ids, scores, boxes):
-    best = (-1.0, None, (0, 0, 0, 0))
-    # prioriza obstaculos del grupo
-    for cid, sc, box in zip(ids, scores, boxes):
-        lbl = CLASSES[int(cid)]
-        sc  = float(sc)
-        if lbl in OBSTACLE_GROUP and sc > best[0]:
-            best = (sc, lbl, box)
-    if best[1] is not None:
-        return best[1], best[0], best[2]
-    # si no hay, el mayor score global
-    for cid, sc, box in zip(ids, scores, boxes):
-        sc  = float(sc); lbl = CLASSES[int(cid)]
-        if sc > best[0]:
-            best = (sc, lbl, box)
-    return (best[1], best[0], best[2]) if best[1] else (None, 0.0, (0, 0, 0, 0))
+class Detector:
+    """
+    Pipeline por frame, sin hardware: YOLO o tracker -> semaforo -> obstaculo
+    principal -> push. Lo usan main() (camara + HC-SR04) y navicap_bench.py
+    (video grabado + traza de distancia). `times` guarda los segundos de cada
+    etapa del ultimo frame.
+    """
+
+    def __init__(self, model, classes: list, cfg: DetectorConfig, publish=push_obstacle,
+                 input_size: int = INPUT_SIZE, governor: Governor | None = None):
+        self.model = model
+        self.classes = classes
+        self.cfg = cfg
+        self.publish = publish
+        # Umbrales, prioridad y clases activas como tablas por id
+        self.table = ClassTable(classes, CONF_GENERAL, CONF_TLIGHT)
+        self.table.set_enabled(cfg.enabled_ids)
+        # Color de semaforo por track, con votacion temporal
+        self.traffic = TrafficLightState()
+        # Detectar-y-seguir: YOLO cada NAVICAP_DETECT_EVERY frames, tracker entremedio
+        self.tracker = IoUTracker()
+        self.sched   = DetectScheduler()
+        self.sched.set_class_thresholds(self.table.conf_min, CONF_GENERAL)
+        # Gobernador: tamaño de entrada y ritmo segun latencia medida y contexto
+        self.governor = governor or Governor(sizes=sorted(set(SIZES) | {input_size}), initial=input_size)
+        self.cur_size = input_size
+        self.tl_near  = False
+        self.still_frames = 0
+        self.last_label  = 'ready'
+        self.last_traffic= 'unknown'
+        self.last_dist   = 9e9
+        self.last_push   = 0.0
+        self.times = {}
+
+    def _record(self, stage: str, seconds: float):
+        self.times[stage] = seconds
+        METRICS.observe("stage_" + stage, seconds)
+        # Las etapas de YOLO van al gobernador juntas, via record_forward
+        if stage not in DETECT_STAGES:
+            self.governor.record(stage, seconds)
+
+    def _timed(self, stage: str, t0: float) -> float:
+        t1 = time.perf_counter()
+        self._record(stage, t1 - t0)
+        return t1
+
+    def record_detect(self, size: int, stages: dict):
+        """Tiempos de una pasada de YOLO (preprocess/forward/nms) + su total como "detect"."""
+        for stage, seconds in stages.items():
+            self._record(stage, seconds)
+        total = sum(stages.values())
+        self._record("detect", total)
+        self.governor.record_forward(size, total)
+        return total
+
+    def begin(self) -> float:
+        """Inicio de frame: recarga config.json si cambio. Devuelve el reloj de etapas."""
+        cfg, tracker = self.cfg, self.tracker
+        self.times = {}
+        METRICS.inc("frames")
+        if cfg.poll():
+            # Clases recien desactivadas: sus tracks no deben seguir publicandose
+            tracker.tracks = [tr for tr in tracker.tracks if tr.cid in cfg.enabled_ids]
+            self.table.set_enabled(cfg.enabled_ids)
+        return time.perf_counter()
+
+    def choose_size(self) -> int:
+        """Tamaño de entrada para la proxima pasada de YOLO (gobernador + contexto)."""
+        # Escena quieta: pocos cambios de imagen y de distancia varios frames seguidos
+        static = self.still_frames >= 5
+        return self.governor.choose(tl_near_threshold=self.tl_near, static=static)
+
+    def apply_detections(self, frame, frame_ts: float, ids, confs, boxes):
+        """Corrige el tracker con una pasada de YOLO hecha sobre `frame` (tomado en `frame_ts`)."""
+        if DEBUG:
+            for i in range(min(5, len(ids))):
+                print(f"[DET] {i}: {self.classes[ids[i]]} conf={confs[i]:.2f}")
+        # El tracker asocia en Python puro: escalares nativos, no np.int32
+        self.tracker.update(ids.tolist(), confs.tolist(), boxes.tolist(), frame_ts)
+        self.sched.mark(frame, True)
+
+    def step(self, frame, frame_ts: float, dist: float) -> dict:
+        """Procesa un frame con la distancia actual (modo serie). Devuelve lo decidido (y si hubo push)."""
+        t = self.begin()
+        detected = self.sched.need_detect(frame, self.tracker)
+        if detected:
+            size = self.choose_size()
+            if size != self.cur_size:
+                self.model.setInputSize(size, size)
+                self.cur_size = size
+            t = self._timed("sched", t)
+            # Una sola pasada: umbral propio por clase (semaforo 0.12, resto 0.35,
+            # desactivadas nunca) y NMS por clase; cada etapa se mide aparte
+            dets, stages = detect_staged(self.model, frame, self.table.detect_thresholds, NMS)
+            ids, confs, boxes = as_arrays(*dets)
+            self.record_detect(self.cur_size, stages)
+            t = time.perf_counter()
+            self.apply_detections(frame, frame_ts, ids, confs, boxes)
+        else:
+            self.tracker.predict(frame_ts)
+            self.sched.mark(frame, False)
+        return self.finish(frame, frame_ts, dist, detected, t)
+
+    def finish(self, frame, frame_ts: float, dist: float, detected: bool, t: float) -> dict:
+        """Semaforo, obstaculo principal y push a partir de los tracks vivos."""
+        CLASSES, cfg, tracker, sched, table = self.classes, self.cfg, self.tracker, self.sched, self.table
+
+        # Desde aqui se trabaja con los tracks vivos (cajas suavizadas/predichas)
+        ids, confs, boxes = as_arrays(*tracker.detections())
+        t = self._timed("track", t)
+
+        # --- Semaforo: umbral propio + filtros geometricos, en una sola mascara ---
+        now = frame_ts
+        best_sc = 0.0
+        bi = table.best_traffic_light(ids, confs, boxes, frame.shape[1], frame.shape[0])
+        if bi >= 0:
+            best_box, best_sc = tuple(boxes[bi].tolist()), float(confs[bi])
+            # Votacion por track; si la caja no se movio se reusa el ultimo color
+            traffic, tl_conf = self.traffic.update(frame, best_box, tracker.live_ids()[bi], now)
+            if DEBUG:
+                print(f"[TL] conf={best_sc:.2f} color={traffic} ({tl_conf:.2f}) box={best_box}")
+        else:
+            # Sin semaforo en este frame: se mantiene el ultimo color un rato
+            traffic, _ = self.traffic.current(now)
+        # Semaforo dudoso (confianza baja o color sin decidir): pedir alta resolucion
+        self.tl_near = bi >= 0 and (best_sc < CONF_GENERAL + 0.1 or traffic == 'unknown')
+        t = self._timed("hsv", t)
+
+        # --- Obstaculo principal para publicar (estable por ID de track) ---
+        label, score, box, _tid = tracker.main_obstacle(CLASSES, table.priority)
+        if label is None:
+            label = 'none'
+        # Mas lejos que max_distance de la app: no se alerta (mas cerca o sin eco si)
+        out_of_window = label != 'none' and not cfg.in_window(dist)
+        if out_of_window:
+            label, score = 'none', 0.0
+
+        last_dist = self.last_dist
+        quiet = sched.scene.last_diff < SCENE_DIFF / 3 and (dist == last_dist or abs(dist - last_dist) < 0.1)
+        self.still_frames = self.still_frames + 1 if quiet else 0
+
+        changed = (label != self.last_label) or (traffic != self.last_traffic) or (abs(dist - last_dist) > 0.15)
+        # Si solo se suprimio por la ventana, no repetir el push periodico
+        timed   = (now - self.last_push) >= 0.7 and not out_of_window
+        t = self._timed("post", t)
+
+        pushed = changed or timed
+        if pushed:
+            # IMPORTANTE: distancia en METROS. Ej: 0.17 -> 17 cm
+            self.publish(label, float(f"{dist:.2f}"), traffic,
+                         confidence=score if label != 'none' else None, frame_ts=frame_ts)
+            self.last_label, self.last_dist, self.last_traffic, self.last_push = label, dist, traffic, now
+        self._timed("publish", t)
+
+        return {"label": label, "distance": dist, "traffic": traffic, "score": score,
+                "detected": detected, "pushed": pushed}
+
 
 def main():
-    global cap
-    if not cap.isOpened():
+    # systemd stop -> SystemExit: se cierran camara/GPIO y se vacia el log
+    install_sigterm()
+    # Carpeta de logs, socket hacia ble_server y log de obstaculos (no al importar)
+    open_channels()
+    boot = StartupTimer()
+    classes = load_classes(NAMES)
+    # Con tiles el frame completo va a baja resolucion fija; el detalle lo dan los recortes
+    size = TILE_BASE if TILES else INPUT_SIZE
+    governor = Governor(sizes=(size,), initial=size) if TILES else None
+    margs = model_args(size=size, cache=ModelCache())
+    boot.mark("classes+cache")
+    # config.json (la escribe la app via ble_server): clases activas y ventana de distancia
+    engine = None
+    if PIPELINE == 'serial':
+        det = Detector(make_model_backend(**margs), classes, DetectorConfig(classes),
+                       input_size=size, governor=governor)
+        boot.mark("model")
+        # Primera inferencia en frio antes de abrir la camara
+        warm_up(det.model, warmup_sizes(size, det.governor.sizes), (FRAME_H, FRAME_W, 3))
+        boot.mark("warmup")
+    else:
+        # Workers de inferencia antes de abrir camara/GPIO (spawn: cargan el modelo aparte)
+        det = Detector(None, classes, DetectorConfig(classes), publish=AsyncPublisher(push_obstacle),
+                       input_size=size, governor=governor)
+        engine = PipelineEngine(det, margs, frame_bytes=FRAME_W * FRAME_H * 3, nms=NMS,
+                                warm_sizes=warmup_sizes(size, det.governor.sizes))
+        if not engine.start():
+            engine.stop()
+            raise SystemExit("No arrancaron los workers de inferencia (prueba NAVICAP_PIPELINE=serial).")
+        print(f"[PIPE] {engine.workers} worker(s) de inferencia listos {engine.boot}")
+        boot.mark("workers")
+    process = engine.process if engine is not None else det.step
+
+    # Decodificacion MJPG reducida si ningun tamaño de entrada necesita el frame completo
+    # (con tiles los recortes si lo necesitan)
+    reduction = 1 if TILES else decode_reduction(FRAME_W, FRAME_H, max(det.governor.sizes))
+    decoder = MjpgDecoder(reduction) if reduction > 1 else None
+    if decoder is not None:
+        print(f"[CAP] MJPG decodificado a 1/{reduction}")
+    grabber = LatestFrameGrabber(lambda: open_camera(CAM_INDEX, raw_mjpg=decoder is not None),
+                                 decode=decoder)
+    if not grabber.start():
         print("[NAVICAP] Camara no abierta, reintentando?")
-        cap = open_camera(CAM_INDEX)
-        if not cap.isOpened():
+        grabber.stop()
+        if not grabber.start():
+            grabber.stop()
             raise SystemExit("No se pudo abrir la camara. Revisa /dev/video* y permisos.")
-
-    last_label  = 'ready'
-    last_traffic= 'unknown'
-    last_dist   = 9e9
-    last_push   = 0.0
-    last_tl_seen = 0.0
-
+    boot.mark("camera")
+
+    # HC-SR04 en su propio hilo; el loop solo lee la ultima distancia filtrada
+    ranger = UltrasonicRanger(make_backend(GPIO_BACKEND), TRIG_PIN, ECHO_PIN, period=RANGE_PERIOD)
+    ranger.start()
+    boot.mark("ranger")
+
+    # Temperatura/throttling (sysfs): baja tamaño, ritmo de YOLO y pings antes del techo
+    thermal = make_thermal(det.governor, det.sched, ranger)
+
+    # Metricas: los contadores de captura/sensor/planificador se leen al consultar
+    METRICS.collect("capture", grabber.stats)
+    METRICS.collect("ranging", ranger.stats)
+    METRICS.collect("sched", lambda: {"yolo": det.sched.full, "tracked": det.sched.tracked,
+                                      "input_size": det.cur_size})
+    if engine is not None:
+        METRICS.collect("pipeline", lambda: {f"{stage}_{k}": v for stage, st in engine.stats().items()
+                                             for k, v in st.items()})
+    if thermal is not None:
+        METRICS.collect("thermal", thermal.stats)
+    metrics_srv = serve_metrics("detect")
+
+    governor = det.governor
+    first_frame = first_det = False
+    last_stats = last_diag = time.monotonic()
 
     try:
         while True:
-            ok, frame = cap.read()
-            if not ok:
-                cap.release()
-                time.sleep(0.2)
-                cap = open_camera(CAM_INDEX)
+            # Siempre el frame mas nuevo; el hilo de captura reabre la camara si falla
+            t_wait = time.perf_counter()
+            frame, frame_ts = grabber.read(timeout=1.0)
+            if frame is None:
                 continue
-
-            ids, confs, boxes = model.detect(
-                frame,
-                confThreshold=min(CONF_GENERAL, 0.99),
-                nmsThreshold=NMS
-            )
-
-            # A listas planas
-            ids   = ids.flatten().tolist()   if len(ids)   else []
-            confs = [float(x) for x in (confs.flatten().tolist() if len(confs) else [])]
-            boxes = [tuple(map(int, b)) for b in (boxes if len(boxes) else [])]
-
-            # Debug (primeras 5 detecciones)
-            for i, (cid, sc) in enumerate(zip(ids, confs)):
-                if i >= 5: break
-                print(f"[DET] {i}: {CLASSES[int(cid)]} conf={float(sc):.2f}")
-
-            dist = distance_m(samples=3)
-
-            # --- Semaforo: buscar candidatos con umbral propio ---
-            # --- Semaforo: buscar candidatos con umbral propio + filtros geomotricos ---
-            traffic = 'unknown'
-            tl_candidates = []
-            frame_area = frame.shape[0] * frame.shape[1]
-
-            for cid, sc, box in zip(ids, confs, boxes):
-                lbl = CLASSES[int(cid)]
-                if lbl != 'traffic_light': 
-                    continue
-                sc = float(sc)
-                if sc < CONF_TLIGHT:
-                    continue
-                x,y,w,h = map(int, box)
-                area = w*h
-                if area/frame_area < 0.0015:   
-                    continue
-                ar = h/max(1,w)                # aspect ratio (alto/ancho)
-                if ar < 1.1:                   # suelen ser mas altos que anchos
-                    continue
-                # opcional: preferir lo alto del frame (semaforos arriba)
-                score = sc + 0.05*(y < frame.shape[0]*0.6)
-                tl_candidates.append((score, box, sc))
-
-            if tl_candidates:
-                tl_candidates.sort(key=lambda x: x[0], reverse=True)
-                _, best_box, best_sc = tl_candidates[0]
-                traffic = traffic_color_hsv(frame, best_box)
-                print(f"[TL] conf={best_sc:.2f} color={traffic} box={best_box}")
-            
-            now = time.monotonic()
-            if traffic != 'unknown':
-                last_tl_seen = now
-            else:
-                # si hace muy poquito lo vimos, mantenlo
-                if now - last_tl_seen < 0.8:
-                    traffic = last_traffic
-
-
-            # --- Obstaculo principal para publicar ---
-            label, score, box = pick_best(ids, confs, boxes)
-            if label is None:
-                label = 'none'
-
-            now = time.monotonic()
-            changed = (label != last_label) or (traffic != last_traffic) or (abs(dist - last_dist) > 0.15)
-            timed   = (now - last_push) >= 0.7
-
-            if changed or timed:
-                # IMPORTANTE: distancia en METROS. Ej: 0.17 -> 17 cm
-                push_obstacle(label, float(f"{dist:.2f}"), traffic)
-                last_label, last_dist, last_traffic, last_push = label, dist, traffic, now
-
-            time.sleep(0.02)
+            t_loop = time.perf_counter()
+            governor.record("wait", t_loop - t_wait)
+            # Edad del frame al empezar a procesarlo (captura + espera en el slot)
+            METRICS.observe("capture_age", time.monotonic() - frame_ts)
+
+            if frame_ts - last_stats >= 60.0:
+                print(f"[CAP] stats {grabber.stats()} yolo={det.sched.full} track={det.sched.tracked}")
+                print(f"[GOV] size={det.cur_size} switches={governor.switches} ms={governor.stages()}")
+                if engine is not None:
+                    print(f"[PIPE] stats {engine.stats()}")
+                if thermal is not None:
+                    print(f"[THERM] stats {thermal.stats()}")
+                last_stats = frame_ts
+            if frame_ts - last_diag >= DIAG_EVERY:
+                push_diag(detector_summary())
+                last_diag = frame_ts
+
+            dist = ranger.distance()
+            if thermal is not None:
+                thermal.update(dist)
+            out = process(frame, frame_ts, dist)
+
+            # Informe de arranque: primer frame, primera pasada de YOLO y primer aviso despues de ella
+            if not boot.done:
+                if not first_frame:
+                    first_frame = True
+                    boot.mark("first_frame")
+                if out["detected"] and not first_det:
+                    first_det = True
+                    boot.mark("first_detect")
+                if first_det and out["pushed"]:
+                    boot.first_alert()
+
+            # Pausa segun el gobernador (0 si hay movimiento; minimo del nivel termico)
+            pause = governor.frame_sleep(time.perf_counter() - t_loop)
+            if pause > 0:
+                time.sleep(pause)
     except KeyboardInterrupt:
         pass
     finally:
-        cap.release()
-        GPIO.cleanup()
+        grabber.stop()
+        ranger.stop()
+        if metrics_srv is not None:
+            metrics_srv.stop()
+        if engine is not None:
+            engine.stop()
+            det.publish.stop()
+        print(f"[CAP] stats {grabber.stats()}")
+        print(f"[RANGE] stats {ranger.stats()}")
 
 if __name__ == '__main__':
-    for p in (CFG, WTS, NAMES):
+    for p in (CFG, NAMES):
         if not os.path.exists(p):
             raise SystemExit(f"Falta archivo: {p}")
+    # Con onnx basta el .weights: el .onnx se genera en ~/navicap/cache si falta
+    if not os.path.exists(WTS) and not (BACKEND == 'onnx' and os.path.exists(ONNX_PATH)):
+        raise SystemExit(f"Falta archivo: {WTS}")
     main()
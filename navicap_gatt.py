@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Valores de caracteristicas GATT codificados una sola vez por cambio.
+
+bluezero espera listas de ints y las envuelve en dbus.Array(signature='y'),
+que se serializa byte a byte. Aca cada valor se guarda como dbus.ByteArray
+(se serializa de una como 'ay') y se reusa en lecturas, notify y heartbeat:
+
+- GattValue.bind(chr): la propiedad Value de la caracteristica apunta al
+  ByteArray cacheado, asi ReadValue la devuelve sin pasar por read_callback.
+- notify(chr, value): equivalente a chr.set_value(list(...)) sin la lista.
+
+Sin dbus-python (pruebas fuera de la Raspberry) se cae a listas de ints.
+"""
+
+try:
+    import dbus
+except ImportError:
+    dbus = None
+
+GATT_CHRC_IFACE = 'org.bluez.GattCharacteristic1'
+
+
+def to_dbus(payload: bytes):
+    """bytes -> valor listo para D-Bus ('ay')."""
+    return dbus.ByteArray(payload) if dbus is not None else list(payload)
+
+
+def notify(chr_obj, value):
+    """Publica `value` (de to_dbus) en la caracteristica: PropertiesChanged -> notify de BlueZ."""
+    if dbus is not None and hasattr(chr_obj, 'Set'):
+        chr_obj.Set(GATT_CHRC_IFACE, 'Value', value)
+    else:
+        chr_obj.set_value(list(value))
+
+
+class GattValue:
+    """Ultimo valor de una caracteristica: bytes + version D-Bus + version (sube al cambiar)."""
+
+    def __init__(self, payload: bytes = b''):
+        self.chr = None
+        self.payload = None
+        self.dbus = None
+        self.version = 0
+        self._list = None
+        self.set(payload)
+
+    def set(self, payload: bytes) -> bool:
+        """Reemplaza el valor; False si es identico (no se recodifica nada)."""
+        payload = bytes(payload)
+        if payload == self.payload:
+            return False
+        self.payload = payload
+        self.dbus = to_dbus(payload)
+        self._list = None
+        self.version += 1
+        self._store()
+        return True
+
+    def bind(self, chr_obj):
+        """Asocia la caracteristica: las lecturas salen directo de la propiedad Value."""
+        self.chr = chr_obj
+        if hasattr(chr_obj, 'props'):
+            chr_obj.read_callback = None
+            self._store()
+
+    def _store(self):
+        # Sin señal: solo deja el valor listo para el proximo ReadValue
+        if self.chr is not None and hasattr(self.chr, 'props'):
+            self.chr.props[GATT_CHRC_IFACE]['Value'] = self.dbus
+
+    def as_list(self) -> list:
+        """Lista de ints (read_callback de bluezero cuando no se puede usar bind)."""
+        if self._list is None:
+            self._list = list(self.payload)
+        return self._list
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gobernador de resolucion de entrada y ritmo de frames del detector.
+
+Mide la latencia de cada etapa (EMA) y elige, frame a frame, un tamaño de
+entrada de YOLO entre NAVICAP_YOLO_SIZES y una pausa entre frames, para
+mantener la latencia frame->alerta bajo NAVICAP_LATENCY_BUDGET:
+
+- base: el tamaño mas grande cuya latencia estimada cabe en el presupuesto
+- semaforo cerca del umbral: se permite subir a alta resolucion (hasta
+  `tl_budget_factor` x presupuesto) para confirmarlo
+- escena estatica / usuario quieto: se baja un nivel y se espacian los frames
+- limites externos (navicap_thermal): techo de tamaño y pausa minima
+"""
+
+import os
+
+SIZES = tuple(sorted(int(x) for x in os.getenv('NAVICAP_YOLO_SIZES', '320,416,608').split(',')))
+LATENCY_BUDGET = float(os.getenv('NAVICAP_LATENCY_BUDGET', '0.35'))   # s por frame
+STATIC_INTERVAL = float(os.getenv('NAVICAP_STATIC_INTERVAL', '0.25'))  # s entre frames si todo quieto
+
+
+class Governor:
+    """Elige tamaño de entrada y pausa entre frames segun latencias medidas y contexto."""
+
+    def __init__(self, sizes=SIZES, budget: float = LATENCY_BUDGET, initial: int | None = None,
+                 static_interval: float = STATIC_INTERVAL, tl_budget_factor: float = 1.6,
+                 alpha: float = 0.2, switch_after: int = 3):
+        self.sizes = tuple(sorted(sizes))
+        self.budget = budget
+        self.static_interval = static_interval
+        self.tl_budget_factor = tl_budget_factor
+        self.alpha = alpha
+        self.switch_after = switch_after
+        self.size = initial if initial in self.sizes else self.sizes[len(self.sizes) // 2]
+        self._ema = {}          # etapa -> segundos
+        self._fwd = {}          # tamaño -> segundos de forward
+        self._want = self.size
+        self._want_count = 0
+        self._static = False
+        self.switches = 0
+        self.max_size = None    # techo de tamaño (None = sin techo)
+        self.min_interval = 0.0 # s minimos entre frames
+
+    # ---------- mediciones ----------
+    def record(self, stage: str, seconds: float):
+        prev = self._ema.get(stage)
+        self._ema[stage] = seconds if prev is None else prev + self.alpha * (seconds - prev)
+
+    def record_forward(self, size: int, seconds: float):
+        prev = self._fwd.get(size)
+        self._fwd[size] = seconds if prev is None else prev + self.alpha * (seconds - prev)
+        self.record("forward", seconds)
+
+    def forward_estimate(self, size: int) -> float:
+        """Latencia de forward esperada; sin datos se escala por area desde el tamaño mas cercano."""
+        if size in self._fwd:
+            return self._fwd[size]
+        if not self._fwd:
+            return 0.0
+        ref = min(self._fwd, key=lambda s: abs(s - size))
+        return self._fwd[ref] * (size / ref) ** 2
+
+    def overhead(self) -> float:
+        """Todo lo que no es forward ni espera de camara (post-proceso, publicar...)."""
+        return sum(v for k, v in self._ema.items() if k not in ("forward", "wait"))
+
+    def stages(self) -> dict:
+        return {k: round(v * 1000.0, 1) for k, v in self._ema.items()}
+
+    def limit(self, max_size: int | None = None, min_interval: float = 0.0):
+        """Techo de tamaño y pausa minima entre frames (los fija el planificador termico)."""
+        self.max_size = max_size
+        self.min_interval = max(0.0, min_interval)
+
+    def allowed(self) -> tuple:
+        if self.max_size is None:
+            return self.sizes
+        return tuple(s for s in self.sizes if s <= self.max_size) or self.sizes[:1]
+
+    # ---------- decision ----------
+    def _fits(self, size: int, budget: float) -> bool:
+        return self.forward_estimate(size) + self.overhead() <= budget
+
+    def choose(self, tl_near_threshold: bool = False, static: bool = False) -> int:
+        """Tamaño de entrada para el proximo forward (con histeresis para no saltar)."""
+        self._static = static
+        sizes = self.allowed()
+        fitting = [s for s in sizes if self._fits(s, self.budget)] or [sizes[0]]
+        want = fitting[-1]
+        if tl_near_threshold:
+            hi = [s for s in sizes if self._fits(s, self.budget * self.tl_budget_factor)]
+            want = max(want, hi[-1] if hi else want)
+            self._want, self._want_count = want, 0
+            return self._apply(want)   # semaforo: cambiar al tiro
+        if static:
+            i = sizes.index(want)
+            want = sizes[max(0, i - 1)]
+        if want == self.size:
+            self._want_count = 0
+            return self.size
+        if want == self._want:
+            self._want_count += 1
+        else:
+            self._want, self._want_count = want, 1
+        if (self._want_count >= self.switch_after or self.size not in sizes
+                or (want < self.size and not self._fits(self.size, self.budget))):
+            return self._apply(want)
+        return self.size
+
+    def _apply(self, size: int) -> int:
+        if size != self.size:
+            self.size = size
+            self.switches += 1
+        return self.size
+
+    def frame_sleep(self, loop_seconds: float) -> float:
+        """Pausa antes del proximo frame: 0 en movimiento, hasta static_interval si todo quieto."""
+        interval = max(self.static_interval if self._static else 0.0, self.min_interval)
+        return max(0.0, interval - loop_seconds)
+
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Canal local detector -> ble_server sobre un socket Unix de datagramas.
+
+Cada deteccion viaja como un datagrama con el JSON del obstaculo. Un datagrama
+se entrega entero o no se entrega, asi que el servidor nunca ve un registro a
+medio escribir, y se despierta apenas llega (sin sondear archivos).
+"""
+
+import errno
+import json
+import os
+import socket
+
+SOCKET_PATH = os.getenv('NAVICAP_OBSTACLE_SOCK', os.path.expanduser('~/navicap/obstacle.sock'))
+MAX_DATAGRAM = 4096
+
+
+def encode_obstacle(data: dict) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def decode_obstacle(raw: bytes) -> dict:
+    return json.loads(raw.decode('utf-8'))
+
+
+class ObstacleSender:
+    """Lado detector. Nunca bloquea: si el servidor no esta o esta lleno, se descarta."""
+
+    def __init__(self, path: str = SOCKET_PATH):
+        self.path = path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.sent = 0
+        self.dropped = 0
+
+    def send(self, data: dict) -> bool:
+        try:
+            self.sock.sendto(encode_obstacle(data), self.path)
+            self.sent += 1
+            return True
+        except OSError as e:
+            # ENOENT/ECONNREFUSED: ble_server no esta corriendo
+            # EAGAIN: cola del receptor llena (el proximo push trae el dato nuevo)
+            if e.errno not in (errno.ENOENT, errno.ECONNREFUSED, errno.EAGAIN, errno.EWOULDBLOCK):
+                print(f"[IPC] ERROR enviando obstaculo: {e}")
+            self.dropped += 1
+            return False
+
+    def close(self):
+        self.sock.close()
+
+
+class ObstacleReceiver:
+    """Lado ble_server. Registrar fileno() en el loop (p.ej. GLib.io_add_watch)."""
+
+    def __init__(self, path: str = SOCKET_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        try:
+            os.unlink(path)  # socket viejo de una ejecucion anterior
+        except FileNotFoundError:
+            pass
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(path)
+        self.sock.setblocking(False)
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def drain(self) -> list:
+        """Lee todos los datagramas pendientes y devuelve los dicts validos en orden."""
+        out = []
+        while True:
+            try:
+                raw = self.sock.recv(MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                break
+            try:
+                out.append(decode_obstacle(raw))
+            except (ValueError, UnicodeDecodeError):
+                print("[IPC] datagrama invalido descartado")
+        return out
+
+    def close(self):
+        self.sock.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
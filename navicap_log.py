@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Log de eventos con buffer en memoria para no tocar la SD en cada push.
+
+Las lineas ("<ISO>Z <json>", el mismo formato de siempre) se acumulan en
+memoria y un hilo las escribe en bloque cada `flush_bytes` o `flush_every`
+segundos. El archivo rota por tamaño o antiguedad y los rotados se comprimen
+con gzip (se guardan `keep`). Al salir (atexit, SIGTERM) se vacia el buffer.
+
+Nivel (NAVICAP_LOG_LEVEL):
+    0 = nada, 1 = solo cambios, 2 = cambios + 1 de cada NAVICAP_LOG_SAMPLE
+    eventos repetidos (por defecto), 3 = todo.
+"""
+
+import atexit
+import glob
+import gzip
+import json
+import os
+import shutil
+import signal
+import threading
+import time
+from datetime import datetime
+
+LOG_DIR      = os.path.expanduser('~/navicap/logs')
+LEVEL        = int(os.getenv('NAVICAP_LOG_LEVEL', '2'))
+SAMPLE_EVERY = max(1, int(os.getenv('NAVICAP_LOG_SAMPLE', '10')))
+FLUSH_BYTES  = 64 * 1024
+FLUSH_EVERY  = float(os.getenv('NAVICAP_LOG_FLUSH_S', '10'))
+MAX_BYTES    = int(os.getenv('NAVICAP_LOG_MAX_BYTES', str(2 * 1024 * 1024)))
+MAX_AGE      = float(os.getenv('NAVICAP_LOG_MAX_AGE_S', str(24 * 3600)))
+KEEP         = int(os.getenv('NAVICAP_LOG_KEEP', '5'))
+
+# Prints de depuracion por evento/deteccion (stdout termina en la SD via run_ble.sh/journal)
+DEBUG = os.getenv('NAVICAP_DEBUG', '0') == '1'
+
+_logs = []
+_logs_lock = threading.Lock()
+
+
+class EventLog:
+    """
+    Log JSON-lines con buffer y rotacion. `log(data, changed)` no bloquea:
+    solo formatea y agrega al buffer.
+    """
+
+    def __init__(self, path: str, level: int = LEVEL, sample_every: int = SAMPLE_EVERY,
+                 flush_bytes: int = FLUSH_BYTES, flush_every: float = FLUSH_EVERY,
+                 max_bytes: int = MAX_BYTES, max_age: float = MAX_AGE, keep: int = KEEP):
+        self.path = path
+        self.level = level
+        self.sample_every = sample_every
+        self.flush_bytes = flush_bytes
+        self.flush_every = flush_every
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.keep = keep
+        self._buf = []
+        self._buf_bytes = 0
+        self._repeats = 0
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        try:
+            self._opened = os.path.getmtime(path) if os.path.getsize(path) else time.time()
+        except OSError:
+            self._opened = time.time()
+        self._thread = threading.Thread(target=self._run, name="navicap-log", daemon=True)
+        self._thread.start()
+        with _logs_lock:
+            _logs.append(self)
+
+    def log(self, data: dict, changed: bool = True):
+        """Encola un evento. Los repetidos (changed=False) se muestrean segun el nivel."""
+        if self.level <= 0 or self._closed:
+            return
+        if not changed:
+            if self.level == 1:
+                return
+            if self.level == 2:
+                self._repeats += 1
+                if self._repeats % self.sample_every:
+                    self.dropped += 1
+                    return
+        line = datetime.utcnow().isoformat() + "Z " + json.dumps(data, ensure_ascii=False) + "\n"
+        with self._cond:
+            self._buf.append(line)
+            self._buf_bytes += len(line)
+            if self._buf_bytes >= self.flush_bytes:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and self._buf_bytes < self.flush_bytes:
+                    self._cond.wait(self.flush_every)
+                if self._closed:
+                    return
+            self.flush()
+
+    def flush(self):
+        """Escribe el buffer (un open/write/close por bloque) y rota si toca."""
+        with self._cond:
+            lines, self._buf, self._buf_bytes = self._buf, [], 0
+        if not lines:
+            return
+        with self._io_lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+                    size = f.tell()
+                self.written += len(lines)
+            except OSError as e:
+                print(f"[LOG] ERROR escribiendo {self.path}: {e}")
+                return
+            if size >= self.max_bytes or time.time() - self._opened >= self.max_age:
+                self._rotate()
+
+    def _rotate(self):
+        now = time.time()
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(now)) + f"{int(now * 1000) % 1000:03d}"
+        rotated = f"{self.path}.{stamp}"
+        try:
+            os.replace(self.path, rotated)
+            with open(rotated, 'rb') as src, gzip.open(rotated + '.gz', 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+        except OSError as e:
+            print(f"[LOG] ERROR rotando {self.path}: {e}")
+            return
+        self._opened = time.time()
+        self.rotations += 1
+        old = sorted(glob.glob(self.path + '.*.gz'))
+        for p in old[:max(0, len(old) - self.keep)]:
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=2.0)
+        self.flush()
+
+
+def flush_all():
+    """Vacia el buffer de todos los logs abiertos (lo llama atexit)."""
+    with _logs_lock:
+        logs = list(_logs)
+    for lg in logs:
+        lg.flush()
+
+
+atexit.register(flush_all)
+
+
+def install_sigterm():
+    """
+    SIGTERM (systemd stop) -> SystemExit, para que corran los finally y atexit
+    (y con ello flush_all). No pisa un handler propio ya instalado.
+    """
+    if signal.getsignal(signal.SIGTERM) not in (signal.SIG_DFL, None):
+        return
+
+    def _term(_sig, _frm):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, _term)
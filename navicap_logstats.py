@@ -0,0 +1,541 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analisis de navicap_obstacles.log (y sus rotados .gz) para salidas de prueba.
+
+Lee por bloques de CHUNK bytes con memoria constante (archivo plano o gzip);
+cada linea pasa por json y los contadores se acumulan por bloque con numpy.
+Con los limites de rotacion de navicap_log (NAVICAP_LOG_MAX_BYTES x
+NAVICAP_LOG_KEEP) el log entero se lee en pocos segundos en la Raspberry.
+
+Informe: avisos por clase, histograma de distancias, lineas/s registradas, huecos
+(reinicios del servicio o cortes: el detector re-publica cada 0.7 s y el log
+guarda 1 de cada NAVICAP_LOG_SAMPLE repetidos, asi que >GAP_S sin lineas es
+que no estaba corriendo) y latencia entre `ts` del push y la hora del log.
+Las cuentas son de lineas en el log, no de pushes: con NAVICAP_LOG_LEVEL=2 los
+repetidos estan muestreados, por eso el informe trae el nivel de muestreo.
+
+Rangos de tiempo (--since/--until, UTC): un indice al lado del log
+(<log>.idx) guarda un punto (hora, offset) cada INDEX_STEP bytes, armado con
+mmap saltando por offsets, para empezar a leer cerca de --since; para los .gz
+guarda la hora de la primera y ultima linea, asi los rotados fuera del rango
+ni se descomprimen. El indice se extiende cuando el log crece y se rehace si
+el archivo rota.
+
+    python3 navicap_logstats.py                              # log por defecto + rotados
+    python3 navicap_logstats.py --since 2025-11-15T10:00 --until 2025-11-15T12:00
+    python3 navicap_logstats.py otro.log --json
+"""
+
+import argparse
+import bisect
+import calendar
+import glob
+import gzip
+import heapq
+import json
+import mmap
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from navicap_log import LOG_DIR, LEVEL as LOG_LEVEL, SAMPLE_EVERY as LOG_SAMPLE
+from navicap_metrics import BUCKETS, Histogram
+
+OBSTACLE_LOG  = os.path.join(LOG_DIR, 'navicap_obstacles.log')
+GAP_S         = float(os.getenv('NAVICAP_LOGSTATS_GAP_S', '30'))
+CHUNK         = 4 << 20       # bytes por bloque
+INDEX_STEP    = 1 << 20       # bytes entre puntos del indice
+INDEX_VERSION = 1
+DIST_BIN      = 0.5           # m por barra del histograma de distancias
+DIST_MAX      = 6.0           # ultima barra: >= DIST_MAX
+TOP_GAPS      = 10
+
+_PREFIX_RE = re.compile(rb'(\d{4}-\d\d-\d\dT\d\d:\d\d):(\d\d(?:\.\d*)?)Z ')
+
+
+# ==================== Horas ====================
+def _iso_epoch(text: str) -> float:
+    """'YYYY-MM-DDTHH:MM:SS[.ffffff]Z' (UTC, como escribe EventLog) -> epoch."""
+    return datetime.fromisoformat(text.rstrip('Z')).replace(tzinfo=timezone.utc).timestamp()
+
+
+def parse_time(text: str) -> float:
+    """'2025-11-15T10:00[:SS[.ffffff]][Z]' (UTC) o epoch -> epoch."""
+    text = text.strip().rstrip('Z')
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    m = re.fullmatch(r'(\d{4}-\d\d-\d\d)(?:[T ](\d\d:\d\d)(?::(\d\d(?:\.\d*)?))?)?', text)
+    if not m:
+        raise ValueError(f"hora invalida: {text!r}")
+    base = calendar.timegm(time.strptime(f"{m.group(1)}T{m.group(2) or '00:00'}", '%Y-%m-%dT%H:%M'))
+    return base + float(m.group(3) or 0)
+
+
+def line_time(line: bytes) -> float | None:
+    m = _PREFIX_RE.match(line)
+    if not m:
+        return None
+    try:
+        return _iso_epoch(line[:m.end() - 1].decode('ascii'))
+    except ValueError:
+        return None
+
+
+# ==================== Parseo por bloque ====================
+def parse_line(line: bytes):
+    """'<hora>Z {json del push}' -> (t, obstacle, distance, traffic, t_ts). None si no es un push."""
+    sp = line.find(b' ')
+    if sp < 0:
+        return None
+    try:
+        t = _iso_epoch(line[:sp].decode('ascii'))
+        data = json.loads(line[sp + 1:])
+        obstacle, dist = str(data["obstacle"]), float(data["distance"])
+    except (ValueError, KeyError, TypeError):
+        return None
+    t_ts = np.nan
+    if isinstance(data.get("ts"), str):
+        try:
+            t_ts = _iso_epoch(data["ts"])
+        except ValueError:
+            pass
+    return t, obstacle.encode('utf-8'), dist, str(data.get("traffic", "unknown")).encode('utf-8'), t_ts
+
+
+class Rows:
+    """Columnas de los pushes de un bloque, en orden de linea."""
+
+    __slots__ = ("t", "obstacle", "names", "dist", "traffic", "traffic_names", "t_ts", "skipped")
+
+    def __init__(self, t, obstacle, names, dist, traffic, traffic_names, t_ts, skipped=0):
+        self.t, self.obstacle, self.names, self.dist = t, obstacle, names, dist
+        self.traffic, self.traffic_names, self.t_ts, self.skipped = traffic, traffic_names, t_ts, skipped
+
+    def __len__(self):
+        return len(self.t)
+
+    def select(self, mask):
+        return Rows(self.t[mask], self.obstacle[mask], self.names, self.dist[mask],
+                    self.traffic[mask], self.traffic_names, self.t_ts[mask], self.skipped)
+
+
+def parse_chunk(chunk: bytes) -> Rows:
+    """Bloque de lineas completas -> Rows (clases y colores como indices a `names`)."""
+    t, obstacle, dist, traffic, t_ts = [], [], [], [], []
+    names, traffic_names = {}, {}
+    skipped = 0
+    for line in chunk.split(b'\n'):
+        if not line:
+            continue
+        row = parse_line(line)
+        if row is None:
+            skipped += 1
+            continue
+        t.append(row[0])
+        obstacle.append(names.setdefault(row[1], len(names)))
+        dist.append(row[2])
+        traffic.append(traffic_names.setdefault(row[3], len(traffic_names)))
+        t_ts.append(row[4])
+    return Rows(np.array(t, np.float64), np.array(obstacle, np.int64), list(names),
+                np.array(dist, np.float64), np.array(traffic, np.int64), list(traffic_names),
+                np.array(t_ts, np.float64), skipped)
+
+
+def read_chunks(f, size: int = CHUNK):
+    """Bloques de lineas completas de un archivo binario (la ultima linea puede no tener '\\n')."""
+    rest = b''
+    while True:
+        block = f.read(size)
+        if not block:
+            if rest:
+                yield rest + b'\n'
+            return
+        block = rest + block
+        cut = block.rfind(b'\n') + 1
+        if cut == 0:
+            rest = block
+            continue
+        rest = block[cut:]
+        yield block[:cut]
+
+
+# ==================== Acumulador ====================
+class LogStats:
+    """Contadores de memoria constante (las claves son las pocas clases del modelo)."""
+
+    def __init__(self, gap_s: float = GAP_S, dist_bin: float = DIST_BIN, dist_max: float = DIST_MAX):
+        self.gap_s = gap_s
+        self.dist_bin = dist_bin
+        self.nbins = int(dist_max / dist_bin) + 1
+        self.lines = 0
+        self.skipped = 0
+        self.classes = {}          # obstacle (bytes) -> [lineas, suma de distancias, minima]
+        self.traffic = {}          # color (bytes) -> lineas con semaforo
+        self.dist_hist = np.zeros(self.nbins, np.int64)
+        self.latency = Histogram()
+        self.negative_latency = 0
+        self.first = None
+        self.last = None
+        self.active = 0.0          # segundos cubiertos sin contar los huecos
+        self.gaps = 0
+        self.gap_total = 0.0
+        self.top_gaps = []         # heap de (segundos, desde, hasta)
+        self._minute = None
+        self._minute_n = 0
+        self.peak_per_min = 0
+        self.files = []
+
+    def add(self, rows: Rows):
+        self.skipped += rows.skipped
+        n = len(rows)
+        if not n:
+            return
+        self.lines += n
+
+        # Clases: lineas, distancia media y minima (sin 'none')
+        k = len(rows.names)
+        counts = np.bincount(rows.obstacle, minlength=k)
+        sums = np.bincount(rows.obstacle, weights=rows.dist, minlength=k)
+        mins = np.full(k, np.inf)
+        np.minimum.at(mins, rows.obstacle, rows.dist)
+        for i, name in enumerate(rows.names):
+            if not counts[i]:
+                continue
+            c = self.classes.setdefault(name, [0, 0.0, float('inf')])
+            c[0] += int(counts[i])
+            c[1] += float(sums[i])
+            c[2] = min(c[2], float(mins[i]))
+        alert = np.ones(n, bool)
+        if b'none' in rows.names:
+            alert = rows.obstacle != rows.names.index(b'none')
+        bins = np.clip(np.nan_to_num(rows.dist[alert] / self.dist_bin), 0, self.nbins - 1).astype(np.int64)
+        self.dist_hist += np.bincount(bins, minlength=self.nbins)
+        tcounts = np.bincount(rows.traffic, minlength=len(rows.traffic_names))
+        for i, name in enumerate(rows.traffic_names):
+            if tcounts[i] and name != b'unknown':
+                self.traffic[name] = self.traffic.get(name, 0) + int(tcounts[i])
+
+        # Latencia ts -> log (Histogram de navicap_metrics, cargado en bloque)
+        lat = rows.t - rows.t_ts
+        lat = lat[~np.isnan(lat)]
+        self.negative_latency += int(np.count_nonzero(lat < 0))
+        lat = lat[lat >= 0]
+        if len(lat):
+            h = self.latency
+            for b, c in enumerate(np.bincount(np.searchsorted(BUCKETS, lat, side='left'), minlength=len(BUCKETS))):
+                h.counts[b] += int(c)
+            h.count += len(lat)
+            h.sum += float(lat.sum())
+            h.max = max(h.max, float(lat.max()))
+
+        # Huecos y tiempo activo (dt < 0: el reloj salto hacia atras, p.ej. NTP al arrancar)
+        t = rows.t
+        if self.last is None:
+            self.first = float(t[0])
+            dt = np.diff(t)
+            prev = t[:-1]
+        else:
+            dt = np.diff(t, prepend=self.last)
+            prev = np.concatenate(([self.last], t[:-1]))
+        gap = (dt > self.gap_s) | (dt < 0)
+        self.active += float(dt[~gap].sum())
+        for i in np.flatnonzero(gap):
+            item = (abs(float(dt[i])), float(prev[i]), float(prev[i] + dt[i]))
+            self.gaps += 1
+            self.gap_total += item[0]
+            if len(self.top_gaps) < TOP_GAPS:
+                heapq.heappush(self.top_gaps, item)
+            elif item > self.top_gaps[0]:
+                heapq.heapreplace(self.top_gaps, item)
+        self.last = float(t[-1])
+
+        # Pico por minuto (rachas de lineas en el mismo minuto)
+        minute = (t // 60).astype(np.int64)
+        bounds = np.concatenate(([0], np.flatnonzero(minute[1:] != minute[:-1]) + 1, [n]))
+        runs = np.diff(bounds)
+        if minute[0] == self._minute:
+            runs[0] += self._minute_n
+        self.peak_per_min = max(self.peak_per_min, int(runs.max()))
+        self._minute, self._minute_n = int(minute[-1]), int(runs[-1])
+
+    def report(self) -> dict:
+        def iso(t):
+            return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(t)) if t is not None else None
+
+        classes = {}
+        for name, (n, dsum, dmin) in sorted(self.classes.items(), key=lambda kv: -kv[1][0]):
+            entry = {"lines": n}
+            if name != b'none':
+                entry.update(mean_m=round(dsum / n, 2), min_m=round(dmin, 2))
+            classes[name.decode('utf-8', 'replace')] = entry
+        bins = {}
+        for i, c in enumerate(self.dist_hist.tolist()):
+            lo = i * self.dist_bin
+            label = f">={lo:g}" if i == self.nbins - 1 else f"{lo:g}-{lo + self.dist_bin:g}"
+            bins[label] = c
+        lat = self.latency
+        return {
+            "files": self.files,
+            "lines": self.lines,
+            "skipped": self.skipped,
+            "from": iso(self.first),
+            "to": iso(self.last),
+            "active_s": round(self.active, 1),
+            "logged_per_s": round(self.lines / self.active, 3) if self.active > 0 else 0.0,
+            "sampling": {"level": LOG_LEVEL, "sample_every": LOG_SAMPLE},
+            "peak_per_min": self.peak_per_min,
+            "alerts": self.lines - self.classes.get(b'none', [0])[0],
+            "classes": classes,
+            "traffic": {k.decode('utf-8', 'replace'): v for k, v in sorted(self.traffic.items())},
+            "distance_m": bins,
+            "latency_ms": {"n": lat.count, "p50": round(1000 * lat.quantile(0.5), 3),
+                           "p99": round(1000 * lat.quantile(0.99), 3), "max": round(1000 * lat.max, 3),
+                           "negative": self.negative_latency},
+            "gaps": {"min_s": self.gap_s, "n": self.gaps, "total_s": round(self.gap_total, 1),
+                     "longest": [{"s": round(d, 1), "from": iso(a), "to": iso(b)}
+                                 for d, a, b in sorted(self.top_gaps, reverse=True)]},
+        }
+
+
+# ==================== Indice ====================
+def index_path(path: str) -> str:
+    return path + '.idx'
+
+
+class LogIndex:
+    """
+    Indice al lado del log: puntos (hora, offset) cada `step` bytes para logs
+    planos y hora de primera/ultima linea. Valido mientras el comienzo del
+    archivo no cambie (un log que crece se extiende, uno rotado se rehace).
+    """
+
+    HEAD = 256
+
+    def __init__(self, path: str, step: int = INDEX_STEP):
+        self.path = path
+        self.step = step
+        self.data = None
+        self.dirty = False
+
+    def _head(self) -> str:
+        opener = gzip.open if self.path.endswith('.gz') else open
+        with opener(self.path, 'rb') as f:
+            return f.read(self.HEAD).hex()
+
+    def load(self) -> dict:
+        size = os.path.getsize(self.path)
+        head = self._head()
+        try:
+            with open(index_path(self.path), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION or data.get("head") != head or data["size"] > size:
+                data = None
+        except (OSError, ValueError, KeyError):
+            data = None
+        if data is None:
+            data = {"version": INDEX_VERSION, "head": head, "size": 0, "step": self.step,
+                    "points": [], "first": None, "last": None, "monotonic": True}
+            self.dirty = True
+        self.data = data
+        return data
+
+    def extend(self, mm) -> dict:
+        """Agrega puntos hasta el final actual de un log plano (salta por offsets, no lo lee entero)."""
+        data = self.data
+        size = len(mm)
+        if data["size"] == size:
+            return data
+        points = data["points"]
+        pos = points[-1][1] + self.step if points else 0
+        while pos < size:
+            start = 0 if pos == 0 else mm.find(b'\n', pos - 1) + 1
+            if start <= 0 and pos:
+                break
+            t = line_time(mm[start:start + 40])
+            if t is not None:
+                if points and t < points[-1][0]:
+                    data["monotonic"] = False
+                points.append([t, start])
+            pos = max(pos, start) + self.step
+        if points and data["first"] is None:
+            data["first"] = points[0][0]
+        # Hora de la ultima linea completa (la ultima puede estar a medio escribir)
+        end = size - 1
+        last = None
+        while last is None and end > 0:
+            tail = mm.rfind(b'\n', 0, end) + 1
+            last = line_time(mm[tail:tail + 40])
+            end = tail - 1
+        data["last"] = last if last is not None else data["last"]
+        data["size"] = size
+        self.dirty = True
+        return data
+
+    def seek(self, since: float | None) -> int:
+        """Offset desde donde leer para no perder lineas >= since."""
+        data = self.data
+        if since is None or not data["points"] or not data["monotonic"]:
+            return 0
+        times = [p[0] for p in data["points"]]
+        i = bisect.bisect_left(times, since) - 1
+        return data["points"][i][1] if i >= 0 else 0
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            tmp = index_path(self.path) + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f)
+            os.replace(tmp, index_path(self.path))
+            self.dirty = False
+        except OSError as e:
+            print(f"[LOG] No se pudo guardar {index_path(self.path)}: {e}", file=sys.stderr)
+
+
+# ==================== Lectura ====================
+def log_files(path: str) -> list:
+    """Rotados (.gz, del mas viejo al mas nuevo) y despues el log actual."""
+    files = sorted(glob.glob(glob.escape(path) + '.*.gz'))
+    # Indices de rotados que EventLog ya borro (guarda solo NAVICAP_LOG_KEEP)
+    for idx in glob.glob(glob.escape(path) + '.*.gz.idx'):
+        if not os.path.exists(idx[:-4]):
+            try:
+                os.remove(idx)
+            except OSError:
+                pass
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def _scan(f, stats: LogStats, since: float | None, until: float | None, stop_after: bool):
+    """Agrega los bloques de `f` dentro de [since, until]. Devuelve (primera, ultima) hora leida."""
+    first = last = None
+    for chunk in read_chunks(f, CHUNK):
+        rows = parse_chunk(chunk)
+        if not len(rows):
+            stats.add(rows)
+            continue
+        if first is None:
+            first = float(rows.t[0])
+        last = float(rows.t[-1])
+        mask = None
+        if since is not None:
+            mask = rows.t >= since
+        if until is not None:
+            mask = rows.t <= until if mask is None else mask & (rows.t <= until)
+        stats.add(rows if mask is None else rows.select(mask))
+        if stop_after and until is not None and last > until:
+            break
+    return first, last
+
+
+def scan_file(path: str, stats: LogStats, since: float | None = None, until: float | None = None,
+              use_index: bool = True) -> str:
+    """Agrega un archivo a `stats`. Devuelve 'read' | 'skipped' (fuera de rango por el indice)."""
+    index = LogIndex(path) if use_index else None
+    data = None
+    if index is not None:
+        try:
+            data = index.load()
+        except OSError:
+            index = None
+    if path.endswith('.gz'):
+        if data and data["first"] is not None and data["monotonic"] and (
+                (until is not None and data["first"] > until) or (since is not None and data["last"] < since)):
+            return 'skipped'
+        with gzip.open(path, 'rb') as f:
+            first, last = _scan(f, stats, since, until, stop_after=False)
+        if index is not None and data["first"] is None:
+            # Rotado: no cambia mas; la primera lectura completa deja el rango
+            data.update(first=first, last=last, size=os.path.getsize(path))
+            index.dirty = True
+            index.save()
+        return 'read'
+
+    with open(path, 'rb') as f:
+        offset = 0
+        monotonic = False
+        if index is not None and os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                index.extend(mm)
+            index.save()
+            if data["first"] is not None and data["monotonic"] and (
+                    (until is not None and data["first"] > until) or (since is not None and data["last"] < since)):
+                return 'skipped'
+            offset = index.seek(since)
+            monotonic = data["monotonic"]
+        f.seek(offset)
+        _scan(f, stats, since, until, stop_after=monotonic)
+    return 'read'
+
+
+def analyze(path: str = OBSTACLE_LOG, since: float | None = None, until: float | None = None,
+            gap_s: float = GAP_S, use_index: bool = True, rotated: bool = True) -> dict:
+    stats = LogStats(gap_s=gap_s)
+    for p in (log_files(path) if rotated else [path]):
+        state = scan_file(p, stats, since, until, use_index)
+        stats.files.append({"path": p, "state": state})
+    return stats.report()
+
+
+def print_report(rep: dict, out=None):
+    w = (out or sys.stdout).write
+    w(f"[LOG] {rep['lines']} lineas ({rep['alerts']} avisos) de {rep['from']} a {rep['to']}"
+      f" en {len(rep['files'])} archivos; {rep['skipped']} lineas ignoradas\n")
+    smp = rep["sampling"]
+    note = f", 1 de cada {smp['sample_every']} repetidos" if smp["level"] == 2 else ""
+    w(f"[LOG] activo {rep['active_s']} s, {rep['logged_per_s']} lineas/s registradas"
+      f" (nivel de log {smp['level']}{note}), pico {rep['peak_per_min']} lineas/min\n")
+    w(f"{'clase':<22} {'lineas':>8} {'media m':>8} {'min m':>7}\n")
+    for name, c in rep["classes"].items():
+        w(f"{name:<22} {c['lines']:>8} {c.get('mean_m', ''):>8} {c.get('min_m', ''):>7}\n")
+    if rep["traffic"]:
+        w(f"semaforo: {rep['traffic']}\n")
+    total = max(1, sum(rep["distance_m"].values()))
+    w("distancia (m):\n")
+    for label, n in rep["distance_m"].items():
+        w(f"  {label:>8} {n:>8} {'#' * int(40 * n / total)}\n")
+    lat = rep["latency_ms"]
+    w(f"latencia ts->log: p50 {lat['p50']} ms, p99 {lat['p99']} ms, max {lat['max']} ms"
+      f" ({lat['negative']} negativas)\n")
+    gaps = rep["gaps"]
+    w(f"huecos > {gaps['min_s']:g} s: {gaps['n']} ({gaps['total_s']} s)\n")
+    for g in gaps["longest"]:
+        w(f"  {g['s']:>9} s  {g['from']} -> {g['to']}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estadisticas de navicap_obstacles.log")
+    parser.add_argument("log", nargs="?", default=OBSTACLE_LOG)
+    parser.add_argument("--since", help="UTC, p.ej. 2025-11-15T10:00 (o epoch)")
+    parser.add_argument("--until", help="UTC, p.ej. 2025-11-15T12:00 (o epoch)")
+    parser.add_argument("--gap", type=float, default=GAP_S, help="segundos sin lineas que cuentan como hueco")
+    parser.add_argument("--no-rotated", action="store_true", help="no leer los .gz rotados")
+    parser.add_argument("--no-index", action="store_true", help="no usar ni escribir <log>.idx")
+    parser.add_argument("--json", action="store_true", help="informe en JSON")
+    args = parser.parse_args(argv)
+
+    since = parse_time(args.since) if args.since else None
+    until = parse_time(args.until) if args.until else None
+    t0 = time.perf_counter()
+    rep = analyze(args.log, since, until, gap_s=args.gap, use_index=not args.no_index,
+                  rotated=not args.no_rotated)
+    rep["elapsed_s"] = round(time.perf_counter() - t0, 3)
+    if args.json:
+        print(json.dumps(rep, ensure_ascii=False, indent=2))
+    else:
+        print_report(rep)
+        print(f"[LOG] {rep['elapsed_s']} s")
+
+
+if __name__ == '__main__':
+    main()
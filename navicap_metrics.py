@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Metricas de rendimiento compartidas por navicap_detect.py y ble_server.py.
+
+Cada proceso tiene un registro global (METRICS) con contadores e histogramas
+de latencia de buckets fijos: observar cuesta un bisect y tres sumas, asi que
+queda prendido en produccion. Los contadores que ya llevan otros modulos
+(reaperturas de camara, timeouts del HC-SR04, pushes descartados...) no se
+duplican: se registran como colectores y se leen solo al consultar.
+
+Consulta local: cada proceso atiende un socket Unix de texto (formato
+Prometheus) en ~/navicap/metrics-<proceso>.sock:
+
+    python3 navicap_metrics.py                 # los dos procesos
+    python3 navicap_metrics.py ~/navicap/metrics-ble.sock
+
+Latencias entre procesos (salto IPC, frame -> notify) usan time.monotonic(),
+que en Linux es el mismo reloj para todos los procesos.
+
+El detector manda un resumen cada DIAG_EVERY s por el socket de obstaculos
+({"diag": {...}}); ble_server lo junta con lo suyo en `pack_diag`, el valor
+de la caracteristica de diagnostico (NAVICAP_BLE_DIAG=1).
+"""
+
+import bisect
+import glob
+import math
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+ENABLED    = os.getenv('NAVICAP_METRICS', '1') != '0'
+METRICS_DIR = os.getenv('NAVICAP_METRICS_DIR', os.path.expanduser('~/navicap'))
+DIAG_EVERY = float(os.getenv('NAVICAP_DIAG_EVERY', '5'))
+
+# Limites superiores de los buckets (segundos)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.5,
+           0.75, 1.0, 2.5, 5.0, math.inf)
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Estimacion por buckets (interpolacion lineal dentro del bucket; acotado por max)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        acc, lo = 0, 0.0
+        for le, c in zip(BUCKETS, self.counts):
+            if c and acc + c >= rank:
+                hi = min(le, self.max)
+                return lo + (hi - lo) * (rank - acc) / c if hi > lo else hi
+            acc += c
+            lo = le
+        return self.max
+
+
+class Metrics:
+    """Contadores, histogramas y colectores de un proceso."""
+
+    def __init__(self, prefix: str = 'navicap'):
+        self.prefix = prefix
+        self.t0 = time.monotonic()
+        self.counters = {}
+        self.hists = {}
+        self.collectors = {}
+        self.last_summary = (0.0, 0)     # (uptime, frames) del ultimo detector_summary
+
+    def inc(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, seconds: float):
+        h = self.hists.get(name)
+        if h is None:
+            h = self.hists[name] = Histogram()
+        h.observe(seconds)
+
+    def hist(self, name: str) -> Histogram:
+        return self.hists.get(name) or Histogram()
+
+    def collect(self, name: str, fn):
+        """fn() -> dict de numeros; se llama solo al consultar."""
+        self.collectors[name] = fn
+
+    def uptime(self) -> float:
+        return time.monotonic() - self.t0
+
+    def render(self) -> str:
+        """Texto en formato de exposicion Prometheus."""
+        p = self.prefix
+        lines = [f"{p}_uptime_seconds {self.uptime():.1f}"]
+        for name, v in sorted(self.counters.items()):
+            lines.append(f"{p}_{name}_total {v}")
+        for name, h in sorted(self.hists.items()):
+            lines.append(f"# TYPE {p}_{name}_seconds histogram")
+            acc = 0
+            for le, c in zip(BUCKETS, h.counts):
+                acc += c
+                lines.append(f'{p}_{name}_seconds_bucket{{le="{"+Inf" if math.isinf(le) else le}"}} {acc}')
+            lines.append(f"{p}_{name}_seconds_sum {h.sum:.6f}")
+            lines.append(f"{p}_{name}_seconds_count {h.count}")
+            lines.append(f"{p}_{name}_seconds_max {h.max:.6f}")
+        for name, fn in sorted(self.collectors.items()):
+            try:
+                values = fn()
+            except Exception as e:
+                lines.append(f"# colector {name}: {e}")
+                continue
+            for k, v in sorted(values.items()):
+                if isinstance(v, (int, float)) and not isinstance(v, bool):
+                    lines.append(f"{p}_{name}_{k} {v}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+# ==================== Endpoint local ====================
+def socket_path(process: str) -> str:
+    return os.path.join(METRICS_DIR, f"metrics-{process}.sock")
+
+
+class MetricsServer:
+    """Socket Unix de texto: cada conexion recibe `metrics.render()` y se cierra."""
+
+    def __init__(self, metrics: Metrics, path: str):
+        self.metrics = metrics
+        self.path = path
+        self.sock = None
+        self._thread = None
+
+    def start(self) -> bool:
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.bind(self.path)
+            self.sock.listen(2)
+        except OSError as e:
+            print(f"[MET] No se pudo abrir {self.path}: {e}")
+            return False
+        self._thread = threading.Thread(target=self._run, name="navicap-metrics", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            try:
+                conn.settimeout(1.0)
+                conn.sendall(self.metrics.render().encode('utf-8'))
+            except OSError:
+                pass
+            finally:
+                conn.close()
+
+    def stop(self):
+        if self.sock is not None:
+            self.sock.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+def serve(process: str, metrics: Metrics = METRICS) -> MetricsServer | None:
+    """Arranca el endpoint del proceso si NAVICAP_METRICS no es 0."""
+    if not ENABLED:
+        return None
+    srv = MetricsServer(metrics, socket_path(process))
+    return srv if srv.start() else None
+
+
+def query(path: str, timeout: float = 2.0) -> str:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(path)
+        chunks = []
+        while True:
+            b = s.recv(65536)
+            if not b:
+                break
+            chunks.append(b)
+    return b"".join(chunks).decode('utf-8')
+
+
+# ==================== Diagnostico compacto ====================
+DIAG_VERSION = 1
+# ver, flags, fps*10, detect p50/p99 ms, e2e p50/p99 ms, ipc p99 (0.1 ms), notifies, reopens, timeouts %
+DIAG_FMT = '<BBHHHHHHHBB'
+DIAG_DETECTOR_ALIVE = 0x01
+
+
+def detector_summary(metrics: Metrics = METRICS, frames_key: str = "frames") -> dict:
+    """Resumen del detector que viaja a ble_server cada DIAG_EVERY s (fps desde el anterior)."""
+    det = metrics.hist("stage_detect")
+    now, frames = metrics.uptime(), metrics.counters.get(frames_key, 0)
+    t_prev, frames_prev = metrics.last_summary
+    fps = (frames - frames_prev) / max(1e-6, now - t_prev)
+    metrics.last_summary = (now, frames)
+    out = {"fps": round(fps, 2),
+           "detect_p50": round(det.quantile(0.5), 4), "detect_p99": round(det.quantile(0.99), 4)}
+    for name in ("capture", "ranging"):
+        fn = metrics.collectors.get(name)
+        if fn is not None:
+            try:
+                out.update({f"{name}_{k}": v for k, v in fn().items()})
+            except Exception:
+                pass
+    return out
+
+
+def _u16(x: float) -> int:
+    return max(0, min(0xFFFF, int(round(x))))
+
+
+def pack_diag(metrics: Metrics, detector: dict | None, detector_age: float) -> bytes:
+    """18 bytes (entra en un ATT de MTU 23) con lo basico para diagnosticar en terreno."""
+    det = detector or {}
+    e2e, ipc = metrics.hist("frame_to_notify"), metrics.hist("ipc")
+    pings = det.get("ranging_pings", 0) or 0
+    timeouts_pct = 100.0 * det.get("ranging_timeouts", 0) / pings if pings else 0.0
+    flags = DIAG_DETECTOR_ALIVE if detector is not None and detector_age <= 3 * DIAG_EVERY else 0
+    return struct.pack(
+        DIAG_FMT, DIAG_VERSION, flags,
+        _u16(10 * det.get("fps", 0.0)),
+        _u16(1000 * det.get("detect_p50", 0.0)), _u16(1000 * det.get("detect_p99", 0.0)),
+        _u16(1000 * e2e.quantile(0.5)), _u16(1000 * e2e.quantile(0.99)),
+        _u16(10000 * ipc.quantile(0.99)),
+        metrics.counters.get("notify_sent", 0) & 0xFFFF,
+        min(255, int(det.get("capture_reopens", 0))),
+        min(255, int(round(timeouts_pct))),
+    )
+
+
+def unpack_diag(raw: bytes) -> dict:
+    (ver, flags, fps10, d50, d99, e50, e99, ipc, notifies, reopens, tmo) = struct.unpack(DIAG_FMT, raw)
+    return {"version": ver, "detector_alive": bool(flags & DIAG_DETECTOR_ALIVE), "fps": fps10 / 10.0,
+            "detect_p50_ms": d50, "detect_p99_ms": d99, "e2e_p50_ms": e50, "e2e_p99_ms": e99,
+            "ipc_p99_ms": ipc / 10.0, "notifies": notifies, "camera_reopens": reopens,
+            "ranging_timeouts_pct": tmo}
+
+
+if __name__ == '__main__':
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(METRICS_DIR, 'metrics-*.sock')))
+    if not paths:
+        raise SystemExit(f"No hay sockets de metricas en {METRICS_DIR}")
+    for path in paths:
+        print(f"# {path}")
+        try:
+            print(query(path), end='')
+        except OSError as e:
+            print(f"# sin respuesta: {e}")
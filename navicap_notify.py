@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Planificador de notificaciones de obstaculos (entre publish_obstacle y la
+caracteristica BLE).
+
+- Une rafagas: dentro del intervalo minimo solo se envia el estado mas nuevo.
+- Histeresis: no notifica si la distancia cambio menos que `dist_hysteresis`
+  y la clase/semaforo son iguales; una clase nueva debe seguir vigente
+  `class_confirm` s antes de notificarse (se arma un timer, no hace falta
+  un segundo submit). El paso a "none" sale sin confirmar.
+- Urgentes (obstaculo muy cerca, cambio de semaforo hacia/desde rojo) salen
+  al tiro, sin esperar el intervalo.
+- Si no se envio nada en `max_silence` s, se reenvia el ultimo estado.
+"""
+
+import math
+import os
+import time
+
+MIN_INTERVAL    = float(os.getenv('NAVICAP_NOTIFY_MIN_INTERVAL', '1.0'))
+DIST_HYSTERESIS = float(os.getenv('NAVICAP_NOTIFY_DIST_HYST', '0.25'))
+URGENT_DISTANCE = float(os.getenv('NAVICAP_NOTIFY_URGENT_M', '0.8'))
+CLASS_CONFIRM   = float(os.getenv('NAVICAP_NOTIFY_CLASS_CONFIRM_MS', '250')) / 1000.0
+MAX_SILENCE     = float(os.getenv('NAVICAP_NOTIFY_MAX_SILENCE', '5.0'))
+
+
+class NotifyScheduler:
+    """
+    Planificador de la notificacion de obstaculos; ble_server usa uno solo,
+    porque BlueZ entrega cada notify a todos los suscritos. `send(state)` hace
+    el envio real; `timer(delay_s, fn)` programa fn() una vez (p.ej. sobre
+    GLib.timeout_add).
+    `state` es un dict con obstacle/distance/traffic.
+    """
+
+    def __init__(self, send, timer, min_interval: float = MIN_INTERVAL,
+                 dist_hysteresis: float = DIST_HYSTERESIS,
+                 urgent_distance: float = URGENT_DISTANCE,
+                 class_confirm: float = CLASS_CONFIRM,
+                 max_silence: float = MAX_SILENCE, clock=time.monotonic):
+        self._send = send
+        self._timer = timer
+        self.min_interval = min_interval
+        self.dist_hysteresis = dist_hysteresis
+        self.urgent_distance = urgent_distance
+        self.class_confirm = max(0.0, class_confirm)
+        self.max_silence = max_silence
+        self._clock = clock
+        self._last_sent = None
+        self._last_sent_t = -math.inf
+        self._pending = None
+        self._timer_armed = False
+        self._latest = None
+        self._cand_label = None
+        self._cand_t = 0.0
+        self._confirm_armed = False
+        # Estadisticas
+        self.submitted = 0
+        self.sent = 0
+        self.urgent = 0
+        self.suppressed = 0
+        self.coalesced = 0
+
+    # ---------- clasificacion ----------
+    def _is_urgent(self, state: dict) -> bool:
+        if state.get("obstacle") not in ("none", "ready", None):
+            d = state.get("distance", math.inf)
+            if d is not None and d <= self.urgent_distance:
+                return True
+        prev = self._last_sent
+        if prev is not None and state.get("traffic") != prev.get("traffic"):
+            if "red" in (state.get("traffic"), prev.get("traffic")):
+                return True
+        return False
+
+    def _is_significant(self, state: dict) -> bool:
+        prev = self._last_sent
+        if prev is None:
+            return True
+        if state.get("obstacle") != prev.get("obstacle"):
+            return True
+        if state.get("traffic") != prev.get("traffic"):
+            return True
+        d0, d1 = prev.get("distance", math.inf), state.get("distance", math.inf)
+        if math.isinf(d0) or math.isinf(d1):
+            return math.isinf(d0) != math.isinf(d1)
+        return abs(d1 - d0) >= self.dist_hysteresis
+
+    def _class_confirmed(self, state: dict, now: float) -> bool:
+        label = state.get("obstacle")
+        if (self._last_sent is None or label == self._last_sent.get("obstacle")
+                or label in ("none", "ready", None)):
+            self._cand_label = None
+            return True
+        if label != self._cand_label:
+            self._cand_label, self._cand_t = label, now
+        wait = self._cand_t + self.class_confirm - now
+        if wait <= 0:
+            return True
+        # Candidata nueva: se revisa cuando cumpla el plazo aunque no llegue otro submit
+        if not self._confirm_armed:
+            self._confirm_armed = True
+            self._timer(wait, self._confirm)
+        return False
+
+    def _confirm(self):
+        self._confirm_armed = False
+        state = self._latest
+        # Solo si la candidata sigue siendo el estado vigente
+        if state is not None and self._cand_label is not None \
+                and state.get("obstacle") == self._cand_label:
+            self._route(state, self._clock())
+        return False
+
+    # ---------- entrada ----------
+    def submit(self, state: dict):
+        self.submitted += 1
+        self._latest = state
+        self._route(state, self._clock())
+
+    def _route(self, state: dict, now: float):
+        # El estado vigente reemplaza a lo pendiente o lo anula si no se enviaria por si solo
+        prev_pending, self._pending = self._pending, None
+        if self._is_urgent(state):
+            # Urgente: sin histeresis ni espera; repeticiones identicas respetan el intervalo
+            if self._is_significant(state) or now - self._last_sent_t >= self.min_interval:
+                self.urgent += 1
+                self._emit(state, now)
+            else:
+                self.suppressed += 1
+            return
+        confirmed = self._class_confirmed(state, now)
+        if not confirmed or not self._is_significant(state):
+            if now - self._last_sent_t >= self.max_silence and confirmed:
+                self._emit(state, now)   # refresco periodico
+            else:
+                self.suppressed += 1
+            return
+        wait = self._last_sent_t + self.min_interval - now
+        if wait <= 0:
+            self._emit(state, now)
+            return
+        # Dentro del intervalo: queda pendiente (el mas nuevo reemplaza al anterior)
+        if prev_pending is not None:
+            self.coalesced += 1
+        self._pending = state
+        if not self._timer_armed:
+            self._timer_armed = True
+            self._timer(wait, self._flush)
+
+    def _flush(self):
+        self._timer_armed = False
+        state, self._pending = self._pending, None
+        if state is not None and state is self._latest and self._is_significant(state):
+            self._emit(state, self._clock())
+        return False
+
+    def _emit(self, state: dict, now: float):
+        self._pending = None
+        self._last_sent = dict(state)
+        self._last_sent_t = now
+        self._cand_label = None
+        self.sent += 1
+        self._send(state)
+
+    def stats(self) -> dict:
+        return {"submitted": self.submitted, "sent": self.sent, "urgent": self.urgent,
+                "suppressed": self.suppressed, "coalesced": self.coalesced}
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de deteccion en etapas para usar los cuatro nucleos de la Raspberry.
+
+    captura/decode (hilo, LatestFrameGrabber)
+      -> preprocess + inferencia (procesos, frames por memoria compartida)
+      -> post-proceso/tracking/semaforo (proceso principal, cada frame)
+      -> publicacion (hilo)
+
+El proceso principal no espera a YOLO: manda el frame a un worker libre y
+sigue con el tracker; cuando llega el resultado corrige los tracks con el
+tiempo del frame que se analizo. Las colas son acotadas y descartan lo mas
+viejo. NAVICAP_PIPELINE=serial deja el loop de un solo hilo de siempre.
+"""
+
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from navicap_backends import detect_staged, make_backend
+from navicap_startup import warm_up
+
+PIPELINE = os.getenv('NAVICAP_PIPELINE', 'pipelined')             # 'serial' = loop unico
+WORKERS  = int(os.getenv('NAVICAP_PIPELINE_WORKERS', '1'))         # procesos de inferencia
+WORKER_THREADS = int(os.getenv('NAVICAP_PIPELINE_THREADS', '3'))   # hilos OpenCV/ORT por worker
+
+
+# ==================== Contadores ====================
+class StageCounter:
+    """Frames, descartes y tiempo ocupado de una etapa."""
+
+    __slots__ = ("name", "count", "dropped", "busy", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.dropped = 0
+        self.busy = 0.0
+        self.t0 = time.monotonic()
+
+    def add(self, seconds: float = 0.0):
+        self.count += 1
+        self.busy += seconds
+
+    def as_dict(self) -> dict:
+        el = max(1e-6, time.monotonic() - self.t0)
+        return {"n": self.count, "fps": round(self.count / el, 2), "dropped": self.dropped,
+                "busy": round(self.busy / el, 3)}
+
+
+# ==================== Colas ====================
+class DropOldestQueue:
+    """Cola acotada: si esta llena se descarta el elemento mas viejo (on_drop lo recibe)."""
+
+    def __init__(self, maxsize: int, ctx=None, counter: StageCounter | None = None):
+        self.q = ctx.Queue(maxsize) if ctx is not None else queue.Queue(maxsize)
+        self.counter = counter
+
+    def put(self, item, on_drop=None):
+        while True:
+            try:
+                self.q.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    old = self.q.get_nowait()
+                except queue.Empty:
+                    continue
+                if self.counter is not None:
+                    self.counter.dropped += 1
+                if on_drop is not None:
+                    on_drop(old)
+
+    def get(self, timeout: float | None = None):
+        return self.q.get(timeout=timeout)
+
+    def get_nowait(self):
+        return self.q.get_nowait()
+
+
+# ==================== Memoria compartida ====================
+class SharedFrameRing:
+    """
+    `slots` buffers de frame en un bloque de memoria compartida. El proceso
+    principal copia el frame una vez; el worker lo lee sin pickle.
+    """
+
+    def __init__(self, slots: int, slot_bytes: int, name: str | None = None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.free = list(range(slots)) if self.owner else []
+
+    def view(self, slot: int, shape, dtype=np.uint8) -> np.ndarray:
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def write(self, frame: np.ndarray) -> int | None:
+        """Copia `frame` a un slot libre. None si no hay slot o no cabe."""
+        if not self.free or frame.nbytes > self.slot_bytes:
+            return None
+        slot = self.free.pop()
+        np.copyto(self.view(slot, frame.shape, frame.dtype), frame)
+        return slot
+
+    def release(self, slot: int):
+        self.free.append(slot)
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# ==================== Worker de inferencia ====================
+def _inference_worker(ring_name: str, slots: int, slot_bytes: int, jobs, results, model_args: dict,
+                      warm_sizes=()):
+    """
+    Proceso hijo: arma su propio backend (y lo precalienta) y atiende trabajos
+    (slot, shape, ts, size, thresholds, nms) -> (slot, ts, size, ids, confs, boxes, etapas),
+    con etapas = segundos de preprocess/forward/nms.
+    """
+    import cv2
+    cv2.setNumThreads(WORKER_THREADS)
+    ring = SharedFrameRing(slots, slot_bytes, name=ring_name)
+    t0 = time.perf_counter()
+    model = make_backend(**model_args)
+    load_s = time.perf_counter() - t0
+    warm_s = warm_up(model, warm_sizes)
+    size = warm_sizes[0] if warm_sizes else model_args["size"]
+    results.put(("ready", os.getpid(), load_s, warm_s))
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            slot, shape, ts, want, thresholds, nms = job
+            frame = ring.view(slot, shape)
+            if want != size:
+                model.setInputSize(want, want)
+                size = want
+            (ids, confs, boxes), stages = detect_staged(model, frame, thresholds, nms)
+            results.put((slot, ts, size,
+                         np.asarray(ids, np.int32).reshape(-1),
+                         np.asarray(confs, np.float32).reshape(-1),
+                         np.asarray(boxes, np.int32).reshape(-1, 4), stages))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+
+
+# ==================== Publicacion ====================
+class AsyncPublisher:
+    """
+    Etapa de publicacion en su propio hilo (socket + espejo + log). Misma firma
+    que push_obstacle; si se atrasa, se descartan los pushes mas viejos.
+    """
+
+    def __init__(self, publish, maxsize: int = 4):
+        self._publish = publish
+        self.counter = StageCounter("publish")
+        self._q = DropOldestQueue(maxsize, counter=self.counter)
+        self._thread = threading.Thread(target=self._run, name="navicap-publish", daemon=True)
+        self._thread.start()
+
+    def __call__(self, obstacle, distance_m, traffic="unknown", confidence=None, frame_ts=None):
+        self._q.put((obstacle, distance_m, traffic, confidence, frame_ts))
+
+    def _run(self):
+        while True:
+            item = self._q.get()
+            if item is None:
+                return
+            t0 = time.perf_counter()
+            obstacle, distance_m, traffic, confidence, frame_ts = item
+            try:
+                self._publish(obstacle, distance_m, traffic, confidence=confidence, frame_ts=frame_ts)
+            except Exception as e:
+                print(f"[PIPE] ERROR publicando: {e}")
+            self.counter.add(time.perf_counter() - t0)
+
+    def stop(self):
+        self._q.put(None)
+        self._thread.join(timeout=2.0)
+
+
+# ==================== Motor ====================
+class PipelineEngine:
+    """
+    Envuelve un navicap_detect.Detector: `process()` reemplaza a `det.step()`
+    pero la inferencia corre en `workers` procesos aparte.
+    """
+
+    def __init__(self, det, model_args: dict, frame_bytes: int, workers: int = WORKERS, nms: float = 0.35,
+                 warm_sizes=()):
+        self.det = det
+        self.model_args = model_args
+        self.workers = max(1, workers)
+        self.nms = nms
+        self.slots = self.workers + 1
+        self.ring = SharedFrameRing(self.slots, frame_bytes)
+        self.counters = {k: StageCounter(k) for k in ("frames", "submit", "infer", "post")}
+        ctx = mp.get_context('spawn')   # sin fork: el padre ya tiene hilos (captura, sensor)
+        self.jobs = DropOldestQueue(self.workers, ctx=ctx, counter=self.counters["submit"])
+        self.results = ctx.Queue()
+        self.procs = [ctx.Process(target=_inference_worker, name=f"navicap-infer-{i}", daemon=True,
+                                  args=(self.ring.name, self.slots, frame_bytes, self.jobs.q,
+                                        self.results, model_args, list(warm_sizes)))
+                      for i in range(self.workers)]
+        self._inflight = {}     # slot -> frame enviado (referencia para el detector de escena)
+        self._ready = 0
+        self.boot = {}          # segundos de carga/warm-up del worker mas lento
+        self._warned = False
+
+    def start(self, timeout: float = 120.0) -> bool:
+        """Lanza los workers y espera a que carguen el modelo."""
+        for p in self.procs:
+            p.start()
+        end = time.monotonic() + timeout
+        while self._ready < self.workers and time.monotonic() < end:
+            try:
+                msg = self.results.get(timeout=0.5)
+            except queue.Empty:
+                if not all(p.is_alive() for p in self.procs):
+                    return False
+                continue
+            if msg[0] == "ready":
+                self._ready += 1
+                self.boot = {"load_s": round(max(msg[2], self.boot.get("load_s", 0.0)), 3),
+                             "warmup_s": round(max(msg[3], self.boot.get("warmup_s", 0.0)), 3)}
+        return self._ready == self.workers
+
+    def _drop_job(self, job):
+        slot = job[0]
+        self._inflight.pop(slot, None)
+        self.ring.release(slot)
+
+    def _collect(self, timeout: float | None = None) -> bool:
+        """
+        Aplica los resultados listos (de frames anteriores) en su tiempo. Con
+        `timeout` espera hasta ese plazo por el primero. True si hubo alguno.
+        """
+        det = self.det
+        detected = False
+        while True:
+            try:
+                if timeout is not None and not detected:
+                    msg = self.results.get(timeout=timeout)
+                else:
+                    msg = self.results.get_nowait()
+            except queue.Empty:
+                break
+            slot, ts, size, ids, confs, boxes, stages = msg
+            sent = self._inflight.pop(slot, None)
+            self.ring.release(slot)
+            if sent is None:
+                continue
+            det.cur_size = size
+            self.counters["infer"].add(det.record_detect(size, stages))
+            det.apply_detections(sent, ts, ids, confs, boxes)
+            detected = True
+        return detected
+
+    def process(self, frame, frame_ts: float, dist: float) -> dict:
+        det = self.det
+        t = det.begin()
+        self.counters["frames"].add()
+
+        # Resultados listos: corrigen el tracker en su tiempo
+        detected = self._collect()
+
+        # Pedir YOLO si hace falta y hay un worker libre; mientras, manda el tracker
+        if det.sched.need_detect(frame, det.tracker) and len(self._inflight) < self.workers:
+            slot = self.ring.write(frame)
+            if slot is not None:
+                self._inflight[slot] = frame
+                self.jobs.put((slot, frame.shape, frame_ts, det.choose_size(),
+                               det.table.detect_thresholds, self.nms), on_drop=self._drop_job)
+                self.counters["submit"].add()
+            elif frame.nbytes > self.ring.slot_bytes and not self._warned:
+                print(f"[PIPE] Frame de {frame.nbytes} B no cabe en el ring ({self.ring.slot_bytes} B)")
+                self._warned = True
+        t = det._timed("sched", t)
+
+        det.tracker.predict(frame_ts)
+        if not detected:
+            det.sched.mark(frame, False)
+        t0 = time.perf_counter()
+        out = det.finish(frame, frame_ts, dist, detected, t)
+        self.counters["post"].add(time.perf_counter() - t0)
+        return out
+
+    def drain(self, frame, frame_ts: float, dist: float, timeout: float = 10.0) -> list:
+        """
+        Espera los trabajos en vuelo (sin pedir YOLO nuevo) y los pasa por
+        det.finish con el ultimo frame; devuelve las salidas. Para cerrar un
+        replay sin perder las ultimas pasadas.
+        """
+        det = self.det
+        outs = []
+        end = time.monotonic() + timeout
+        while self._inflight:
+            left = end - time.monotonic()
+            if left <= 0:
+                break
+            t = det.begin()
+            if not self._collect(timeout=left):
+                continue
+            det.tracker.predict(frame_ts)
+            outs.append(det.finish(frame, frame_ts, dist, True, t))
+        return outs
+
+    def stats(self) -> dict:
+        out = {k: c.as_dict() for k, c in self.counters.items()}
+        pub = getattr(self.det.publish, "counter", None)
+        if pub is not None:
+            out["publish"] = pub.as_dict()
+        return out
+
+    def stop(self):
+        for _ in self.procs:
+            try:
+                self.jobs.q.put(None, timeout=0.5)
+            except queue.Full:
+                pass
+        for p in self.procs:
+            p.join(timeout=2.0)
+            if p.is_alive():
+                p.terminate()
+        self.ring.close()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Post-proceso de detecciones con arreglos NumPy: umbral por clase, clases
+activas, filtros geometricos del semaforo y eleccion del obstaculo principal,
+todo como mascaras sobre (ids, confs, boxes) en vez de loops por deteccion.
+
+Los metadatos de cada clase se precalculan una vez en tablas indexadas por id.
+"""
+
+import numpy as np
+
+from navicap_classes import OBSTACLE_GROUP
+
+# Filtros geometricos del semaforo
+TL_MIN_AREA   = 0.0015   # fraccion del frame
+TL_MIN_ASPECT = 1.1      # alto/ancho: suelen ser mas altos que anchos
+TL_TOP_FRAC   = 0.6      # bonus si la caja empieza en lo alto del frame
+TL_TOP_BONUS  = 0.05
+
+_EMPTY = (np.empty((0,), np.int32), np.empty((0,), np.float32), np.empty((0, 4), np.int32))
+
+
+def as_arrays(ids, confs, boxes):
+    """Salida de model.detect / tracker.detections -> (ids int32, confs float32, boxes int32 (n,4))."""
+    if len(ids) == 0:
+        return _EMPTY
+    return (np.asarray(ids, dtype=np.int32).reshape(-1),
+            np.asarray(confs, dtype=np.float32).reshape(-1),
+            np.asarray(boxes, dtype=np.int32).reshape(-1, 4))
+
+
+class ClassTable:
+    """
+    Tablas por id de clase: umbral de confianza, prioridad (OBSTACLE_GROUP),
+    si es semaforo y si esta activa segun config.json.
+    """
+
+    def __init__(self, classes: list, conf_general: float, conf_tlight: float):
+        self.classes = classes
+        self.names = np.array(classes, dtype=object)
+        self.is_tlight = np.array([c == 'traffic_light' for c in classes], dtype=bool)
+        self.priority = np.array([c in OBSTACLE_GROUP for c in classes], dtype=bool)
+        self.conf_min = np.where(self.is_tlight, conf_tlight, conf_general).astype(np.float32)
+        self.enabled = np.ones(len(classes), dtype=bool)
+        self.detect_thresholds = self.conf_min.copy()
+
+    def set_enabled(self, enabled_ids):
+        self.enabled[:] = False
+        self.enabled[list(enabled_ids)] = True
+        # Umbrales para model.detect: las clases desactivadas nunca pasan
+        self.detect_thresholds = np.where(self.enabled, self.conf_min, 2.0).astype(np.float32)
+
+    def best_traffic_light(self, ids, confs, boxes, frame_w: int, frame_h: int) -> int:
+        """
+        Indice del mejor candidato a semaforo (area y aspecto minimos, bonus si
+        esta arriba en el frame) o -1 si no hay.
+        """
+        if len(ids) == 0 or not self.enabled[self.is_tlight].any():
+            return -1
+        w = boxes[:, 2]; h = boxes[:, 3]
+        ok = (self.is_tlight[ids]
+              & (confs >= self.conf_min[ids])
+              & (w * h >= TL_MIN_AREA * frame_w * frame_h)
+              & (h >= TL_MIN_ASPECT * np.maximum(1, w)))
+        if not ok.any():
+            return -1
+        score = np.where(ok, confs + TL_TOP_BONUS * (boxes[:, 1] < frame_h * TL_TOP_FRAC), -np.inf)
+        return int(score.argmax())
+
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Preproceso sin asignaciones por frame.
+
+- Decodificacion MJPG reducida: con CAP_PROP_CONVERT_RGB=0 la camara entrega
+  el JPEG crudo y se decodifica con IMREAD_REDUCED_COLOR_{2,4,8} (escalado en
+  la DCT de libjpeg-turbo: menos trabajo y menos memoria) cuando el tamaño de
+  entrada mas grande de la red no necesita el frame completo.
+- InputTensor: lienzo uint8 y blob float32 NCHW preasignados por tamaño de
+  entrada. El frame se escala dentro del lienzo (letterbox o estirado, como
+  DetectionModel) y se normaliza directo al blob, que va a net.setInput.
+
+NAVICAP_PREPROC_FIT=stretch (por defecto, igual que el entrenamiento Darknet)
+o letterbox (mantiene la proporcion; con entradas <= 320 permite decodificar
+640x480 a la mitad). NAVICAP_DECODE_REDUCED=auto|1|2|4|8.
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+FIT            = os.getenv('NAVICAP_PREPROC_FIT', 'stretch')     # 'stretch' | 'letterbox'
+DECODE_REDUCED = os.getenv('NAVICAP_DECODE_REDUCED', 'auto')
+PAD_VALUE      = 114                                             # gris del letterbox
+
+_REDUCED_FLAGS = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                  4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+# ==================== Decodificacion ====================
+def decode_reduction(frame_w: int, frame_h: int, max_input: int, fit: str = FIT,
+                     setting: str = DECODE_REDUCED) -> int:
+    """
+    Factor de reduccion del JPEG (1, 2, 4, 8) que todavia entrega al menos los
+    pixeles que va a usar la entrada mas grande de la red.
+    """
+    if setting != 'auto':
+        r = int(setting)
+        return r if r in _REDUCED_FLAGS else 1
+    best = 1
+    for r in (2, 4, 8):
+        w, h = frame_w // r, frame_h // r
+        if fit == 'letterbox':
+            ok = min(max_input / frame_w, max_input / frame_h) <= 1.0 / r
+        else:
+            ok = w >= max_input and h >= max_input
+        if ok:
+            best = r
+    return best
+
+
+class MjpgDecoder:
+    """JPEG crudo de la camara -> BGR a 1/`reduction` de resolucion."""
+
+    def __init__(self, reduction: int = 1):
+        self.reduction = reduction
+        self.flag = _REDUCED_FLAGS.get(reduction, cv2.IMREAD_COLOR)
+
+    def __call__(self, raw):
+        # Si el backend de captura ya convirtio (p.ej. camara sin MJPG) no hay nada que hacer
+        if raw is None or raw.ndim == 3:
+            return raw
+        return cv2.imdecode(raw, self.flag)
+
+
+# ==================== Tensor de entrada ====================
+class InputTensor:
+    """
+    Buffers reusados para una entrada (w, h): lienzo BGR uint8 y blob NCHW
+    float32 RGB 0-1. `prepare(frame)` no asigna memoria en estado estable.
+    """
+
+    def __init__(self, width: int, height: int, fit: str = FIT):
+        self.size = (width, height)
+        self.fit = fit
+        self.canvas = np.full((height, width, 3), PAD_VALUE, np.uint8)
+        self.blob = np.empty((1, 3, height, width), np.float32)
+        self._planes = [self.blob[0, c] for c in range(3)]
+        self._geom = None            # (frame_w, frame_h) -> (escala x, escala y, ox, oy, nw, nh)
+        self._key = None
+
+    def _layout(self, fw: int, fh: int):
+        if self._key == (fw, fh):
+            return self._geom
+        w, h = self.size
+        if self.fit == 'letterbox':
+            s = min(w / fw, h / fh)
+            nw, nh = max(1, int(round(fw * s))), max(1, int(round(fh * s)))
+            ox, oy = (w - nw) // 2, (h - nh) // 2
+            self.canvas[:] = PAD_VALUE
+            self._geom = (nw / fw, nh / fh, ox, oy, nw, nh)
+        else:
+            self._geom = (w / fw, h / fh, 0, 0, w, h)
+        self._key = (fw, fh)
+        return self._geom
+
+    def prepare(self, frame) -> np.ndarray:
+        fh, fw = frame.shape[:2]
+        _sx, _sy, ox, oy, nw, nh = self._layout(fw, fh)
+        dst = self.canvas[oy:oy + nh, ox:ox + nw]
+        if (fw, fh) == (nw, nh):
+            dst[...] = frame
+        else:
+            # Igual que blobFromImage: INTER_LINEAR
+            cv2.resize(frame, (nw, nh), dst=dst, interpolation=cv2.INTER_LINEAR)
+        # BGR -> planos RGB escalados a 0-1, directo en el blob
+        for c in range(3):
+            np.multiply(self.canvas[..., 2 - c], np.float32(1 / 255.0), out=self._planes[c])
+        return self.blob
+
+    def unmap(self, rows: np.ndarray, frame_w: int, frame_h: int) -> np.ndarray:
+        """Filas normalizadas a la entrada -> normalizadas al frame (solo letterbox cambia algo)."""
+        if self.fit != 'letterbox' or rows.size == 0:
+            return rows
+        sx, sy, ox, oy, nw, nh = self._layout(frame_w, frame_h)
+        w, h = self.size
+        rows[:, 0] = (rows[:, 0] * w - ox) / nw
+        rows[:, 1] = (rows[:, 1] * h - oy) / nh
+        rows[:, 2] *= w / nw
+        rows[:, 3] *= h / nh
+        return rows
+
+
+class InputPool:
+    """Un InputTensor por tamaño de entrada (el gobernador cambia entre pocos tamaños)."""
+
+    def __init__(self, fit: str = FIT):
+        self.fit = fit
+        self._tensors = {}
+
+    def get(self, width: int, height: int) -> InputTensor:
+        t = self._tensors.get((width, height))
+        if t is None:
+            t = self._tensors[(width, height)] = InputTensor(width, height, self.fit)
+        return t
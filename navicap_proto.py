@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Formato binario compacto de la notificacion de obstaculo (caracteristica BIN).
+
+Version 1, 11 bytes little-endian (cabe en una notificacion con el MTU ATT por
+defecto de 23 bytes, que deja 20 de payload):
+
+    off  tipo  campo
+    0    u8    version (=1)
+    1    u8    seq (contador 0-255, para detectar perdidas)
+    2    u8    class id: indice en obj.names, o CLASS_NONE/CLASS_READY/CLASS_OTHER
+    3    u16   distancia en cm (DIST_UNKNOWN = sin lectura / fuera de rango)
+    5    u8    semaforo: 0 unknown, 1 red, 2 green, 3 amber
+    6    u8    confianza 0-254 (x/254), CONF_UNKNOWN = sin dato
+    7    u32   ms desde el inicio de la sesion del servidor (con vuelta)
+"""
+
+import math
+import struct
+
+VERSION = 1
+_FMT = struct.Struct('<BBBHBBI')
+SIZE = _FMT.size
+
+CLASS_NONE  = 0xFF   # 'none': no hay obstaculo
+CLASS_READY = 0xFE   # 'ready': servidor recien iniciado
+CLASS_OTHER = 0xFD   # etiqueta fuera de obj.names
+DIST_UNKNOWN = 0xFFFF
+CONF_UNKNOWN = 0xFF
+
+TRAFFIC_STATES = ('unknown', 'red', 'green', 'amber')
+_TRAFFIC_IDS = {name: i for i, name in enumerate(TRAFFIC_STATES)}
+_SPECIAL_IDS = {'none': CLASS_NONE, 'ready': CLASS_READY}
+_SPECIAL_NAMES = {CLASS_NONE: 'none', CLASS_READY: 'ready', CLASS_OTHER: 'unknown'}
+
+
+def class_index(classes: list) -> dict:
+    """Tabla etiqueta -> class id (primera aparicion en obj.names)."""
+    idx = {}
+    for i, name in enumerate(classes):
+        idx.setdefault(name, i)
+    return idx
+
+
+def encode_obstacle(obstacle: str, distance_m: float, traffic: str,
+                    confidence: float | None, rel_ms: int, seq: int,
+                    class_ids: dict) -> bytes:
+    """Empaqueta un obstaculo. `class_ids` viene de class_index()."""
+    cid = _SPECIAL_IDS.get(obstacle)
+    if cid is None:
+        cid = class_ids.get(obstacle, CLASS_OTHER)
+    if distance_m is None or not math.isfinite(distance_m) or distance_m < 0:
+        dist_cm = DIST_UNKNOWN
+    else:
+        dist_cm = min(int(round(distance_m * 100.0)), DIST_UNKNOWN - 1)
+    if confidence is None:
+        conf = CONF_UNKNOWN
+    else:
+        conf = int(round(min(max(float(confidence), 0.0), 1.0) * 254))
+    return _FMT.pack(VERSION, seq & 0xFF, cid, dist_cm,
+                     _TRAFFIC_IDS.get(traffic, 0), conf, int(rel_ms) & 0xFFFFFFFF)
+
+
+def decode_obstacle(payload: bytes, classes: list) -> dict:
+    """Inverso de encode_obstacle. Lanza ValueError si la version o el largo no calzan."""
+    if len(payload) < SIZE:
+        raise ValueError(f"payload corto: {len(payload)} < {SIZE} bytes")
+    version, seq, cid, dist_cm, tl, conf, rel_ms = _FMT.unpack_from(payload)
+    if version != VERSION:
+        raise ValueError(f"version no soportada: {version}")
+    if cid in _SPECIAL_NAMES:
+        obstacle = _SPECIAL_NAMES[cid]
+    elif cid < len(classes):
+        obstacle = classes[cid]
+    else:
+        obstacle = 'unknown'
+    return {
+        "obstacle": obstacle,
+        "distance": math.inf if dist_cm == DIST_UNKNOWN else dist_cm / 100.0,
+        "traffic": TRAFFIC_STATES[tl] if tl < len(TRAFFIC_STATES) else 'unknown',
+        "confidence": None if conf == CONF_UNKNOWN else conf / 254.0,
+        "rel_ms": rel_ms,
+        "seq": seq,
+    }
@@ -3,23 +3,65 @@
 
 import os
 import json
+import threading
+import time
 from datetime import datetime
 
+from navicap_ipc import ObstacleSender
+from navicap_log import EventLog, DEBUG
+from navicap_metrics import METRICS
+
 # Carpeta base de NaviCap
 BASE_DIR = os.path.expanduser('~/navicap')
 OBSTACLE_FILE = os.path.join(BASE_DIR, 'obstacle.json')
 LOG_DIR = os.path.join(BASE_DIR, 'logs')
 OBSTACLE_LOG = os.path.join(LOG_DIR, 'navicap_obstacles.log')
 
-os.makedirs(BASE_DIR, exist_ok=True)
-os.makedirs(LOG_DIR, exist_ok=True)
+# obstacle.json queda como espejo de compatibilidad (0 para desactivarlo)
+MIRROR_FILE = os.getenv('NAVICAP_OBSTACLE_MIRROR', '1') != '0'
+
+# Socket y log se abren con open_channels() (main) o con el primer push:
+# importar el modulo no crea carpetas, sockets ni el hilo del log
+_sender = None
+_log = None
+_open_lock = threading.Lock()
+_last_key = None
+
+
+def open_channels():
+    """Crea ~/navicap/logs, el socket hacia ble_server y el log con buffer y rotacion."""
+    global _sender, _log
+    if _sender is None:
+        with _open_lock:
+            if _sender is None:
+                os.makedirs(BASE_DIR, exist_ok=True)
+                os.makedirs(LOG_DIR, exist_ok=True)
+                # Log con buffer y rotacion (antes: open/write/close en cada push)
+                _log = EventLog(OBSTACLE_LOG)
+                sender = ObstacleSender()
+                METRICS.collect("ipc", lambda: {"sent": sender.sent, "dropped": sender.dropped})
+                _sender = sender
+    return _sender, _log
+
+
+def _write_mirror(data: dict) -> None:
+    """Escribe obstacle.json de forma atomica (tmp + rename): nunca queda a medias."""
+    tmp = OBSTACLE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, OBSTACLE_FILE)
+
 
 def push_obstacle(obstacle: str, distance_m: float, traffic: str = "unknown",
-                  confidence: float | None = None) -> None:
+                  confidence: float | None = None, frame_ts: float | None = None) -> None:
     """
-    Guarda el ultimo obstaculo detectado en obstacle.json,
-    que es el archivo que ble_server.py esta vigilando.
+    Publica el ultimo obstaculo detectado: datagrama al socket de ble_server.py
+    y, si MIRROR_FILE, copia en obstacle.json. `frame_ts` (monotonic del frame)
+    viaja solo en el datagrama, para medir frame -> notify en ble_server.
     """
+    global _last_key
+    t0 = time.monotonic()
+    sender, log = open_channels()
     data = {
         "obstacle": str(obstacle),
         "distance": float(distance_m),
@@ -29,12 +71,27 @@ def push_obstacle(obstacle: str, distance_m: float, traffic: str = "unknown",
     if confidence is not None:
         data["confidence"] = float(confidence)
 
-    # Escribir el JSON donde ble_server.py lo espera
-    with open(OBSTACLE_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False)
+    # Canal principal: socket Unix (ble_server despierta al instante)
+    msg = dict(data, t_sent=time.monotonic())
+    if frame_ts is not None:
+        msg["t_frame"] = float(frame_ts)
+    sender.send(msg)
+
+    # Espejo para herramientas que aun leen obstacle.json
+    if MIRROR_FILE:
+        _write_mirror(data)
+
+    # Los re-envios periodicos del mismo obstaculo/semaforo se muestrean
+    key = (data["obstacle"], data["traffic"])
+    log.log(data, changed=key != _last_key)
+    _last_key = key
+
+    METRICS.observe("publish", time.monotonic() - t0)
+    if DEBUG:
+        print(f"[NAVICAP] push {data}")
 
-    # Log simple para debug
-    with open(OBSTACLE_LOG, "a", encoding="utf-8") as lf:
-        lf.write(datetime.utcnow().isoformat() + "Z " + json.dumps(data, ensure_ascii=False) + "\n")
 
-    print(f"[NAVICAP] push {data}")
+def push_diag(summary: dict) -> None:
+    """Resumen de metricas del detector para la caracteristica de diagnostico de ble_server."""
+    sender, _ = open_channels()
+    sender.send({"diag": summary})
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Medicion de distancia HC-SR04 en segundo plano.
+
+Un hilo dispara el sensor con un periodo fijo, mide el eco (por flancos de GPIO
+si el backend los soporta, si no por sondeo) y guarda las muestras en un buffer
+circular. El loop de deteccion solo lee la ultima distancia filtrada, sin
+bloquear.
+
+El acceso a GPIO es intercambiable: RPiGPIOBackend usa RPi.GPIO en la Raspberry,
+PigpioBackend usa el daemon pigpiod (flancos con tick de hardware) y
+FakeGPIOBackend simula el sensor para probar en cualquier Linux.
+
+Los flancos se interpretan por orden (el primero tras el trigger es la subida,
+el segundo la bajada): leer el nivel dentro del callback de RPi.GPIO no es
+confiable porque el pulso puede haber terminado cuando el callback corre.
+"""
+
+import math
+import statistics
+import threading
+import time
+from collections import deque
+
+from navicap_metrics import METRICS
+
+SPEED_OF_SOUND = 343.0          # m/s
+MIN_RANGE_M, MAX_RANGE_M = 0.02, 5.0
+HCSR04_CYCLE = 0.06             # s minimos entre triggers
+EDGE_MISS_LIMIT = 3             # pings sin flancos (y con eco por sondeo) antes de pasar a sondeo
+
+
+# ==================== Backends GPIO ====================
+class RPiGPIOBackend:
+    """GPIO real (modo BCM) via RPi.GPIO."""
+
+    supports_edges = True
+
+    def __init__(self):
+        import RPi.GPIO as GPIO  # solo disponible en la Raspberry
+        self.GPIO = GPIO
+
+    def setup(self, trig: int, echo: int):
+        G = self.GPIO
+        G.setmode(G.BCM)
+        G.setup(trig, G.OUT)
+        G.setup(echo, G.IN)
+        G.output(trig, G.LOW)
+        time.sleep(0.05)
+
+    def trigger(self, trig: int):
+        G = self.GPIO
+        G.output(trig, True)
+        time.sleep(10e-6)
+        G.output(trig, False)
+
+    def input(self, pin: int) -> int:
+        return self.GPIO.input(pin)
+
+    def add_edge_callback(self, echo: int, callback):
+        """
+        callback(level, t) en cada flanco del pin de eco. RPi.GPIO no entrega el
+        nivel ni la hora del flanco: level=None (se deduce por orden) y t se toma
+        al correr el callback.
+        """
+        def _cb(_channel):
+            callback(None, time.monotonic())
+
+        try:
+            self.GPIO.add_event_detect(echo, self.GPIO.BOTH, callback=_cb)
+        except RuntimeError as e:
+            # Algunos kernels no dejan registrar flancos: se usa sondeo
+            print(f"[RANGE] Sin deteccion de flancos ({e}), usando sondeo")
+            self.supports_edges = False
+
+    def remove_edge_callback(self, echo: int):
+        try:
+            self.GPIO.remove_event_detect(echo)
+        except Exception:
+            pass
+
+    def cleanup(self):
+        self.GPIO.cleanup()
+
+
+class PigpioBackend:
+    """
+    GPIO via pigpiod: los flancos traen el tick del DMA (us, con vuelta a los
+    32 bits), asi el ancho del pulso no depende de cuando corre el callback.
+    """
+
+    supports_edges = True
+
+    def __init__(self):
+        import pigpio  # requiere el daemon pigpiod corriendo
+        self.pigpio = pigpio
+        self.pi = pigpio.pi()
+        if not self.pi.connected:
+            raise RuntimeError("pigpiod no esta corriendo")
+        self._cb = None
+        self._last_tick = None
+        self._t = 0.0
+
+    def setup(self, trig: int, echo: int):
+        pi, pg = self.pi, self.pigpio
+        pi.set_mode(trig, pg.OUTPUT)
+        pi.set_mode(echo, pg.INPUT)
+        pi.write(trig, 0)
+        time.sleep(0.05)
+
+    def trigger(self, trig: int):
+        self.pi.gpio_trigger(trig, 10, 1)
+
+    def input(self, pin: int) -> int:
+        return self.pi.read(pin)
+
+    def _seconds(self, tick: int) -> float:
+        # Tick sin vuelta: solo importan las diferencias entre flancos
+        if self._last_tick is not None:
+            self._t += ((tick - self._last_tick) & 0xFFFFFFFF) / 1e6
+        self._last_tick = tick
+        return self._t
+
+    def add_edge_callback(self, echo: int, callback):
+        """callback(level, t) con el nivel y el tick del flanco (t en s, origen arbitrario)."""
+        def _cb(_gpio, level, tick):
+            if level in (0, 1):   # 2 = watchdog, no es flanco
+                callback(level, self._seconds(tick))
+
+        self._cb = self.pi.callback(echo, self.pigpio.EITHER_EDGE, _cb)
+
+    def remove_edge_callback(self, echo: int):
+        if self._cb is not None:
+            self._cb.cancel()
+            self._cb = None
+
+    def cleanup(self):
+        self.pi.stop()
+
+
+class FakeGPIOBackend:
+    """
+    Sensor simulado. `distance_fn()` devuelve la distancia en metros a simular
+    (o None para simular que no vuelve eco). Los flancos se entregan en el mismo
+    trigger() con timestamps sinteticos, asi que no hay esperas reales; el pin
+    de eco tambien sigue el pulso en tiempo real para el camino por sondeo.
+    `edges=False` simula un kernel que no entrega flancos.
+    """
+
+    supports_edges = True
+
+    def __init__(self, distance_fn=None, edges: bool = True):
+        self.distance_fn = distance_fn or (lambda: 1.0)
+        self.edges = edges
+        self._callback = None
+        self._pulse = (0.0, 0.0)
+        self.triggers = 0
+
+    def setup(self, trig: int, echo: int):
+        pass
+
+    def trigger(self, trig: int):
+        self.triggers += 1
+        d = self.distance_fn()
+        if d is None:
+            return
+        t0 = time.monotonic()
+        t1 = t0 + 2.0 * float(d) / SPEED_OF_SOUND
+        self._pulse = (t0, t1)
+        if self._callback is not None and self.edges:
+            self._callback(None, t0)
+            self._callback(None, t1)
+
+    def input(self, pin: int) -> int:
+        t0, t1 = self._pulse
+        return 1 if t0 <= time.monotonic() < t1 else 0
+
+    def add_edge_callback(self, echo: int, callback):
+        self._callback = callback
+
+    def remove_edge_callback(self, echo: int):
+        self._callback = None
+
+    def cleanup(self):
+        pass
+
+
+# ==================== Muestreador ====================
+class UltrasonicRanger:
+    """
+    Muestreador HC-SR04 con calendario fijo de pings.
+
+    - period: segundos entre pings (el HC-SR04 pide >= 60 ms entre ciclos)
+    - timeout: espera maxima del eco por ping
+    - window: muestras validas que se guardan en el buffer circular
+    - max_age: muestras mas viejas que esto no cuentan para la distancia
+    """
+
+    def __init__(self, backend, trig: int, echo: int, period: float = 0.06,
+                 timeout: float = 0.03, window: int = 5, max_age: float = 0.5):
+        self.backend = backend
+        self.trig, self.echo = trig, echo
+        self.period = period
+        self.timeout = timeout
+        self.max_age = max_age
+        self._samples = deque(maxlen=window)   # (t_monotonic, distancia_m)
+        self._lock = threading.Lock()
+        self._echo_done = threading.Event()
+        self._rise_t = None
+        self._fall_t = None
+        self._running = False
+        self._thread = None
+        # Estadisticas
+        self.pings = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.fallbacks = 0
+        self._edge_misses = 0
+
+    # ---------- ciclo de vida ----------
+    def start(self):
+        self.backend.setup(self.trig, self.echo)
+        self.backend.add_edge_callback(self.echo, self._on_edge)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="navicap-ranging", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self.backend.remove_edge_callback(self.echo)
+        self.backend.cleanup()
+
+    def set_period(self, period: float):
+        """Cambia la frecuencia de pings en caliente."""
+        self.period = max(0.06, float(period))
+
+    # ---------- eco ----------
+    def _on_edge(self, level, t: float):
+        """
+        Primer flanco tras el trigger = subida, segundo = bajada. Si el backend
+        sabe el nivel (pigpio), una bajada sin subida previa es resto del ping
+        anterior y se ignora.
+        """
+        if self._fall_t is not None:
+            return
+        if self._rise_t is None:
+            if level == 0:
+                return
+            self._rise_t = t
+        else:
+            self._fall_t = t
+            self._echo_done.set()
+
+    def _ping_edges(self):
+        self._rise_t = self._fall_t = None
+        self._echo_done.clear()
+        self.backend.trigger(self.trig)
+        if not self._echo_done.wait(self.timeout):
+            return None
+        return self._fall_t - self._rise_t
+
+    def _ping_polling(self):
+        b = self.backend
+        b.trigger(self.trig)
+        t0 = time.monotonic()
+        while b.input(self.echo) == 0:
+            if time.monotonic() - t0 > self.timeout:
+                return None
+        start = time.monotonic()
+        while b.input(self.echo) == 1:
+            if time.monotonic() - start > self.timeout:
+                return None
+        return time.monotonic() - start
+
+    def ping_once(self) -> float | None:
+        """Un ping. Devuelve la distancia en metros o None si no es valida."""
+        self.pings += 1
+        t0 = time.monotonic()
+        if self.backend.supports_edges:
+            dur = self._ping_edges()
+            if dur is None and self._rise_t is None:
+                # Ni un flanco: puede ser el camino de flancos y no el sensor; se sondea
+                dur = self._fallback_polling(t0)
+        else:
+            dur = self._ping_polling()
+        METRICS.observe("ranging", time.monotonic() - t0)
+        if dur is None:
+            self.timeouts += 1
+            return None
+        d = dur * SPEED_OF_SOUND / 2.0  # ida/vuelta
+        if not (MIN_RANGE_M <= d <= MAX_RANGE_M):
+            self.rejected += 1
+            return None
+        with self._lock:
+            self._samples.append((time.monotonic(), d))
+        return d
+
+    def _fallback_polling(self, t_trigger: float):
+        """Repite el ping por sondeo; tras varios con eco solo por sondeo, deja los flancos."""
+        self.fallbacks += 1
+        gap = t_trigger + HCSR04_CYCLE - time.monotonic()
+        if gap > 0:
+            time.sleep(gap)
+        dur = self._ping_polling()
+        if dur is None:
+            self._edge_misses = 0
+            return None
+        self._edge_misses += 1
+        if self._edge_misses >= EDGE_MISS_LIMIT:
+            print(f"[RANGE] {self._edge_misses} ecos sin flancos, usando sondeo")
+            self.backend.supports_edges = False
+        return dur
+
+    def _run(self):
+        next_t = time.monotonic()
+        while self._running:
+            try:
+                self.ping_once()
+            except Exception as e:
+                print(f"[RANGE] ERROR en ping: {e}")
+            next_t += self.period
+            delay = next_t - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_t = time.monotonic()  # vamos atrasados: no acumular deuda
+
+    # ---------- lectura ----------
+    def latest(self):
+        """
+        Distancia filtrada (mediana sin outliers) de las muestras recientes y
+        timestamp monotonic de la ultima. (math.inf, 0.0) si no hay muestras frescas.
+        """
+        now = time.monotonic()
+        with self._lock:
+            fresh = [(t, d) for t, d in self._samples if now - t <= self.max_age]
+        if not fresh:
+            return math.inf, 0.0
+        vals = [d for _, d in fresh]
+        med = statistics.median(vals)
+        if len(vals) >= 3:
+            # Rechazo de outliers por desviacion absoluta mediana
+            mad = statistics.median(abs(v - med) for v in vals)
+            limit = max(3.0 * mad, 0.05)
+            kept = [v for v in vals if abs(v - med) <= limit]
+            if kept:
+                med = statistics.median(kept)
+        return med, fresh[-1][0]
+
+    def distance(self) -> float:
+        """Igual que latest() pero solo la distancia en metros."""
+        return self.latest()[0]
+
+    def stats(self) -> dict:
+        return {"pings": self.pings, "timeouts": self.timeouts, "rejected": self.rejected,
+                "fallbacks": self.fallbacks}
+
+
+def make_backend(name: str = "rpi"):
+    """'rpi' (RPi.GPIO), 'pigpio' (pigpiod) o 'fake' (simulado, distancia fija de 1 m)."""
+    if name == "fake":
+        return FakeGPIOBackend()
+    if name == "pigpio":
+        return PigpioBackend()
+    return RPiGPIOBackend()
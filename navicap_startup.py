@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Arranque rapido del detector (reinicios de systemd).
+
+- ModelCache: artefactos del modelo en ~/navicap/cache con clave = hash de
+  cfg + weights. El hash de cada archivo se memoriza por (tamaño, mtime), asi
+  un reinicio no vuelve a leer los 23 MB de pesos. Con NAVICAP_BACKEND=onnx el
+  .onnx se genera aqui si falta, y ONNX Runtime guarda su grafo ya optimizado
+  para no repetir la optimizacion en cada arranque.
+- warm_up(): pasadas en vacio antes de abrir la camara; la primera inferencia
+  de OpenCV/ORT es ~10x mas lenta (reserva memoria y reordena pesos).
+- StartupTimer: cuanto tardo cada fase desde que arranco el proceso hasta el
+  primer aviso publicado.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+CACHE_DIR = os.getenv('NAVICAP_MODEL_CACHE', os.path.expanduser('~/navicap/cache'))
+WARMUP    = os.getenv('NAVICAP_WARMUP', 'initial')   # 'initial' | 'all' (todos los tamaños) | 'off'
+
+_T_IMPORT = time.monotonic()
+
+
+# ==================== Cache de artefactos ====================
+def file_digest(path: str, chunk: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ModelCache:
+    """Artefactos derivados del modelo, nombrados por el hash de sus fuentes."""
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.dir = cache_dir
+        self._index_path = os.path.join(cache_dir, 'digests.json')
+        self._index = None
+        self.hits = 0
+        self.misses = 0
+
+    def _load_index(self) -> dict:
+        if self._index is None:
+            try:
+                with open(self._index_path, 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            tmp = self._index_path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(tmp, self._index_path)
+        except OSError as e:
+            print(f"[BOOT] No se pudo guardar {self._index_path}: {e}")
+
+    def digest(self, path: str) -> str:
+        """sha256 del archivo; se recalcula solo si cambio tamaño o mtime."""
+        st = os.stat(path)
+        stamp = [st.st_size, st.st_mtime_ns]
+        index = self._load_index()
+        entry = index.get(os.path.abspath(path))
+        if entry and entry[:2] == stamp:
+            return entry[2]
+        digest = file_digest(path)
+        index[os.path.abspath(path)] = stamp + [digest]
+        self._save_index()
+        return digest
+
+    def key(self, *paths, extra: str = '') -> str:
+        h = hashlib.sha256(extra.encode())
+        for p in paths:
+            h.update(self.digest(p).encode())
+        return h.hexdigest()[:16]
+
+    def path(self, stem: str, key: str, ext: str) -> str:
+        return os.path.join(self.dir, f"{stem}-{key}{ext}")
+
+    def onnx_for(self, cfg_path: str, wts_path: str) -> str | None:
+        """ONNX convertido de cfg/weights (se genera si no esta). None sin el paquete `onnx`."""
+        from navicap_convert import CONVERT_VERSION, darknet_to_onnx
+        out = self.path('model', self.key(cfg_path, wts_path, extra=f"v{CONVERT_VERSION}"), '.onnx')
+        if os.path.exists(out):
+            self.hits += 1
+            return out
+        self.misses += 1
+        try:
+            import onnx
+        except ImportError:
+            print("[BOOT] Sin paquete `onnx`: genera el .onnx con navicap_convert.py en otro equipo")
+            return None
+        t0 = time.perf_counter()
+        os.makedirs(self.dir, exist_ok=True)
+        tmp = out + '.tmp'
+        onnx.save(darknet_to_onnx(cfg_path, wts_path), tmp)
+        os.replace(tmp, out)
+        print(f"[BOOT] ONNX cacheado en {out} ({time.perf_counter() - t0:.1f} s)")
+        return out
+
+    def ort_optimized_for(self, onnx_path: str) -> str:
+        """Donde guardar/leer el grafo optimizado por ONNX Runtime para este modelo."""
+        try:
+            import onnxruntime as ort
+            version = ort.__version__
+        except ImportError:
+            version = ''
+        return self.path('ort', self.key(onnx_path, extra=version), '.onnx')
+
+
+# ==================== Warm-up ====================
+def warm_up(model, sizes, frame_shape=(480, 640, 3), passes: int = 1) -> float:
+    """
+    Pasadas con un frame negro en cada tamaño de `sizes` y deja el modelo en el
+    primero. Devuelve los segundos usados.
+    """
+    sizes = list(sizes)
+    if not sizes:
+        return 0.0
+    t0 = time.perf_counter()
+    frame = np.zeros(frame_shape, np.uint8)
+    for size in reversed(sizes):
+        model.setInputSize(size, size)
+        for _ in range(passes):
+            model.forward(frame)
+    return time.perf_counter() - t0
+
+
+def warmup_sizes(initial: int, sizes, mode: str = WARMUP) -> list:
+    """Tamaños a precalentar segun NAVICAP_WARMUP (el inicial siempre primero)."""
+    if mode == 'off':
+        return []
+    if mode == 'all':
+        return [initial] + [s for s in sizes if s != initial]
+    return [initial]
+
+
+# ==================== Informe de arranque ====================
+def process_age() -> float:
+    """Segundos desde que arranco el proceso (incluye interprete e imports)."""
+    try:
+        with open('/proc/self/stat', 'r') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime', 'r') as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - _T_IMPORT
+
+
+class StartupTimer:
+    """Fases del arranque (mark) hasta el primer aviso publicado (first_alert)."""
+
+    def __init__(self):
+        self._t0 = time.monotonic()
+        self._last = self._t0
+        self.pre = process_age()          # interprete + imports antes de crear el timer
+        self.phases = []
+        self.done = False
+
+    def mark(self, phase: str):
+        now = time.monotonic()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def first_alert(self) -> bool:
+        """Cierra el informe con el primer push. True solo la primera vez."""
+        if self.done:
+            return False
+        self.mark("first_alert")
+        self.done = True
+        print(f"[BOOT] {self.report()}")
+        return True
+
+    def total(self) -> float:
+        return self.pre + (self._last - self._t0)
+
+    def report(self) -> str:
+        parts = [f"imports={self.pre * 1000:.0f}ms"]
+        parts += [f"{name}={dt * 1000:.0f}ms" for name, dt in self.phases]
+        return " ".join(parts) + f" total={self.total():.2f}s"
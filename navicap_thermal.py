@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Planificador termico y de energia del detector.
+
+En una carcasa cerrada la Raspberry Pi 4 llega a ~80 °C en pocos minutos de
+YOLO continuo y el firmware baja la frecuencia: FPS y latencia de aviso se
+caen sin aviso. Aqui se lee temperatura, frecuencia y estado de throttling
+desde sysfs y se baja la carga antes de llegar al techo, en niveles:
+
+    nivel  tamaños de entrada     pausa min.  YOLO cada   ping HC-SR04
+      0    todos                  0           x1          RANGE_PERIOD
+      1    sin el mas grande      0.10 s      x1          0.10 s
+      2    solo el mas chico      0.20 s      x2          0.15 s
+      3    solo el mas chico      0.40 s      x3          0.25 s
+
+Se sube un nivel si la temperatura pasa THERMAL_CEILING, si la tendencia la
+lleva al techo dentro de THERMAL_HORIZON s o si el firmware ya esta
+limitando; se baja uno cuando lleva THERMAL_COOL_HOLD s por debajo del techo
+menos THERMAL_HYST. Con subvoltaje (fuente o bateria floja) el nivel minimo
+es 1. Con un obstaculo a menos de THERMAL_NEAR_M nunca se baja de
+THERMAL_MIN_ALERT_HZ pasadas por segundo ni se espacian los pings.
+
+Las rutas de sysfs son relativas a NAVICAP_SYSFS_ROOT (por defecto /), asi
+se puede probar con un arbol falso en cualquier Linux:
+
+    python3 navicap_thermal.py --root /tmp/fakesys
+"""
+
+import argparse
+import os
+import time
+
+THERMAL        = os.getenv('NAVICAP_THERMAL', '1') != '0'
+SYSFS_ROOT     = os.getenv('NAVICAP_SYSFS_ROOT', '/')
+TEMP_PATH      = os.getenv('NAVICAP_THERMAL_TEMP', 'sys/class/thermal/thermal_zone0/temp')
+FREQ_PATH      = os.getenv('NAVICAP_THERMAL_FREQ', 'sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq')
+FREQ_MAX_PATH  = os.getenv('NAVICAP_THERMAL_FREQ_MAX', 'sys/devices/system/cpu/cpu0/cpufreq/cpuinfo_max_freq')
+THROTTLED_PATH = os.getenv('NAVICAP_THERMAL_THROTTLED', 'sys/devices/platform/soc/soc:firmware/get_throttled')
+
+THERMAL_CEILING  = float(os.getenv('NAVICAP_THERMAL_CEILING', '75'))    # °C (el firmware limita a 80)
+THERMAL_HYST     = float(os.getenv('NAVICAP_THERMAL_HYST', '5'))
+THERMAL_HORIZON  = float(os.getenv('NAVICAP_THERMAL_HORIZON', '30'))    # s de tendencia a proyectar
+THERMAL_PERIOD   = float(os.getenv('NAVICAP_THERMAL_PERIOD', '1.0'))    # s entre lecturas
+THERMAL_STEP_HOLD = 15.0        # s entre subidas por tendencia (la carcasa tarda en responder)
+THERMAL_HOT_HOLD  = 5.0         # s entre subidas ya sobre el techo o con el firmware limitando
+THERMAL_COOL_HOLD = float(os.getenv('NAVICAP_THERMAL_COOL_HOLD', '30'))
+THERMAL_NEAR_M   = float(os.getenv('NAVICAP_THERMAL_NEAR_M', '1.5'))
+THERMAL_MIN_ALERT_HZ = float(os.getenv('NAVICAP_THERMAL_MIN_ALERT_HZ', '4'))
+NEAR_RANGE_PERIOD = 0.1
+
+# Bits de get_throttled (los mismos de `vcgencmd get_throttled`)
+UNDERVOLT  = 0x1
+FREQ_CAPPED = 0x2
+THROTTLED  = 0x4
+SOFT_TEMP  = 0x8
+
+# (tamaños que se quitan arriba, pausa minima s, multiplicador de DETECT_EVERY, periodo de ping s)
+LEVELS = (
+    (0, 0.0, 1, None),
+    (1, 0.10, 1, 0.10),
+    (99, 0.20, 2, 0.15),
+    (99, 0.40, 3, 0.25),
+)
+
+
+def _read(path: str):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+class SysfsSensors:
+    """Lecturas de temperatura/frecuencia/throttling; None en lo que no exista."""
+
+    def __init__(self, root: str = SYSFS_ROOT, temp: str = TEMP_PATH, freq: str = FREQ_PATH,
+                 freq_max: str = FREQ_MAX_PATH, throttled: str = THROTTLED_PATH):
+        self.paths = {k: os.path.join(root, p.lstrip('/'))
+                      for k, p in (("temp", temp), ("freq", freq), ("freq_max", freq_max),
+                                   ("throttled", throttled))}
+
+    def available(self) -> bool:
+        return os.path.exists(self.paths["temp"])
+
+    def read(self) -> dict:
+        out = {"temp_c": None, "freq_mhz": None, "freq_max_mhz": None, "throttled": None}
+        v = _read(self.paths["temp"])
+        if v:
+            try:
+                out["temp_c"] = int(v) / 1000.0     # miligrados
+            except ValueError:
+                pass
+        for key, name in (("freq_mhz", "freq"), ("freq_max_mhz", "freq_max")):
+            v = _read(self.paths[name])
+            if v:
+                try:
+                    out[key] = int(v) / 1000.0      # kHz
+                except ValueError:
+                    pass
+        v = _read(self.paths["throttled"])
+        if v:
+            try:
+                out["throttled"] = int(v, 16)       # "0x50005" o "50005"
+            except ValueError:
+                pass
+        return out
+
+
+class ThermalScheduler:
+    """
+    Lee los sensores cada `period` s y ajusta gobernador, planificador de YOLO
+    y HC-SR04 segun el nivel. `update()` se llama en cada frame; es barato.
+    """
+
+    def __init__(self, sensors: SysfsSensors, governor, sched=None, ranger=None,
+                 ceiling: float = THERMAL_CEILING, hyst: float = THERMAL_HYST,
+                 horizon: float = THERMAL_HORIZON, period: float = THERMAL_PERIOD,
+                 step_hold: float = THERMAL_STEP_HOLD, cool_hold: float = THERMAL_COOL_HOLD,
+                 near_m: float = THERMAL_NEAR_M, min_alert_hz: float = THERMAL_MIN_ALERT_HZ,
+                 clock=time.monotonic):
+        self.sensors = sensors
+        self.governor = governor
+        self.sched = sched
+        self.ranger = ranger
+        self.ceiling = ceiling
+        self.hyst = hyst
+        self.horizon = horizon
+        self.period = period
+        self.step_hold = step_hold
+        self.cool_hold = cool_hold
+        self.near_m = near_m
+        self.min_interval_near = 1.0 / min_alert_hz if min_alert_hz > 0 else 0.0
+        self._clock = clock
+        self._base_every = sched.every if sched is not None else 1
+        self._base_period = ranger.period if ranger is not None else None
+        self.level = 0
+        self.near = False
+        self.reading = {}
+        self.slope = 0.0               # °C/s (EMA)
+        self._prev = None              # (t, temp)
+        self._next_read = 0.0
+        self._last_up = -1e9
+        self._cool_since = None
+        self.changes = 0
+        self.time_at = [0.0] * len(LEVELS)
+        self._level_t = clock()
+
+    # ---------- decision ----------
+    def _decide(self, now: float, r: dict) -> int:
+        temp, bits = r["temp_c"], r["throttled"] or 0
+        level = self.level
+        if temp is None:
+            return 1 if bits & UNDERVOLT else 0
+        if self._prev is not None and now > self._prev[0]:
+            d = (temp - self._prev[1]) / (now - self._prev[0])
+            self.slope += 0.3 * (d - self.slope)
+        self._prev = (now, temp)
+        predicted = temp + max(0.0, self.slope) * self.horizon
+        # Sin get_throttled: frecuencia por debajo del maximo estando caliente = el firmware la bajo
+        capped = bool(bits & (FREQ_CAPPED | THROTTLED | SOFT_TEMP)) or (
+            r["throttled"] is None and r["freq_mhz"] and r["freq_max_mhz"] and temp >= self.ceiling - self.hyst
+            and r["freq_mhz"] < 0.9 * r["freq_max_mhz"])
+
+        hot = temp >= self.ceiling or capped
+        if hot or predicted >= self.ceiling:
+            self._cool_since = None
+            hold = THERMAL_HOT_HOLD if hot else self.step_hold
+            if now - self._last_up >= hold and level < len(LEVELS) - 1:
+                level += 1
+                self._last_up = now
+        elif temp <= self.ceiling - self.hyst and predicted < self.ceiling - self.hyst:
+            if self._cool_since is None:
+                self._cool_since = now
+            elif now - self._cool_since >= self.cool_hold and level > 0:
+                level -= 1
+                self._cool_since = now
+        else:
+            self._cool_since = None
+        if bits & UNDERVOLT:
+            level = max(level, 1)
+        return level
+
+    def _apply(self):
+        drop, min_interval, every_x, range_period = LEVELS[self.level]
+        sizes = self.governor.sizes
+        max_size = sizes[max(0, len(sizes) - 1 - drop)]
+        every = self._base_every * every_x
+        if self.near:
+            # Obstaculo cerca: minimo de pasadas por segundo y pings al ritmo normal
+            min_interval = min(min_interval, self.min_interval_near)
+            every = self._base_every
+            range_period = None if range_period is None else min(range_period, NEAR_RANGE_PERIOD)
+        self.governor.limit(max_size=max_size if drop else None, min_interval=min_interval)
+        if self.sched is not None:
+            self.sched.every = every
+        if self.ranger is not None and self._base_period is not None:
+            period = self._base_period if range_period is None else max(self._base_period, range_period)
+            if period != self.ranger.period:
+                self.ranger.set_period(period)
+
+    def update(self, distance_m: float | None = None) -> int:
+        """Llamar en cada frame con la ultima distancia. Devuelve el nivel."""
+        now = self._clock()
+        near = distance_m is not None and 0 < distance_m < self.near_m
+        changed = near != self.near
+        self.near = near
+        if now >= self._next_read:
+            self._next_read = now + self.period
+            self.reading = self.sensors.read()
+            level = self._decide(now, self.reading)
+            if level != self.level:
+                self.time_at[self.level] += now - self._level_t
+                self._level_t = now
+                print(f"[THERM] nivel {self.level} -> {level} temp={self.reading['temp_c']} °C "
+                      f"tendencia={self.slope * 60:+.1f} °C/min freq={self.reading['freq_mhz']} MHz "
+                      f"throttled={hex(self.reading['throttled'] or 0)}")
+                self.level = level
+                self.changes += 1
+                changed = True
+        if changed:
+            self._apply()
+        return self.level
+
+    def stats(self) -> dict:
+        r = self.reading
+        time_at = list(self.time_at)
+        time_at[self.level] += self._clock() - self._level_t
+        out = {"level": self.level, "changes": self.changes, "near": int(self.near),
+               "slope_c_per_min": round(self.slope * 60, 2)}
+        for k in ("temp_c", "freq_mhz", "throttled"):
+            if r.get(k) is not None:
+                out[k] = r[k]
+        out.update({f"seconds_level{i}": round(s, 1) for i, s in enumerate(time_at)})
+        return out
+
+
+def make_scheduler(governor, sched=None, ranger=None, root: str = SYSFS_ROOT):
+    """ThermalScheduler si NAVICAP_THERMAL y hay sensor de temperatura; si no None."""
+    if not THERMAL:
+        return None
+    sensors = SysfsSensors(root)
+    if not sensors.available():
+        print(f"[THERM] Sin {sensors.paths['temp']}: planificador termico apagado")
+        return None
+    return ThermalScheduler(sensors, governor, sched, ranger)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Lecturas termicas de sysfs")
+    parser.add_argument("--root", default=SYSFS_ROOT, help="raiz del arbol sysfs (p.ej. uno falso)")
+    parser.add_argument("--watch", type=float, default=0.0, help="repetir cada N s")
+    args = parser.parse_args()
+    sensors = SysfsSensors(args.root)
+    while True:
+        r = sensors.read()
+        bits = r["throttled"]
+        flags = [] if bits is None else [n for b, n in ((UNDERVOLT, "subvoltaje"), (FREQ_CAPPED, "freq-limitada"),
+                                                         (THROTTLED, "throttled"), (SOFT_TEMP, "limite-temp"))
+                                          if bits & b]
+        print(f"temp={r['temp_c']} °C freq={r['freq_mhz']}/{r['freq_max_mhz']} MHz "
+              f"throttled={hex(bits) if bits is not None else None} {' '.join(flags)}")
+        if args.watch <= 0:
+            break
+        time.sleep(args.watch)
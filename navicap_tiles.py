@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Inferencia por regiones (tiles) para objetos chicos y lejanos.
+
+En vez de subir toda la entrada a 608 para ver semaforos chicos, se hace una
+pasada barata del frame completo a TILE_BASE y pasadas en alta resolucion solo
+sobre recortes de las regiones de interes:
+
+- estaticas: NAVICAP_TILE_ROIS, rectangulos normalizados "x0,y0,x1,y1;..."
+  (por defecto la franja superior, donde aparecen los semaforos). Cada region
+  se cubre con recortes cuadrados de TILE_CROP px con un poco de solape.
+- aprendidas: recortes centrados en objetos chicos detectados hace poco
+  (hasta TILE_DYNAMIC), para seguir viendolos en alta resolucion.
+
+El frame completo y los recortes van en un solo lote (net.forward una vez)
+cuando TILE_BASE == TILE_SIZE. Las filas de cada recorte se pasan a
+coordenadas del frame, se descartan las cajas cortadas por un borde interno
+del recorte y `postprocess` hace el NMS por clase sobre todo junto (NMS entre
+tiles). Los recortes estaticos corren cada TILE_EVERY pasadas; entre medio el
+tracker mantiene lo que encontraron.
+
+Activar con NAVICAP_TILES=1.
+"""
+
+import os
+import time
+
+import numpy as np
+
+from navicap_backends import batch_blob, postprocess
+
+TILES        = os.getenv('NAVICAP_TILES', '0') == '1'
+TILE_BASE    = int(os.getenv('NAVICAP_TILE_BASE', '256'))    # entrada del frame completo
+TILE_SIZE    = int(os.getenv('NAVICAP_TILE_SIZE', '256'))    # entrada de cada recorte
+TILE_CROP    = int(os.getenv('NAVICAP_TILE_CROP', '224'))    # lado del recorte en px del frame
+TILE_ROIS    = os.getenv('NAVICAP_TILE_ROIS', '0,0,1,0.45')
+TILE_EVERY   = max(1, int(os.getenv('NAVICAP_TILE_EVERY', '2')))
+TILE_DYNAMIC = int(os.getenv('NAVICAP_TILE_DYNAMIC', '1'))
+
+SMALL_PX  = 48      # lado maximo (px) de un objeto "chico" que merece recorte propio
+EDGE_FRAC = 0.01    # caja a menos de esto de un borde interno del recorte = cortada
+HINT_TTL  = 2.0     # s que se sigue recortando alrededor de un objeto chico
+
+
+def parse_rois(spec: str) -> list:
+    """'x0,y0,x1,y1;...' (normalizados) -> lista de tuplas."""
+    rois = []
+    for part in spec.split(';'):
+        try:
+            vals = [float(v) for v in part.split(',') if v.strip()]
+        except ValueError:
+            continue
+        if len(vals) == 4 and vals[2] > vals[0] and vals[3] > vals[1]:
+            rois.append(tuple(vals))
+    return rois
+
+
+def _starts(lo: int, hi: int, crop: int) -> list:
+    """Inicios de recortes de lado `crop` que cubren [lo, hi) con solape parejo."""
+    span = hi - lo
+    if span <= crop:
+        return [lo]
+    n = int(np.ceil(span / crop))
+    return [int(round(lo + i * (span - crop) / (n - 1))) for i in range(n)]
+
+
+def cover(roi, frame_w: int, frame_h: int, crop: int) -> list:
+    """Recortes (x, y, lado, lado) que cubren una region normalizada."""
+    crop = min(crop, frame_w, frame_h)
+    x0, y0 = int(roi[0] * frame_w), int(roi[1] * frame_h)
+    x1, y1 = int(roi[2] * frame_w), int(roi[3] * frame_h)
+    # Regiones mas chicas que el recorte: se centra el recorte en ellas
+    if x1 - x0 < crop:
+        x0 = min(max(0, (x0 + x1 - crop) // 2), frame_w - crop); x1 = x0 + crop
+    if y1 - y0 < crop:
+        y0 = min(max(0, (y0 + y1 - crop) // 2), frame_h - crop); y1 = y0 + crop
+    return [(x, y, crop, crop) for y in _starts(y0, y1, crop) for x in _starts(x0, x1, crop)]
+
+
+class TilePlanner:
+    """Decide que recortes van en cada pasada (estaticos cada `every`, aprendidos siempre)."""
+
+    def __init__(self, rois=None, crop: int = TILE_CROP, every: int = TILE_EVERY,
+                 dynamic: int = TILE_DYNAMIC, clock=time.monotonic):
+        self.rois = parse_rois(TILE_ROIS) if rois is None else list(rois)
+        self.crop = crop
+        self.every = every
+        self.dynamic = dynamic
+        self._clock = clock
+        self._calls = 0
+        self._static = {}      # (w, h) -> recortes de las regiones fijas
+        self._hints = []       # (t, cx, cy) de objetos chicos recientes
+
+    def plan(self, frame_w: int, frame_h: int) -> list:
+        self._calls += 1
+        tiles = []
+        if self.rois and (self._calls - 1) % self.every == 0:
+            key = (frame_w, frame_h)
+            if key not in self._static:
+                self._static[key] = [t for roi in self.rois for t in cover(roi, frame_w, frame_h, self.crop)]
+            tiles = list(self._static[key])
+        now = self._clock()
+        self._hints = [h for h in self._hints if now - h[0] <= HINT_TTL]
+        crop = min(self.crop, frame_w, frame_h)
+        for _t, cx, cy in self._hints[:self.dynamic]:
+            if any(x + EDGE_FRAC * crop <= cx <= x + w - EDGE_FRAC * crop and
+                   y + EDGE_FRAC * crop <= cy <= y + h - EDGE_FRAC * crop for x, y, w, h in tiles):
+                continue   # ya queda dentro de un recorte de esta pasada
+            x = int(min(max(0, cx - crop // 2), frame_w - crop))
+            y = int(min(max(0, cy - crop // 2), frame_h - crop))
+            tiles.append((x, y, crop, crop))
+        return tiles
+
+    def observe(self, boxes):
+        """Guarda el centro de las detecciones chicas (mas nuevas primero)."""
+        if not self.dynamic:
+            return
+        now = self._clock()
+        small = [(now, x + w / 2.0, y + h / 2.0) for x, y, w, h in boxes if max(w, h) <= SMALL_PX]
+        if small:
+            self._hints = (small + self._hints)[:max(4, self.dynamic)]
+
+
+def tile_rows(rows: np.ndarray, tile, frame_w: int, frame_h: int) -> np.ndarray:
+    """Filas de un recorte -> coordenadas normalizadas del frame, sin cajas cortadas por bordes internos."""
+    x, y, w, h = tile
+    if rows.size == 0:
+        return rows
+    l = rows[:, 0] - rows[:, 2] / 2; r = rows[:, 0] + rows[:, 2] / 2
+    t = rows[:, 1] - rows[:, 3] / 2; b = rows[:, 1] + rows[:, 3] / 2
+    cut = np.zeros(len(rows), bool)
+    if x > 0:
+        cut |= l <= EDGE_FRAC
+    if x + w < frame_w:
+        cut |= r >= 1 - EDGE_FRAC
+    if y > 0:
+        cut |= t <= EDGE_FRAC
+    if y + h < frame_h:
+        cut |= b >= 1 - EDGE_FRAC
+    out = rows[~cut].copy()
+    out[:, 0] = (x + out[:, 0] * w) / frame_w
+    out[:, 1] = (y + out[:, 1] * h) / frame_h
+    out[:, 2] *= w / frame_w
+    out[:, 3] *= h / frame_h
+    return out
+
+
+class TiledBackend:
+    """
+    Misma interfaz que los backends de navicap_backends (detect, setInputSize,
+    forward, prepare/infer/postprocess). setInputSize cambia la entrada del frame completo; la de los
+    recortes es fija (TILE_SIZE).
+    """
+
+    def __init__(self, inner, planner: TilePlanner | None = None,
+                 base: int = TILE_BASE, tile_size: int = TILE_SIZE):
+        self.inner = inner
+        self.name = f"{inner.name}+tiles"
+        self.planner = planner or TilePlanner()
+        self.base = (base, base)
+        self.tile = (tile_size, tile_size)
+        self.last_tiles = []
+        self.tiles_run = 0
+
+    def setInputSize(self, width: int, height: int):
+        self.base = (int(width), int(height))
+
+    def prepare(self, frame):
+        """Recortes de esta pasada y sus lotes de entrada (uno solo si base == tile)."""
+        fh, fw = frame.shape[:2]
+        tiles = self.planner.plan(fw, fh)
+        self.last_tiles = tiles
+        self.tiles_run += len(tiles)
+        crops = [frame[y:y + h, x:x + w] for x, y, w, h in tiles]
+        if self.base == self.tile:
+            blobs = [batch_blob([frame] + crops, self.tile)]
+        else:
+            blobs = [batch_blob([frame], self.base)] + ([batch_blob(crops, self.tile)] if crops else [])
+        return tiles, blobs
+
+    def infer(self, prep, frame) -> np.ndarray:
+        """Filas del frame completo + recortes, todas en coordenadas del frame."""
+        tiles, blobs = prep
+        fh, fw = frame.shape[:2]
+        outs = [rows for blob in blobs for rows in self.inner.infer_batch(blob)]
+        full, per_tile = outs[0], outs[1:]
+        parts = [full] + [tile_rows(r, t, fw, fh) for r, t in zip(per_tile, tiles)]
+        return np.concatenate(parts, axis=0)
+
+    def forward(self, frame) -> np.ndarray:
+        return self.infer(self.prepare(frame), frame)
+
+    def postprocess(self, rows: np.ndarray, frame, confThreshold, nmsThreshold: float):
+        ids, confs, boxes = postprocess(rows, frame.shape[1], frame.shape[0], confThreshold, nmsThreshold)
+        self.planner.observe(boxes.tolist())
+        return ids, confs, boxes
+
+    def detect(self, frame, confThreshold, nmsThreshold: float):
+        return self.postprocess(self.forward(frame), frame, confThreshold, nmsThreshold)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Seguimiento liviano de detecciones entre frames (modo detectar-y-seguir).
+
+YOLO corre cada N frames (o antes si la confianza del tracker cae o la escena
+cambia mucho); entremedio las cajas se predicen con velocidad constante. Los
+IDs de track dan un "obstaculo principal" estable en vez del argmax por frame.
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+from navicap_classes import OBSTACLE_GROUP
+
+DETECT_EVERY  = int(os.getenv('NAVICAP_DETECT_EVERY', '3'))     # 1 = YOLO en cada frame
+MIN_TRACK_CONF = float(os.getenv('NAVICAP_TRACK_MIN_CONF', '0.25'))
+SCENE_DIFF    = float(os.getenv('NAVICAP_SCENE_DIFF', '12.0'))  # diferencia media (0-255)
+
+
+def iou(a, b) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0.0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0.0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    __slots__ = ("tid", "cid", "box", "score", "conf", "vx", "vy", "hits", "misses", "t")
+
+    def __init__(self, tid, cid, box, score, t):
+        self.tid, self.cid = tid, cid
+        self.box = tuple(float(v) for v in box)
+        self.score = float(score)   # ultima confianza de YOLO
+        self.conf = float(score)    # confianza del track (decae al predecir)
+        self.vx = self.vy = 0.0     # px/s del centro
+        self.hits, self.misses = 1, 0
+        self.t = t
+
+    def int_box(self):
+        return tuple(int(round(v)) for v in self.box)
+
+
+class IoUTracker:
+    """
+    Asociacion por IoU (greedy, misma clase) + prediccion de velocidad constante.
+    - max_misses: pasadas de YOLO sin match antes de borrar el track
+    - decay: factor de confianza por frame predicho
+    """
+
+    def __init__(self, iou_match: float = 0.3, max_misses: int = 2, decay: float = 0.85,
+                 smooth: float = 0.6, switch_margin: float = 0.15):
+        self.iou_match = iou_match
+        self.max_misses = max_misses
+        self.decay = decay
+        self.smooth = smooth
+        self.switch_margin = switch_margin
+        self.tracks = []
+        self._next_id = 1
+        self._main_tid = None
+
+    def update(self, ids, scores, boxes, t: float):
+        """Corrige los tracks con una pasada de YOLO."""
+        dets = list(zip(ids, scores, boxes))
+        pairs = []
+        for ti, tr in enumerate(self.tracks):
+            for di, (cid, _sc, box) in enumerate(dets):
+                if int(cid) == tr.cid:
+                    v = iou(tr.box, box)
+                    if v >= self.iou_match:
+                        pairs.append((v, ti, di))
+        pairs.sort(reverse=True)
+        used_t, used_d = set(), set()
+        for _v, ti, di in pairs:
+            if ti in used_t or di in used_d:
+                continue
+            used_t.add(ti); used_d.add(di)
+            self._correct(self.tracks[ti], dets[di], t)
+        for ti, tr in enumerate(self.tracks):
+            if ti not in used_t:
+                tr.misses += 1
+        self.tracks = [tr for tr in self.tracks if tr.misses <= self.max_misses]
+        for di, (cid, sc, box) in enumerate(dets):
+            if di not in used_d:
+                self.tracks.append(Track(self._next_id, int(cid), box, sc, t))
+                self._next_id += 1
+
+    def _correct(self, tr: Track, det, t: float):
+        _cid, sc, box = det
+        dt = t - tr.t
+        x, y, w, h = (float(v) for v in box)
+        a = self.smooth
+        if dt > 0:
+            ox = tr.box[0] + tr.box[2] / 2.0; oy = tr.box[1] + tr.box[3] / 2.0
+            nx = x + w / 2.0; ny = y + h / 2.0
+            tr.vx = a * (nx - ox) / dt + (1 - a) * tr.vx
+            tr.vy = a * (ny - oy) / dt + (1 - a) * tr.vy
+        tr.box = (x, y, a * w + (1 - a) * tr.box[2], a * h + (1 - a) * tr.box[3])
+        tr.score = tr.conf = float(sc)
+        tr.hits += 1
+        tr.misses = 0
+        tr.t = t
+
+    def predict(self, t: float):
+        """Avanza los tracks a `t` sin YOLO (velocidad constante, confianza decae)."""
+        for tr in self.tracks:
+            dt = t - tr.t
+            if dt <= 0:
+                continue
+            x, y, w, h = tr.box
+            tr.box = (x + tr.vx * dt, y + tr.vy * dt, w, h)
+            tr.conf *= self.decay
+            tr.t = t
+
+    def confidence(self) -> float:
+        """Confianza minima de los tracks vivos (1.0 si no hay tracks)."""
+        return min((tr.conf for tr in self.tracks), default=1.0)
+
+    def below(self, floors) -> bool:
+        """True si algun track cayo bajo el piso de su clase (`floors` indexado por id)."""
+        return any(tr.conf < floors[tr.cid] for tr in self.tracks)
+
+    def detections(self):
+        """Tracks vivos como (ids, confs, boxes) con el mismo formato que model.detect."""
+        live = [tr for tr in self.tracks if tr.misses == 0]
+        return ([tr.cid for tr in live], [tr.conf for tr in live], [tr.int_box() for tr in live])
+
+    def live_ids(self) -> list:
+        """IDs de track en el mismo orden que detections()."""
+        return [tr.tid for tr in self.tracks if tr.misses == 0]
+
+    def main_obstacle(self, classes, priority=None):
+        """
+        Obstaculo principal estable: prioriza OBSTACLE_GROUP y luego el mayor score,
+        pero mantiene el track anterior salvo que otro lo supere por switch_margin.
+        `priority` es la tabla bool por id de clase (ClassTable.priority); si falta
+        se arma desde `classes`.
+        Devuelve (label, score, box, track_id) o (None, 0.0, (0,0,0,0), None).
+        """
+        live = [tr for tr in self.tracks if tr.misses == 0]
+        if not live:
+            self._main_tid = None
+            return None, 0.0, (0, 0, 0, 0), None
+        if priority is None:
+            priority = np.array([c in OBSTACLE_GROUP for c in classes], dtype=bool)
+
+        prio = priority[np.fromiter((tr.cid for tr in live), dtype=np.int32, count=len(live))]
+        conf = np.fromiter((tr.conf for tr in live), dtype=np.float32, count=len(live))
+        bi = int(np.lexsort((conf, prio))[-1])
+        best = live[bi]
+        ci = next((i for i, tr in enumerate(live) if tr.tid == self._main_tid), None)
+        if ci is not None and ci != bi:
+            if prio[ci] == prio[bi] and conf[bi] - conf[ci] < self.switch_margin:
+                best = live[ci]
+        self._main_tid = best.tid
+        return classes[best.cid], best.conf, best.int_box(), best.tid
+
+
+class SceneChangeDetector:
+    """Diferencia media de una miniatura en gris contra la de la ultima pasada de YOLO."""
+
+    def __init__(self, threshold: float = SCENE_DIFF, size=(32, 24)):
+        self.threshold = threshold
+        self.size = size
+        self._ref = None
+        self.last_diff = 0.0
+
+    def _thumb(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def changed(self, frame) -> bool:
+        if self._ref is None:
+            return True
+        self.last_diff = float(cv2.absdiff(self._thumb(frame), self._ref).mean())
+        return self.last_diff > self.threshold
+
+    def reset(self, frame):
+        self._ref = self._thumb(frame)
+
+
+class DetectScheduler:
+    """Decide si el frame actual necesita YOLO o basta con el tracker."""
+
+    def __init__(self, every: int = DETECT_EVERY, min_conf: float = MIN_TRACK_CONF,
+                 scene: SceneChangeDetector | None = None):
+        self.every = max(1, every)
+        self.min_conf = min_conf
+        self.class_floors = None   # piso por id de clase; None = min_conf para todas
+        self.scene = scene or SceneChangeDetector()
+        self._since = self.every  # primera pasada siempre con YOLO
+        self.full = 0
+        self.tracked = 0
+
+    def set_class_thresholds(self, thresholds, reference: float):
+        """
+        Pisos por clase proporcionales a su umbral de deteccion (`reference` es el
+        umbral general, al que le corresponde min_conf). Asi un track de una clase
+        permisiva (semaforo 0.12) no nace ya bajo el piso y fuerza YOLO en cada frame.
+        """
+        scaled = np.asarray(thresholds, dtype=np.float32) * (self.min_conf / reference)
+        self.class_floors = np.minimum(scaled, self.min_conf)
+
+    def need_detect(self, frame, tracker: IoUTracker) -> bool:
+        # La diferencia de escena se mide siempre (la usa tambien el gobernador)
+        scene_changed = self.scene.changed(frame)
+        if self.class_floors is None:
+            low = tracker.confidence() < self.min_conf
+        else:
+            low = tracker.below(self.class_floors)
+        return self._since >= self.every or low or scene_changed
+
+    def mark(self, frame, detected: bool):
+        if detected:
+            self._since = 1
+            self.scene.reset(frame)
+            self.full += 1
+        else:
+            self._since += 1
+            self.tracked += 1
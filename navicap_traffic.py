@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Color de semaforo: clasificador sobre una ROI reducida a tamaño fijo con una
+tabla de hue precalculada, y votacion temporal por track (mayoria ponderada
+con histeresis) para que el color no parpadee entre rojo y verde.
+"""
+
+import os
+from collections import deque
+
+import cv2
+import numpy as np
+
+TL_ROI_SIZE = (16, 32)                                        # ancho, alto de la ROI reducida
+TL_WINDOW   = int(os.getenv('NAVICAP_TL_WINDOW', '5'))        # observaciones por track
+TL_HOLD     = float(os.getenv('NAVICAP_TL_HOLD', '0.8'))      # s que se mantiene el color sin verlo
+TL_RECHECK  = float(os.getenv('NAVICAP_TL_RECHECK', '0.3'))   # s max reusando el color de una caja quieta
+TL_MOVE_PX  = 2                                               # px: caja "quieta"
+TL_SWITCH   = 1.5                                             # el nuevo color debe pesar 1.5x el actual
+TL_MIN_FRAC = 0.005                                           # fraccion minima de pixeles de color
+
+COLORS = ('unknown', 'red', 'green', 'amber')
+_RED, _GREEN, _AMBER = 1, 2, 3
+
+
+def _build_lut():
+    """Hue (0-179) -> codigo de color, y saturacion minima por codigo."""
+    lut = np.zeros(256, dtype=np.uint8)
+    lut[0:11] = _RED
+    lut[165:180] = _RED
+    lut[15:31] = _AMBER
+    lut[35:91] = _GREEN
+    sat_min = np.array([255, 70, 60, 70], dtype=np.uint8)
+    return lut, sat_min
+
+
+HUE_LUT, SAT_MIN = _build_lut()
+VAL_MIN = 80
+
+
+class _Scratch:
+    """Buffers reusados de classify_roi (un juego por tamaño de ROI; solo el hilo del detector)."""
+
+    def __init__(self, roi_size):
+        w, h = roi_size
+        self.small = np.empty((h, w, 3), np.uint8)
+        self.hsv = np.empty((h, w, 3), np.uint8)
+        self.codes = np.empty((h, w), np.uint8)
+        self.sat_min = np.empty((h, w), np.uint8)
+        self.lit = np.empty((h, w), bool)
+        self.bright = np.empty((h, w), bool)
+
+
+_scratch = {}
+
+
+def classify_roi(frame, box, roi_size=TL_ROI_SIZE):
+    """
+    Color de la caja (x,y,w,h) ampliada 25%: (color, confianza 0-1).
+    Una sola pasada: HSV de la ROI reducida, LUT de hue y bincount, sobre
+    buffers reusados.
+    """
+    x, y, w, h = map(int, box)
+    # Ampliar ROI 25% para capturar el foco completo
+    pad = int(max(w, h) * 0.25)
+    x0 = max(0, x - pad); y0 = max(0, y - pad)
+    x1 = min(frame.shape[1], x + w + pad)
+    y1 = min(frame.shape[0], y + h + pad)
+    roi = frame[y0:y1, x0:x1]
+    if roi.size == 0:
+        return 'unknown', 0.0
+    s = _scratch.get(roi_size)
+    if s is None:
+        s = _scratch[roi_size] = _Scratch(roi_size)
+    cv2.resize(roi, roi_size, dst=s.small, interpolation=cv2.INTER_AREA)
+    cv2.cvtColor(s.small, cv2.COLOR_BGR2HSV, dst=s.hsv)
+    codes = s.codes
+    np.take(HUE_LUT, s.hsv[..., 0], out=codes)
+    np.take(SAT_MIN, codes, out=s.sat_min)
+    np.greater_equal(s.hsv[..., 1], s.sat_min, out=s.lit)
+    np.greater_equal(s.hsv[..., 2], VAL_MIN, out=s.bright)
+    s.lit &= s.bright
+    counts = np.bincount(codes[s.lit], minlength=4)
+    counts[0] = 0
+    best = int(counts.argmax())
+    if counts[best] < TL_MIN_FRAC * codes.size or counts[best] == 0:
+        return 'unknown', 0.0
+    return COLORS[best], float(counts[best]) / float(counts.sum())
+
+
+class _TLTrack:
+    __slots__ = ("history", "color", "conf", "box", "t_obs", "t_known")
+
+    def __init__(self, window: int):
+        self.history = deque(maxlen=window)
+        self.color, self.conf = 'unknown', 0.0
+        self.box = None
+        self.t_obs = self.t_known = -1e9
+
+
+class TrafficLightState:
+    """
+    Estado del semaforo por ID de track. `update()` con la caja del mejor
+    candidato del frame; `current()` cuando no hubo candidato (mantiene el
+    ultimo color `hold` segundos).
+    """
+
+    def __init__(self, window: int = TL_WINDOW, hold: float = TL_HOLD,
+                 recheck: float = TL_RECHECK, move_px: int = TL_MOVE_PX):
+        self.window = window
+        self.hold = hold
+        self.recheck = recheck
+        self.move_px = move_px
+        self._tracks = {}
+        self._last_tid = None
+        self.computed = 0
+        self.reused = 0
+
+    def update(self, frame, box, tid, t: float):
+        """Clasifica (o reusa si la caja no se movio) y vota. Devuelve (color, confianza)."""
+        tr = self._tracks.get(tid)
+        if tr is None:
+            tr = self._tracks[tid] = _TLTrack(self.window)
+        self._last_tid = tid
+
+        box = tuple(int(v) for v in box)
+        still = tr.box is not None and max(abs(a - b) for a, b in zip(box, tr.box)) <= self.move_px
+        if still and t - tr.t_obs < self.recheck:
+            self.reused += 1
+        else:
+            color, conf = classify_roi(frame, box)
+            self.computed += 1
+            tr.box, tr.t_obs = box, t
+            tr.history.append((color, conf))
+            self._vote(tr, t)
+        self._prune(t)
+        return self.current(t)
+
+    def _vote(self, tr: _TLTrack, t: float):
+        weights = dict.fromkeys(COLORS[1:], 0.0)
+        for color, conf in tr.history:
+            if color != 'unknown':
+                weights[color] += conf
+        total = sum(weights.values())
+        if total <= 0:
+            return
+        cand = max(weights, key=weights.get)
+        cur = tr.color
+        # Histeresis: cambiar de color solo si el nuevo domina claramente
+        if cur == 'unknown' or (cand != cur and weights[cand] >= TL_SWITCH * weights[cur]):
+            cur = cand
+        tr.color, tr.conf = cur, weights[cur] / total
+        tr.t_known = t
+
+    def current(self, t: float):
+        """(color, confianza) del ultimo semaforo visto, o ('unknown', 0.0) pasado `hold`."""
+        tr = self._tracks.get(self._last_tid)
+        if tr is None or t - tr.t_known > self.hold:
+            return 'unknown', 0.0
+        return tr.color, tr.conf
+
+    def _prune(self, t: float):
+        old = [k for k, tr in self._tracks.items() if t - tr.t_obs > 2 * self.hold]
+        for k in old:
+            del self._tracks[k]
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vigilancia de archivos por eventos (inotify) para el loop GLib de ble_server.
+
+Se vigila el directorio del archivo (asi tambien se ven los reemplazos atomicos
+tmp + rename). Cada evento reinicia un pequeño debounce: el callback corre
+cuando el archivo lleva `debounce_ms` sin cambios, no en mitad de una escritura.
+Si inotify no esta disponible se vuelve a sondear con un timer.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import struct
+
+try:
+    from gi.repository import GLib
+except ImportError:  # Inotify sigue sirviendo sin GLib (p.ej. en el detector)
+    GLib = None
+
+# Constantes de <sys/inotify.h>
+IN_MODIFY      = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_NONBLOCK    = 0o4000
+IN_CLOEXEC     = 0o2000000
+
+_EVENT_HDR = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+class Inotify:
+    """Envoltura minima de inotify via ctypes (Linux). Lanza OSError si no existe."""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c')
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError("inotify no disponible")
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.fd = fd
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def read_events(self):
+        """Lista de (wd, mask, nombre) pendientes; [] si no hay nada."""
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events, off = [], 0
+        while off + _EVENT_HDR.size <= len(buf):
+            wd, mask, _cookie, ln = _EVENT_HDR.unpack_from(buf, off)
+            off += _EVENT_HDR.size
+            name = buf[off:off + ln].rstrip(b'\0').decode('utf-8', 'replace')
+            off += ln
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FileWatcher:
+    """
+    Vigila varios archivos sobre el loop GLib. `watch(path, callback)` llama
+    callback() tras cada cambio (con debounce). Sin inotify, llama callback()
+    cada `poll_seconds` (el callback ya debe comparar mtime por su cuenta).
+    """
+
+    WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self, debounce_ms: int = 50, poll_seconds: float = 0.5):
+        self.debounce_ms = debounce_ms
+        self.poll_seconds = poll_seconds
+        self._targets = {}      # (wd, nombre) -> callback
+        self._dir_wds = {}      # directorio -> wd
+        self._pending = {}      # callback -> id de timeout GLib
+        try:
+            self._ino = Inotify()
+            GLib.io_add_watch(self._ino.fd, GLib.IO_IN, self._on_io)
+        except (OSError, AttributeError) as e:
+            print(f"[WATCH] inotify no disponible ({e}), usando sondeo")
+            self._ino = None
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._ino is not None
+
+    def watch(self, path: str, callback):
+        path = os.path.abspath(path)
+        d, name = os.path.split(path)
+        if self._ino is not None:
+            try:
+                os.makedirs(d, exist_ok=True)
+                wd = self._dir_wds.get(d)
+                if wd is None:
+                    wd = self._ino.add_watch(d, self.WATCH_MASK)
+                    self._dir_wds[d] = wd
+                self._targets[(wd, name)] = callback
+                return
+            except OSError as e:
+                print(f"[WATCH] No se pudo vigilar {d} ({e}), sondeando {name}")
+        GLib.timeout_add(int(self.poll_seconds * 1000), lambda: callback() or True)
+
+    def _on_io(self, _fd, _cond):
+        for wd, _mask, name in self._ino.read_events():
+            cb = self._targets.get((wd, name))
+            if cb is not None:
+                self._schedule(cb)
+        return True
+
+    def _schedule(self, cb):
+        # Debounce: cada evento nuevo reinicia la espera
+        old = self._pending.pop(cb, None)
+        if old is not None:
+            GLib.source_remove(old)
+        self._pending[cb] = GLib.timeout_add(self.debounce_ms, self._fire, cb)
+
+    def _fire(self, cb):
+        self._pending.pop(cb, None)
+        try:
+            cb()
+        except Exception as e:
+            print(f"[WATCH] ERROR en callback: {e}")
+        return False
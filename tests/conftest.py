@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los modulos navicap_* viven en la raiz del repo (sin paquete)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
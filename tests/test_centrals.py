@@ -0,0 +1,125 @@
+import importlib
+import json
+import sys
+import types
+
+import pytest
+
+from navicap_centrals import CentralRegistry, address_from_path
+
+A = "AA:BB:CC:DD:EE:01"
+B = "AA:BB:CC:DD:EE:02"
+
+
+def test_address_from_path():
+    assert address_from_path("/org/bluez/hci0/dev_aa_bb_cc_dd_ee_01") == A
+    assert address_from_path(None) is None
+
+
+def test_min_interval_counts_centrals_without_pref_as_default():
+    reg = CentralRegistry()
+    reg.connect(A)
+    reg.connect(B)
+    assert reg.set_prefs(A, {"min_interval": 2.0})
+    # B no pidio nada: manda el default
+    assert reg.min_interval(1.0) == 1.0
+    reg.disconnect(B)
+    assert reg.min_interval(1.0) == 2.0
+    assert reg.set_prefs(A, {"min_interval": 0.01})
+    assert reg.centrals[A].prefs["min_interval"] == 0.1
+    reg.disconnect(A)
+    assert reg.min_interval(1.0) == 1.0
+
+
+def test_set_prefs_ignores_unknown_and_bad_values():
+    reg = CentralRegistry()
+    assert not reg.set_prefs(A, {"min_interval": 2.0})   # no conectado nunca
+    reg.connect(A)
+    assert not reg.set_prefs(A, {"min_interval": "x"})
+    assert reg.set_prefs(A, {"min_interval": 2.0})
+    assert not reg.set_prefs(A, {"min_interval": 2.0})
+
+
+def test_notifying_survives_disconnect_until_stop_notify():
+    reg, chr_obj, sent = CentralRegistry(), object(), []
+    reg.connect(A)
+    reg.set_notifying("obstacle", chr_obj, True)
+    reg.disconnect(A)
+    assert reg.fanout("obstacle", b"x", lambda c, v: sent.append((c, v)))
+    reg.set_notifying("obstacle", chr_obj, False)
+    assert not reg.fanout("obstacle", b"y", lambda c, v: sent.append((c, v)))
+    assert sent == [(chr_obj, b"x")]
+
+
+# ---------- ble_server con bluezero/GLib de mentira ----------
+class StubCharacteristic:
+    """Caracteristica de peripheral: guarda lo que se notifica."""
+
+    def __init__(self):
+        self.values = []
+
+    def set_value(self, value):
+        self.values.append(bytes(value))
+
+
+class StubDevice:
+    def __init__(self, address):
+        self.address = address
+
+
+@pytest.fixture
+def ble(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    timers = []
+    glib = types.SimpleNamespace(timeout_add=lambda ms, fn, *a: timers.append((ms, fn)),
+                                 MainLoop=object)
+    gi = types.ModuleType("gi")
+    gi_repo = types.ModuleType("gi.repository")
+    gi_repo.GLib = glib
+    gi.repository = gi_repo
+    bz = types.ModuleType("bluezero")
+    for name in ("adapter", "peripheral", "async_tools"):
+        setattr(bz, name, types.ModuleType("bluezero." + name))
+        monkeypatch.setitem(sys.modules, "bluezero." + name, getattr(bz, name))
+    monkeypatch.setitem(sys.modules, "bluezero", bz)
+    monkeypatch.setitem(sys.modules, "gi", gi)
+    monkeypatch.setitem(sys.modules, "gi.repository", gi_repo)
+    monkeypatch.delitem(sys.modules, "ble_server", raising=False)
+    mod = importlib.import_module("ble_server")
+    mod._test_timers = timers
+    yield mod
+    sys.modules.pop("ble_server", None)
+
+
+def _write_prefs(ble, address, interval):
+    path = "/org/bluez/hci0/dev_" + address.replace(":", "_")
+    ble._config_write_cb(json.dumps({"notify_min_interval": interval}).encode(), {"device": path})
+
+
+def test_ble_connect_pref_disconnect_updates_interval(ble):
+    default = ble.NOTIFY_MIN_INTERVAL
+    ble._on_connect(StubDevice(A))
+    ble._on_connect(StubDevice(B))
+    _write_prefs(ble, A, default + 2.0)
+    assert ble._centrals.centrals[A].writes == 1
+    assert ble._obstacle_sched.min_interval == default
+    _write_prefs(ble, B, default + 1.0)
+    assert ble._obstacle_sched.min_interval == default + 1.0
+    ble._on_disconnect("hci0", B)
+    assert ble._obstacle_sched.min_interval == default + 2.0
+    # Un central nuevo sin preferencia vuelve al default
+    ble._on_connect(StubDevice("AA:BB:CC:DD:EE:03"))
+    assert ble._obstacle_sched.min_interval == default
+
+
+def test_ble_publish_fans_out_to_subscribed_characteristics(ble):
+    ble._on_connect(StubDevice(A))
+    chr_json, chr_bin = StubCharacteristic(), StubCharacteristic()
+    ble._obstacle_notify_cb(True, chr_json)
+    ble._obstacle_bin_notify_cb(True, chr_bin)
+    ble.publish_obstacle("person", 0.5, "none", 0.9)
+    assert json.loads(chr_json.values[-1])["obstacle"] == "person"
+    assert len(chr_bin.values) == 1
+    ble._obstacle_notify_cb(False, chr_json)
+    ble.publish_obstacle("none", float("inf"), "none")
+    assert len(chr_json.values) == 1
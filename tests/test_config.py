@@ -0,0 +1,52 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from navicap_config import DetectorConfig
+from navicap_detect import Detector
+
+CLASSES = ["person", "car", "traffic_light"]
+
+
+def make_cfg(tmp_path, **values):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps(values), encoding="utf-8")
+    return DetectorConfig(CLASSES, path=str(path))
+
+
+def test_reload_reads_classes_and_window(tmp_path):
+    cfg = make_cfg(tmp_path, alerts_enabled=["car"], min_distance=1.0, max_distance=3.0)
+    assert cfg.enabled_ids == {1}
+    assert (cfg.min_distance, cfg.max_distance) == (1.0, 3.0)
+    assert not cfg.class_enabled("person")
+
+
+@pytest.mark.parametrize("distance, alert", [
+    (0.3, True),         # mas cerca que min_distance: se avisa igual
+    (1.0, True),
+    (3.0, True),
+    (3.5, False),        # mas lejos que max_distance
+    (math.inf, True),    # sin eco: distancia desconocida
+    (math.nan, True),
+])
+def test_window_only_cuts_far_obstacles(tmp_path, distance, alert):
+    cfg = make_cfg(tmp_path, min_distance=1.0, max_distance=3.0)
+    assert cfg.in_window(distance) is alert
+
+
+def test_detector_alerts_close_and_unranged_obstacles(tmp_path):
+    cfg = make_cfg(tmp_path, min_distance=1.0, max_distance=3.0)
+    sent = []
+    det = Detector(None, CLASSES, cfg, publish=lambda label, dist, *a, **kw: sent.append((label, dist)))
+    frame = np.zeros((480, 640, 3), np.uint8)
+    ids, confs = np.array([0]), np.array([0.9], np.float32)
+    boxes = np.array([[200, 100, 120, 300]], np.int32)
+    results = []
+    for i, dist in enumerate((0.4, math.inf, 5.0)):
+        ts = 10.0 + i
+        det.apply_detections(frame, ts, ids, confs, boxes)
+        results.append(det.finish(frame, ts, dist, True, 0.0)["label"])
+    assert results == ["person", "person", "none"]
+    assert sent[0] == ("person", 0.4)
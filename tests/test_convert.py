@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+cv2 = pytest.importorskip("cv2")
+
+import navicap_convert
+from navicap_backends import make_backend, parse_cfg
+from navicap_track import iou
+
+CFG = os.path.join(os.path.dirname(__file__), '..', 'yolov4-tiny-custom.cfg')
+SIZE = 160
+# Sobre el thresh=0.2 con que la capa yolo de OpenCV anula scores bajos
+CONF = 0.25
+
+
+def random_weights(cfg_path: str, path: str, seed: int = 0):
+    """.weights de Darknet con el largo exacto que pide el cfg y BN valida (var > 0)."""
+    rng = np.random.default_rng(seed)
+    sections = parse_cfg(cfg_path)
+    chunks, chans = [], []
+    c = int(sections[0].get('channels', 3))
+    for i, s in enumerate(sections[1:]):
+        t = s['type']
+        if t == 'convolutional':
+            f_, k = int(s['filters']), int(s['size'])
+            if int(s.get('batch_normalize', 0)):
+                chunks += [rng.normal(0, 0.1, f_), rng.uniform(0.5, 1.5, f_),
+                           rng.normal(0, 0.1, f_), rng.uniform(0.5, 1.5, f_)]
+            else:
+                chunks.append(rng.normal(0, 0.1, f_))
+            chunks.append(rng.normal(0, np.sqrt(2.0 / (c * k * k)), f_ * c * k * k))
+            c = f_
+        elif t == 'route':
+            idx = [int(x) for x in s['layers'].split(',')]
+            idx = [j if j >= 0 else i + j for j in idx]
+            c = sum(chans[j] for j in idx) // int(s.get('groups', 1))
+        chans.append(c)
+    with open(path, 'wb') as f:
+        f.write(np.array([0, 2, 0], np.int32).tobytes() + np.array([0], np.int64).tobytes())
+        f.write(np.concatenate(chunks).astype(np.float32).tobytes())
+
+
+@pytest.fixture(scope="module")
+def models(tmp_path_factory):
+    import onnx
+    d = tmp_path_factory.mktemp("convert")
+    wts, onnx_path = str(d / "rand.weights"), str(d / "rand.onnx")
+    random_weights(CFG, wts)
+    onnx.save(navicap_convert.darknet_to_onnx(CFG, wts), onnx_path)
+    frames = d / "frames"
+    frames.mkdir()
+    rng = np.random.default_rng(1)
+    for i in range(3):
+        img = cv2.GaussianBlur((rng.random((240, 320, 3)) * 255).astype(np.uint8), (31, 31), 0)
+        cv2.imwrite(str(frames / f"{i}.png"), img)
+    return wts, onnx_path, str(frames)
+
+
+def test_onnx_matches_opencv_darknet(models):
+    wts, onnx_path, frames = models
+    ref = make_backend('opencv', CFG, wts, SIZE)
+    test = make_backend('onnx', CFG, wts, SIZE, onnx_path=onnx_path)
+    total = 0
+    for name in sorted(os.listdir(frames)):
+        frame = cv2.imread(os.path.join(frames, name))
+        r_ids, r_conf, r_box = (np.asarray(x) for x in ref.detect(frame, CONF, 0.35))
+        t_ids, t_conf, t_box = (np.asarray(x) for x in test.detect(frame, CONF, 0.35))
+        r_box, t_box = r_box.reshape(-1, 4), t_box.reshape(-1, 4)
+        assert len(r_ids.reshape(-1)) == len(t_ids.reshape(-1))
+        for cid, conf, box in zip(r_ids.reshape(-1), r_conf.reshape(-1), r_box):
+            best = max((iou(tuple(box), tuple(tb)), abs(conf - tc))
+                       for tc_id, tc, tb in zip(t_ids.reshape(-1), t_conf.reshape(-1), t_box)
+                       if tc_id == cid)
+            assert best[0] >= 0.9 and best[1] < 1e-2
+        total += len(r_ids.reshape(-1))
+    assert total > 0
+
+
+def test_check_parity_cli_helper(models):
+    wts, onnx_path, frames = models
+    res = navicap_convert.check_parity(CFG, wts, onnx_path, frames, SIZE, conf=CONF)
+    assert res["max_row_diff"] < 1e-3
+    assert res["matched"] == res["ref_detections"]
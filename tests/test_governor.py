@@ -0,0 +1,63 @@
+import pytest
+
+from navicap_governor import Governor
+
+SIZES = (320, 416, 608)
+
+
+def make(initial=320, fwd320=0.1, overhead=0.02, **kw):
+    """Governor con latencias medidas: forward a 320 y post-proceso; el resto se escala por area."""
+    gov = Governor(SIZES, budget=0.35, initial=initial, static_interval=0.25, **kw)
+    gov.record_forward(320, fwd320)
+    gov.record("post", overhead)
+    gov.record("wait", 1.0)                         # la espera de camara no cuenta
+    return gov
+
+
+def test_estimates_scale_by_area():
+    gov = make()
+    assert gov.forward_estimate(608) == pytest.approx(0.1 * (608 / 320) ** 2)
+    assert gov.overhead() == pytest.approx(0.02)
+
+
+def test_largest_size_within_budget_after_hysteresis():
+    gov = make()
+    # 416 cabe (0.19 s), 608 no (0.38 s); sube recien a la 3ra decision igual
+    assert [gov.choose() for _ in range(4)] == [320, 320, 416, 416]
+    assert gov.switches == 1
+
+
+def test_over_budget_steps_down_at_once():
+    gov = make(initial=608)
+    gov.record_forward(608, 0.5)
+    assert gov.choose() == 416
+
+
+def test_traffic_light_near_threshold_allows_high_resolution():
+    gov = make()
+    # 608 cabe en 1.6 x presupuesto: se sube en esta misma decision
+    assert gov.choose(tl_near_threshold=True) == 608
+    # Sin el semaforo 608 ya no cabe en el presupuesto: se baja sin esperar
+    assert gov.choose() == 416
+
+
+def test_static_scene_drops_a_size_and_spaces_frames():
+    gov = make(initial=416)
+    assert [gov.choose(static=True) for _ in range(3)] == [416, 416, 320]
+    assert gov.frame_sleep(0.05) == pytest.approx(0.20)
+    gov.choose(static=False)
+    assert gov.frame_sleep(0.05) == 0.0
+
+
+def test_limit_caps_size_and_sets_minimum_interval():
+    gov = make(initial=608, switch_after=1)
+    gov.limit(max_size=416, min_interval=0.4)
+    assert gov.allowed() == (320, 416)
+    assert gov.choose(tl_near_threshold=True) == 416
+    assert gov.frame_sleep(0.1) == pytest.approx(0.3)
+    gov.limit(max_size=100)                         # techo bajo el menor: queda el menor
+    assert gov.allowed() == (320,)
+    assert gov.choose() == 320
+    gov.limit()
+    assert gov.allowed() == SIZES
+    assert gov.frame_sleep(0.1) == 0.0
@@ -0,0 +1,127 @@
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import navicap_logstats
+from navicap_logstats import LogIndex, analyze, index_path, parse_chunk, read_chunks
+
+T0 = datetime(2025, 11, 15, 10, 0, 0)
+
+
+def log_line(t, obstacle, distance, traffic="unknown", **extra):
+    """Igual que EventLog.log + push_obstacle."""
+    data = {"obstacle": obstacle, "distance": distance, "traffic": traffic,
+            "ts": (t - timedelta(milliseconds=4)).isoformat() + "Z", **extra}
+    return t.isoformat() + "Z " + json.dumps(data, ensure_ascii=False) + "\n"
+
+
+def synthetic(n, start=T0, step=0.7):
+    classes = ["person", "car", "none", 'señal "pare"', "bicycle"]
+    lines = []
+    for i in range(n):
+        t = start + timedelta(seconds=step * i)
+        extra = {"confidence": 0.5} if i % 7 == 0 else {}
+        lines.append(log_line(t, classes[i % len(classes)], round(0.3 + (i % 13) * 0.4, 2),
+                              ["unknown", "red", "green"][i % 3], **extra))
+    return lines
+
+
+def expected(lines):
+    """Cuentas con json.loads linea a linea."""
+    classes, traffic, skipped = {}, {}, 0
+    for line in lines:
+        try:
+            data = json.loads(line.split(" ", 1)[1])
+        except (ValueError, IndexError):
+            skipped += 1
+            continue
+        c = classes.setdefault(data["obstacle"], {"lines": 0, "min_m": float("inf")})
+        c["lines"] += 1
+        c["min_m"] = min(c["min_m"], data["distance"])
+        if data["traffic"] != "unknown":
+            traffic[data["traffic"]] = traffic.get(data["traffic"], 0) + 1
+    return classes, traffic, skipped
+
+
+def check(rep, lines):
+    classes, traffic, skipped = expected(lines)
+    assert rep["skipped"] == skipped
+    assert rep["lines"] == sum(c["lines"] for c in classes.values())
+    assert rep["traffic"] == dict(sorted(traffic.items()))
+    assert {k: v["lines"] for k, v in rep["classes"].items()} == {k: v["lines"] for k, v in classes.items()}
+    for name, c in classes.items():
+        if name != "none":
+            assert rep["classes"][name]["min_m"] == pytest.approx(c["min_m"])
+
+
+def test_report_matches_json_loads(tmp_path):
+    lines = synthetic(300)
+    lines.insert(50, "2025-11-15T10:00:35.000000Z no es json\n")
+    lines.insert(80, "basura sin hora\n")
+    path = tmp_path / "navicap_obstacles.log"
+    path.write_text("".join(lines), encoding="utf-8")
+    rep = analyze(str(path), use_index=False)
+    check(rep, lines)
+    assert rep["from"] == "2025-11-15T10:00:00Z"
+    assert rep["latency_ms"]["n"] == rep["lines"]
+    assert rep["latency_ms"]["p50"] == pytest.approx(4.0, rel=0.3)
+
+
+def test_line_split_across_blocks(tmp_path, monkeypatch):
+    lines = synthetic(100)
+    data = "".join(lines).encode("utf-8")
+    chunks = list(read_chunks(io.BytesIO(data), 37))
+    assert b"".join(chunks) == data
+    assert all(c.endswith(b"\n") for c in chunks)
+    # Sin '\n' final la ultima linea igual se cuenta
+    assert sum(len(parse_chunk(c)) for c in read_chunks(io.BytesIO(data[:-1]), 37)) == 100
+
+    path = tmp_path / "navicap_obstacles.log"
+    path.write_bytes(data)
+    whole = analyze(str(path), use_index=False)
+    monkeypatch.setattr(navicap_logstats, "CHUNK", 53)
+    small = analyze(str(path), use_index=False)
+    whole.pop("files"), small.pop("files")
+    assert small == whole
+
+
+def test_rotated_gz_read_before_current_log(tmp_path):
+    path = tmp_path / "navicap_obstacles.log"
+    old = synthetic(120)
+    new = synthetic(80, start=T0 + timedelta(hours=2))
+    with gzip.open(f"{path}.20251115-100000.gz", "wt", encoding="utf-8") as f:
+        f.write("".join(old))
+    path.write_text("".join(new), encoding="utf-8")
+    rep = analyze(str(path))
+    assert [f["path"].endswith(".gz") for f in rep["files"]] == [True, False]
+    check(rep, old + new)
+    assert rep["from"] == "2025-11-15T10:00:00Z"
+    assert rep["gaps"]["n"] == 1                   # las 2 h entre rotado y log actual
+
+    # Con el rango guardado en su .idx, el rotado fuera de --since ni se abre
+    since = navicap_logstats.parse_time("2025-11-15T12:00")
+    rep = analyze(str(path), since=since)
+    assert [f["state"] for f in rep["files"]] == ["skipped", "read"]
+    assert rep["lines"] == 80
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    path = tmp_path / "navicap_obstacles.log"
+    path.write_text("".join(synthetic(200)), encoding="utf-8")
+    analyze(str(path))
+    assert json.loads(open(index_path(str(path))).read())["size"] == path.stat().st_size
+
+    # Rotacion: el log vuelve a empezar con otras lineas, mas corto que el indice
+    new = synthetic(50, start=T0 + timedelta(days=1))
+    path.write_text("".join(new), encoding="utf-8")
+    since = navicap_logstats.parse_time("2025-11-16T10:00:10")
+    rep = analyze(str(path), since=since, rotated=False)
+    assert rep == dict(analyze(str(path), since=since, rotated=False, use_index=False),
+                       files=rep["files"])
+    assert rep["from"] == "2025-11-16T10:00:10Z"
+    data = LogIndex(str(path)).load()
+    assert data["size"] == path.stat().st_size
+    assert data["first"] == navicap_logstats.parse_time("2025-11-16T10:00")
@@ -0,0 +1,92 @@
+import math
+import struct
+
+import pytest
+
+from navicap_metrics import (BUCKETS, DIAG_EVERY, DIAG_FMT, Histogram, Metrics, detector_summary,
+                             pack_diag, unpack_diag)
+
+
+def test_histogram_buckets_are_upper_inclusive():
+    h = Histogram()
+    for s in (0.0005, 0.0006, 0.1, 10.0):
+        h.observe(s)
+    assert h.counts[0] == 1                          # le=0.0005 incluye el borde
+    assert h.counts[1] == 1
+    assert h.counts[BUCKETS.index(0.1)] == 1
+    assert h.counts[-1] == 1 and math.isinf(BUCKETS[-1])
+    assert (h.count, h.max) == (4, 10.0)
+    assert h.sum == pytest.approx(10.1011)
+
+
+def test_histogram_quantile_interpolates_within_bucket():
+    h = Histogram()
+    assert h.quantile(0.5) == 0.0
+    for _ in range(10):
+        h.observe(0.02)                              # bucket (0.01, 0.025]
+    # Acotado por el maximo observado, no por el borde del bucket
+    assert h.quantile(0.5) == pytest.approx(0.01 + (0.02 - 0.01) * 0.5)
+    assert h.quantile(1.0) == pytest.approx(0.02)
+
+
+def test_render_prometheus_text():
+    m = Metrics(prefix='nc')
+    m.inc("frames", 3)
+    m.observe("ipc", 0.002)
+    m.observe("ipc", 0.2)
+    m.collect("camera", lambda: {"reopens": 2, "ok": True, "name": "usb"})
+    m.collect("broken", lambda: 1 / 0)
+    lines = m.render().splitlines()
+    assert lines[0].startswith("nc_uptime_seconds ")
+    assert "nc_frames_total 3" in lines
+    assert "# TYPE nc_ipc_seconds histogram" in lines
+    assert 'nc_ipc_seconds_bucket{le="0.001"} 0' in lines
+    assert 'nc_ipc_seconds_bucket{le="0.0025"} 1' in lines       # acumulado
+    assert 'nc_ipc_seconds_bucket{le="0.2"} 2' in lines
+    assert 'nc_ipc_seconds_bucket{le="+Inf"} 2' in lines
+    assert "nc_ipc_seconds_sum 0.202000" in lines
+    assert "nc_ipc_seconds_count 2" in lines
+    assert "nc_camera_reopens 2" in lines
+    assert not any(l.startswith("nc_camera_ok") or l.startswith("nc_camera_name") for l in lines)
+    assert any(l.startswith("# colector broken:") for l in lines)
+
+
+def test_detector_summary_fps_is_per_metrics_object():
+    a, b = Metrics(), Metrics()
+    clock = {"a": 0.0, "b": 0.0}
+    a.uptime = lambda: clock["a"]
+    b.uptime = lambda: clock["b"]
+    clock["a"], a.counters["frames"] = 2.0, 20
+    clock["b"], b.counters["frames"] = 1.0, 30
+    assert detector_summary(a)["fps"] == 10.0
+    assert detector_summary(b)["fps"] == 30.0
+    clock["a"], a.counters["frames"] = 4.0, 30
+    assert detector_summary(a)["fps"] == 5.0      # desde el resumen anterior de `a`
+    assert a.last_summary == (4.0, 30)
+
+
+def test_pack_diag_is_18_bytes_and_round_trips():
+    m = Metrics()
+    for _ in range(4):
+        m.observe("frame_to_notify", 0.08)
+        m.observe("ipc", 0.0004)
+    m.inc("notify_sent", 0x10005)                  # se envia modulo 2^16
+    det = {"fps": 12.34, "detect_p50": 0.061, "detect_p99": 99.0, "capture_reopens": 300,
+           "ranging_pings": 40, "ranging_timeouts": 3}
+    raw = pack_diag(m, det, detector_age=1.0)
+    assert len(raw) == 18 == struct.calcsize(DIAG_FMT)
+    ver, flags, fps10, d50, d99, e50, e99, ipc, notifies, reopens, tmo = struct.unpack(DIAG_FMT, raw)
+    assert (ver, flags, fps10) == (1, 1, 123)
+    assert (d50, d99) == (61, 0xFFFF)              # satura en u16
+    assert e50 == 78                               # 75 + (80 - 75) * 2/4 ms dentro del bucket
+    assert ipc == 4
+    assert (notifies, reopens, tmo) == (5, 255, 8)
+    assert unpack_diag(raw)["ipc_p99_ms"] == pytest.approx(0.4)
+    assert unpack_diag(raw)["detector_alive"] is True
+
+
+def test_pack_diag_without_detector():
+    raw = pack_diag(Metrics(), None, 0.0)
+    d = unpack_diag(raw)
+    assert d["detector_alive"] is False and d["fps"] == 0.0
+    assert unpack_diag(pack_diag(Metrics(), {"fps": 5}, 3 * DIAG_EVERY + 1))["detector_alive"] is False
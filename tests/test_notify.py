@@ -0,0 +1,106 @@
+import math
+
+from navicap_notify import NotifyScheduler
+
+
+class FakeLoop:
+    """Reloj y timer manuales en lugar de GLib."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.timers = []
+
+    def clock(self):
+        return self.now
+
+    def timer(self, delay, fn):
+        self.timers.append((self.now + delay, fn))
+
+    def advance(self, dt):
+        self.now += dt
+        due = [t for t in self.timers if t[0] <= self.now]
+        self.timers = [t for t in self.timers if t[0] > self.now]
+        for _, fn in sorted(due, key=lambda t: t[0]):
+            fn()
+
+
+def make(**kw):
+    loop, sent = FakeLoop(), []
+    sched = NotifyScheduler(sent.append, loop.timer, clock=loop.clock, **kw)
+    return sched, loop, sent
+
+
+def state(obstacle, distance=2.0, traffic="none"):
+    return {"obstacle": obstacle, "distance": distance, "traffic": traffic}
+
+
+def test_new_label_confirmed_by_time_without_second_submit():
+    sched, loop, sent = make(class_confirm=0.25, min_interval=1.0)
+    sched.submit(state("none", math.inf))
+    loop.advance(2.0)
+    sched.submit(state("person", 2.0))
+    assert len(sent) == 1
+    loop.advance(0.3)
+    assert [s["obstacle"] for s in sent] == ["none", "person"]
+
+
+def test_candidate_dropped_if_no_longer_current():
+    sched, loop, sent = make(class_confirm=0.25, min_interval=1.0)
+    sched.submit(state("none", math.inf))
+    loop.advance(2.0)
+    sched.submit(state("person", 2.0))
+    loop.advance(0.1)
+    sched.submit(state("car", 2.0))
+    loop.advance(0.2)
+    assert [s["obstacle"] for s in sent] == ["none"]
+    loop.advance(0.2)
+    assert [s["obstacle"] for s in sent] == ["none", "car"]
+
+
+def test_transition_to_none_is_not_delayed():
+    sched, loop, sent = make(class_confirm=0.25, min_interval=1.0)
+    sched.submit(state("person", 2.0))
+    loop.advance(2.0)
+    sched.submit(state("none", math.inf))
+    assert [s["obstacle"] for s in sent] == ["person", "none"]
+
+
+def test_urgent_skips_confirmation():
+    sched, loop, sent = make(class_confirm=0.25)
+    sched.submit(state("none", math.inf))
+    sched.submit(state("car", 0.5))
+    assert sent[-1]["obstacle"] == "car"
+    assert sched.urgent == 1
+
+
+def test_burst_within_interval_is_coalesced():
+    sched, loop, sent = make(class_confirm=0.0, min_interval=1.0)
+    sched.submit(state("person", 3.0))
+    sched.submit(state("person", 2.0))
+    sched.submit(state("person", 1.5))
+    assert len(sent) == 1
+    loop.advance(1.0)
+    assert len(sent) == 2 and sent[-1]["distance"] == 1.5
+    assert sched.coalesced == 1
+
+
+def test_pending_dropped_when_state_returns_to_last_sent():
+    sched, loop, sent = make(class_confirm=0.0, min_interval=1.0)
+    sched.submit(state("door", 2.0))
+    loop.advance(0.1)
+    sched.submit(state("door", 1.5))     # queda pendiente
+    loop.advance(0.1)
+    sched.submit(state("door", 2.0))     # igual a lo enviado: no se envia
+    loop.advance(1.0)
+    assert [s["distance"] for s in sent] == [2.0]
+
+
+def test_pending_class_dropped_when_back_to_previous_class():
+    sched, loop, sent = make(class_confirm=0.0, min_interval=1.0)
+    sched.submit(state("door", 2.0))
+    loop.advance(0.1)
+    sched.submit(state("person", 2.0))   # pendiente por el intervalo
+    loop.advance(0.1)
+    sched.submit(state("door", 2.0))
+    loop.advance(1.0)
+    assert [s["obstacle"] for s in sent] == ["door"]
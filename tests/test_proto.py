@@ -0,0 +1,73 @@
+import math
+import os
+
+import pytest
+
+import navicap_proto as proto
+from navicap_classes import load_classes
+
+CLASSES = load_classes(os.path.join(os.path.dirname(__file__), '..', 'obj.names'))
+IDS = proto.class_index(CLASSES)
+
+
+def roundtrip(obstacle, distance=1.5, traffic="unknown", confidence=0.5, rel_ms=1234, seq=7):
+    payload = proto.encode_obstacle(obstacle, distance, traffic, confidence, rel_ms, seq, IDS)
+    assert len(payload) == proto.SIZE
+    return proto.decode_obstacle(payload, CLASSES)
+
+
+@pytest.mark.parametrize("name", sorted(IDS))
+def test_roundtrip_every_class(name):
+    assert roundtrip(name)["obstacle"] == name
+
+
+@pytest.mark.parametrize("traffic", proto.TRAFFIC_STATES)
+def test_roundtrip_every_traffic_state(traffic):
+    assert roundtrip("none", traffic=traffic)["traffic"] == traffic
+
+
+def test_special_and_unknown_labels():
+    assert roundtrip("none")["obstacle"] == "none"
+    assert roundtrip("ready")["obstacle"] == "ready"
+    assert roundtrip("dragon")["obstacle"] == "unknown"
+    assert roundtrip("person", traffic="blue")["traffic"] == "unknown"
+
+
+def test_class_id_beyond_table_decodes_as_unknown():
+    payload = proto.encode_obstacle("x", 1.0, "red", None, 0, 0, {"x": len(CLASSES)})
+    assert proto.decode_obstacle(payload, CLASSES)["obstacle"] == "unknown"
+
+
+@pytest.mark.parametrize("distance", [math.inf, -math.inf, math.nan, None, -1.0])
+def test_distance_without_reading(distance):
+    assert roundtrip("person", distance=distance)["distance"] == math.inf
+
+
+def test_distance_centimetres_and_clamp():
+    assert roundtrip("person", distance=1.234)["distance"] == pytest.approx(1.23)
+    assert roundtrip("person", distance=0.0)["distance"] == 0.0
+    assert roundtrip("person", distance=1e6)["distance"] == (proto.DIST_UNKNOWN - 1) / 100.0
+
+
+@pytest.mark.parametrize("conf, expected", [(None, None), (0.0, 0.0), (1.0, 1.0), (2.0, 1.0), (-1.0, 0.0)])
+def test_confidence(conf, expected):
+    assert roundtrip("person", confidence=conf)["confidence"] == expected
+
+
+def test_confidence_resolution():
+    assert roundtrip("person", confidence=0.37)["confidence"] == pytest.approx(0.37, abs=1 / 254)
+
+
+def test_seq_and_time_wrap():
+    assert roundtrip("person", seq=255)["seq"] == 255
+    assert roundtrip("person", seq=256)["seq"] == 0
+    assert roundtrip("person", seq=257)["seq"] == 1
+    assert roundtrip("person", rel_ms=2 ** 32 + 5)["rel_ms"] == 5
+
+
+def test_decode_rejects_bad_payloads():
+    payload = proto.encode_obstacle("person", 1.0, "red", 0.5, 0, 0, IDS)
+    with pytest.raises(ValueError):
+        proto.decode_obstacle(payload[:-1], CLASSES)
+    with pytest.raises(ValueError):
+        proto.decode_obstacle(bytes([proto.VERSION + 1]) + payload[1:], CLASSES)
@@ -0,0 +1,31 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import json, os, threading
+import navicap_detect
+import navicap_publish
+home = os.environ["HOME"]
+out = {"import_files": sorted(os.listdir(home)),
+       "import_threads": sorted(t.name for t in threading.enumerate())}
+navicap_publish.push_obstacle("person", 1.2)
+out["push_threads"] = sorted(t.name for t in threading.enumerate())
+out["push_files"] = sorted(os.listdir(os.path.join(home, "navicap")))
+print(json.dumps(out))
+"""
+
+
+def test_import_has_no_side_effects_until_first_push(tmp_path):
+    env = dict(os.environ, HOME=str(tmp_path), PYTHONPATH=ROOT)
+    res = subprocess.run([sys.executable, "-c", SCRIPT], env=env, cwd=ROOT,
+                         capture_output=True, text=True, timeout=60)
+    assert res.returncode == 0, res.stderr
+    out = json.loads(res.stdout.strip().splitlines()[-1])
+    assert out["import_files"] == []
+    assert out["import_threads"] == ["MainThread"]
+    assert "navicap-log" in out["push_threads"]
+    assert out["push_files"] == ["logs", "obstacle.json"]
@@ -0,0 +1,160 @@
+import itertools
+import math
+import sys
+import time
+import types
+
+import pytest
+
+from navicap_ranging import EDGE_MISS_LIMIT, FakeGPIOBackend, UltrasonicRanger, make_backend
+
+
+def make(distance_fn=None, **kw):
+    backend = FakeGPIOBackend(distance_fn, **kw.pop("backend_kw", {}))
+    ranger = UltrasonicRanger(backend, trig=23, echo=24, **kw)
+    backend.add_edge_callback(24, ranger._on_edge)
+    return ranger, backend
+
+
+def test_ping_measures_fake_distance():
+    ranger, _ = make(lambda: 1.0)
+    assert ranger.ping_once() == pytest.approx(1.0)
+    assert ranger.distance() == pytest.approx(1.0)
+
+
+def test_no_echo_is_a_timeout():
+    ranger, _ = make(lambda: None, timeout=0.005)
+    assert ranger.ping_once() is None
+    assert ranger.timeouts == 1
+    assert ranger.latest() == (math.inf, 0.0)
+
+
+def test_out_of_range_is_rejected():
+    ranger, _ = make(lambda: 7.0)
+    assert ranger.ping_once() is None
+    assert ranger.rejected == 1
+
+
+def test_edges_inferred_by_order_ignoring_stale_fall():
+    ranger, _ = make()
+    ranger._rise_t = ranger._fall_t = None
+    ranger._on_edge(0, 9.0)            # bajada del ping anterior (nivel conocido)
+    ranger._on_edge(None, 10.0)
+    ranger._on_edge(None, 10.004)
+    ranger._on_edge(None, 10.5)        # rebote extra: no cambia la medida
+    assert ranger._fall_t - ranger._rise_t == pytest.approx(0.004)
+
+
+def test_median_filter_rejects_outliers():
+    seq = itertools.cycle([1.0, 1.02, 0.98, 3.5, 1.01])
+    ranger, _ = make(lambda: next(seq), window=5)
+    for _ in range(5):
+        ranger.ping_once()
+    assert ranger.distance() == pytest.approx(1.0, abs=0.02)
+
+
+def test_stale_samples_expire():
+    ranger, _ = make(lambda: 1.0, max_age=0.0)
+    ranger.ping_once()
+    assert ranger.latest()[0] == math.inf
+
+
+def test_falls_back_to_polling_when_edges_never_arrive():
+    ranger, backend = make(lambda: 0.5, timeout=0.01, backend_kw={"edges": False})
+    for _ in range(EDGE_MISS_LIMIT):
+        assert ranger.ping_once() == pytest.approx(0.5, abs=0.05)
+    assert ranger.fallbacks == EDGE_MISS_LIMIT
+    assert backend.supports_edges is False
+    assert ranger.ping_once() == pytest.approx(0.5, abs=0.05)
+    assert ranger.fallbacks == EDGE_MISS_LIMIT
+
+
+def test_background_sampler_fills_window():
+    ranger, backend = make(lambda: 2.0, period=0.06)
+    ranger.start()
+    try:
+        end = time.monotonic() + 2.0
+        while backend.triggers < 3 and time.monotonic() < end:
+            time.sleep(0.05)
+    finally:
+        ranger.stop()
+    assert ranger.pings >= 3
+    assert ranger.distance() == pytest.approx(2.0)
+
+
+# ---------- RPiGPIOBackend con un RPi.GPIO de mentira ----------
+class StubGPIO(types.ModuleType):
+    """RPi.GPIO minimo: al bajar TRIG entrega dos flancos separados por `echo_s`."""
+
+    BCM, OUT, IN, LOW, BOTH = 11, 0, 1, 0, 33
+
+    def __init__(self, echo_s=0.004, edges_ok=True):
+        super().__init__("RPi.GPIO")
+        self.echo_s = echo_s
+        self.edges_ok = edges_ok
+        self.callbacks = {}
+        self.calls = []
+
+    def setmode(self, mode):
+        self.calls.append(("setmode", mode))
+
+    def setup(self, pin, mode):
+        self.calls.append(("setup", pin, mode))
+
+    def output(self, pin, value):
+        if not value and pin in self.trig_pins():
+            for cb in list(self.callbacks.values()):
+                cb(24)
+                time.sleep(self.echo_s)
+                cb(24)
+
+    def trig_pins(self):
+        return [c[1] for c in self.calls if c[0] == "setup" and c[2] == self.OUT]
+
+    def input(self, pin):
+        return 0
+
+    def add_event_detect(self, pin, edge, callback):
+        if not self.edges_ok:
+            raise RuntimeError("Failed to add edge detection")
+        assert edge == self.BOTH
+        self.callbacks[pin] = callback
+
+    def remove_event_detect(self, pin):
+        self.callbacks.pop(pin, None)
+
+    def cleanup(self):
+        self.calls.append(("cleanup",))
+
+
+@pytest.fixture
+def stub_gpio(monkeypatch):
+    def install(**kw):
+        gpio = StubGPIO(**kw)
+        pkg = types.ModuleType("RPi")
+        pkg.GPIO = gpio
+        monkeypatch.setitem(sys.modules, "RPi", pkg)
+        monkeypatch.setitem(sys.modules, "RPi.GPIO", gpio)
+        return gpio
+    return install
+
+
+def test_rpi_backend_edges_measure_echo(stub_gpio):
+    gpio = stub_gpio(echo_s=0.004)
+    backend = make_backend("rpi")
+    ranger = UltrasonicRanger(backend, trig=23, echo=24, timeout=0.05)
+    backend.setup(23, 24)
+    backend.add_edge_callback(24, ranger._on_edge)
+    assert 24 in gpio.callbacks and backend.supports_edges
+    d = ranger.ping_once()
+    # 4 ms de eco ~ 0.69 m (el sleep del stub puede alargarse un poco)
+    assert d == pytest.approx(0.004 * 343.0 / 2, abs=0.2)
+    ranger.stop()
+    assert 24 not in gpio.callbacks and ("cleanup",) in gpio.calls
+
+
+def test_rpi_backend_without_edge_detection_uses_polling(stub_gpio):
+    stub_gpio(edges_ok=False)
+    backend = make_backend("rpi")
+    backend.add_edge_callback(24, lambda level, t: None)
+    assert backend.supports_edges is False
@@ -0,0 +1,172 @@
+import importlib
+
+import pytest
+
+import navicap_thermal
+from navicap_thermal import SysfsSensors, ThermalScheduler
+
+
+class FakeSysfs:
+    """Arbol sysfs falso: temperatura, frecuencias y bits de get_throttled."""
+
+    def __init__(self, root):
+        self.root = root
+        self.set(temp_c=50.0, freq_mhz=1500, freq_max_mhz=1500, throttled=0)
+
+    def _write(self, rel, value):
+        path = self.root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"{value}\n")
+
+    def set(self, temp_c=None, freq_mhz=None, freq_max_mhz=None, throttled=None):
+        if temp_c is not None:
+            self._write(navicap_thermal.TEMP_PATH, int(round(temp_c * 1000)))
+        if freq_mhz is not None:
+            self._write(navicap_thermal.FREQ_PATH, int(freq_mhz * 1000))
+        if freq_max_mhz is not None:
+            self._write(navicap_thermal.FREQ_MAX_PATH, int(freq_max_mhz * 1000))
+        if throttled is not None:
+            self._write(navicap_thermal.THROTTLED_PATH, hex(throttled))
+
+
+class FakeGovernor:
+    def __init__(self):
+        self.sizes = [256, 320, 416]
+        self.max_size = None
+        self.min_interval = 0.0
+
+    def limit(self, max_size=None, min_interval=0.0):
+        self.max_size = max_size
+        self.min_interval = min_interval
+
+
+class FakeSched:
+    every = 1
+
+
+class FakeRanger:
+    def __init__(self):
+        self.period = 0.06
+
+    def set_period(self, period):
+        self.period = period
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def rig(tmp_path):
+    fs, clock = FakeSysfs(tmp_path), Clock()
+    gov, sched, ranger = FakeGovernor(), FakeSched(), FakeRanger()
+    thermal = ThermalScheduler(SysfsSensors(str(tmp_path)), gov, sched, ranger,
+                               ceiling=75.0, hyst=5.0, horizon=30.0, period=1.0,
+                               step_hold=15.0, cool_hold=30.0, near_m=1.5,
+                               min_alert_hz=4.0, clock=clock)
+    return fs, clock, thermal, gov, sched, ranger
+
+
+def run(fs, clock, thermal, temps, distance_m=None):
+    """Una lectura por segundo con las temperaturas dadas; devuelve los niveles."""
+    levels = []
+    for temp in temps:
+        fs.set(temp_c=temp)
+        levels.append(thermal.update(distance_m))
+        clock.now += 1.0
+    return levels
+
+
+def test_sensors_read_fake_tree(tmp_path):
+    fs = FakeSysfs(tmp_path)
+    fs.set(temp_c=61.3, freq_mhz=1200, throttled=0x50005)
+    r = SysfsSensors(str(tmp_path)).read()
+    assert r["temp_c"] == pytest.approx(61.3)
+    assert r["freq_mhz"] == 1200 and r["freq_max_mhz"] == 1500
+    assert r["throttled"] == 0x50005
+
+
+def test_make_scheduler_uses_sysfs_root_env(tmp_path, monkeypatch):
+    monkeypatch.setenv('NAVICAP_SYSFS_ROOT', str(tmp_path))
+    mod = importlib.reload(navicap_thermal)
+    try:
+        assert mod.make_scheduler(FakeGovernor()) is None     # todavia sin thermal_zone0/temp
+        FakeSysfs(tmp_path)
+        assert isinstance(mod.make_scheduler(FakeGovernor()), mod.ThermalScheduler)
+    finally:
+        monkeypatch.delenv('NAVICAP_SYSFS_ROOT')
+        importlib.reload(navicap_thermal)
+
+
+def test_rising_slope_steps_down_before_ceiling(rig):
+    fs, clock, thermal, gov, sched, ranger = rig
+    temps = [60.0 + 0.2 * i for i in range(75)]
+    levels = []
+    for temp in temps:
+        levels += run(fs, clock, thermal, [temp])
+        if levels[-1] == 1:
+            break
+    # La tendencia (0.2 °C/s * 30 s) proyecta el techo mucho antes de tocarlo
+    first_up = len(levels) - 1
+    assert temps[first_up] < thermal.ceiling - thermal.hyst
+    assert gov.max_size == 320                      # sin el tamaño mas grande
+    assert gov.min_interval == pytest.approx(0.10)
+    assert ranger.period == pytest.approx(0.10)
+    # Por tendencia solo se sube un nivel cada step_hold s
+    levels += run(fs, clock, thermal, temps[first_up + 1:])
+    second_up = levels.index(2)
+    assert second_up - first_up >= thermal.step_hold
+    assert temps[second_up] < thermal.ceiling
+    assert gov.max_size == 256
+
+
+def test_recovery_waits_for_hysteresis_and_cool_hold(rig):
+    fs, clock, thermal, gov, sched, ranger = rig
+    run(fs, clock, thermal, [76.0])
+    assert thermal.level == 1
+    # Bajo el techo pero dentro de la histeresis: no se relaja
+    assert run(fs, clock, thermal, [72.0] * 60)[-1] == 1
+    # Bajo techo - hyst: baja un nivel recien despues de cool_hold s
+    levels = run(fs, clock, thermal, [69.0] * 40)
+    down = levels.index(0)
+    assert down >= thermal.cool_hold
+    assert gov.max_size is None
+    assert sched.every == 1
+    assert ranger.period == pytest.approx(0.06)
+
+
+def test_firmware_throttling_and_undervoltage(rig):
+    fs, clock, thermal, gov, sched, ranger = rig
+    fs.set(throttled=navicap_thermal.FREQ_CAPPED)
+    levels = run(fs, clock, thermal, [65.0] * 12)
+    # Con el firmware limitando se sube cada THERMAL_HOT_HOLD s, aunque este frio
+    assert levels[0] == 1
+    assert levels[int(navicap_thermal.THERMAL_HOT_HOLD)] == 2
+    fs.set(throttled=navicap_thermal.UNDERVOLT)
+    levels = run(fs, clock, thermal, [50.0] * 200)
+    assert levels[-1] == 1                          # subvoltaje: nunca por debajo de 1
+
+
+def test_near_obstacle_keeps_minimum_pass_rate(rig):
+    fs, clock, thermal, gov, sched, ranger = rig
+    run(fs, clock, thermal, [80.0] * 20)
+    assert thermal.level == len(navicap_thermal.LEVELS) - 1
+    assert gov.min_interval == pytest.approx(0.40)
+    assert sched.every == 3
+    assert ranger.period == pytest.approx(0.25)
+
+    thermal.update(distance_m=0.8)
+    assert gov.max_size == 256                      # el tamaño sigue limitado
+    assert gov.min_interval == pytest.approx(0.25)  # 1 / THERMAL_MIN_ALERT_HZ
+    assert sched.every == 1
+    assert ranger.period == pytest.approx(navicap_thermal.NEAR_RANGE_PERIOD)
+
+    # Sin obstaculo cerca vuelve el espaciado del nivel
+    thermal.update(distance_m=3.0)
+    assert gov.min_interval == pytest.approx(0.40)
+    assert sched.every == 3
+    assert ranger.period == pytest.approx(0.25)
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from navicap_tiles import HINT_TTL, TiledBackend, TilePlanner, cover, parse_rois, tile_rows
+
+FRAME_W, FRAME_H = 640, 480
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def row(cx, cy, w, h, cls=0, conf=0.9, ncls=2):
+    out = np.zeros(5 + ncls, np.float32)
+    out[:5] = (cx, cy, w, h, conf)
+    out[5 + cls] = conf
+    return out
+
+
+class FakeInner:
+    """Red falsa: ve los objetos (x, y, w, h en px del frame) solo dentro de los recortes."""
+
+    name = "fake"
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.tiled = None
+
+    def infer_batch(self, blob):
+        tiles = self.tiled.last_tiles
+        assert blob.shape[0] == 1 + len(tiles)
+        outs = [np.zeros((0, 7), np.float32)]          # frame completo: el objeto es muy chico
+        for tx, ty, tw, th in tiles:
+            rows = [row((x + w / 2 - tx) / tw, (y + h / 2 - ty) / th, w / tw, h / th)
+                    for x, y, w, h in self.objects
+                    if x >= tx and y >= ty and x + w <= tx + tw and y + h <= ty + th]
+            outs.append(np.array(rows, np.float32).reshape(-1, 7))
+        return outs
+
+
+def test_cover_top_band_with_overlap():
+    tiles = cover(parse_rois('0,0,1,0.45')[0], FRAME_W, FRAME_H, 224)
+    # 640 px en 3 recortes de 224 que se solapan; la franja (216 px) cabe en uno de alto
+    assert tiles == [(0, 0, 224, 224), (208, 0, 224, 224), (416, 0, 224, 224)]
+    assert parse_rois('0,0,1,0.45;bad;0.5,0.5,0.4,1') == [(0, 0, 1, 0.45)]
+
+
+def test_planner_static_every_and_small_object_hints():
+    clock = Clock()
+    planner = TilePlanner(rois=[(0, 0, 1, 0.45)], crop=224, every=2, dynamic=1, clock=clock)
+    assert len(planner.plan(FRAME_W, FRAME_H)) == 3
+    assert planner.plan(FRAME_W, FRAME_H) == []            # estaticos cada 2 pasadas
+
+    planner.observe([(500, 400, 20, 30), (100, 300, 200, 150)])   # solo el chico deja pista
+    assert planner.plan(FRAME_W, FRAME_H)[-1] == (398, 256, 224, 224)
+    assert planner.plan(FRAME_W, FRAME_H) == [(398, 256, 224, 224)]
+    # Una pista que ya cae dentro de un recorte estatico no agrega otro
+    planner.observe([(300, 100, 10, 10)])
+    assert len(planner.plan(FRAME_W, FRAME_H)) == 3
+    clock.now += HINT_TTL + 0.1
+    assert planner.plan(FRAME_W, FRAME_H) == []
+
+
+def test_tile_rows_maps_to_frame_coordinates():
+    rows = np.array([row(0.5, 0.5, 0.1, 0.2)])
+    out = tile_rows(rows, (208, 0, 224, 224), FRAME_W, FRAME_H)
+    assert out[0, 0] == pytest.approx((208 + 112) / FRAME_W)
+    assert out[0, 1] == pytest.approx(112 / FRAME_H)
+    assert out[0, 2] == pytest.approx(22.4 / FRAME_W)
+    assert out[0, 3] == pytest.approx(44.8 / FRAME_H)
+    assert out[0, 4:].tolist() == pytest.approx(rows[0, 4:].tolist())
+
+
+def test_tile_rows_drops_boxes_cut_by_inner_edges_only():
+    # Caja pegada al borde izquierdo y al de arriba del recorte
+    rows = np.array([row(0.05, 0.05, 0.1, 0.1)])
+    assert len(tile_rows(rows, (208, 0, 224, 224), FRAME_W, FRAME_H)) == 0    # borde izquierdo interno
+    assert len(tile_rows(rows, (0, 0, 224, 224), FRAME_W, FRAME_H)) == 1      # bordes del frame
+    assert len(tile_rows(rows, (0, 100, 224, 224), FRAME_W, FRAME_H)) == 0    # borde de arriba interno
+    # Borde derecho/de abajo: interno salvo que el recorte llegue al final del frame
+    rows = np.array([row(0.95, 0.95, 0.1, 0.1)])
+    assert len(tile_rows(rows, (416, 256, 224, 224), FRAME_W, FRAME_H)) == 1
+    assert len(tile_rows(rows, (208, 256, 224, 224), FRAME_W, FRAME_H)) == 0
+
+
+def test_nms_across_overlapping_tiles_keeps_one_box():
+    inner = FakeInner([(212, 100, 8, 20)])                # cae en el solape de los recortes 0 y 1
+    planner = TilePlanner(rois=[(0, 0, 1, 0.45)], crop=224, every=1, dynamic=1, clock=Clock())
+    backend = TiledBackend(inner, planner, base=256, tile_size=256)
+    inner.tiled = backend
+    frame = np.zeros((FRAME_H, FRAME_W, 3), np.uint8)
+
+    tiles, _blobs = prep = backend.prepare(frame)
+    rows = backend.infer(prep, frame)
+    assert len(rows) == 2                                  # lo vieron los dos recortes
+    ids, confs, boxes = backend.postprocess(rows, frame, 0.25, 0.4)
+    assert len(boxes) == 1 and ids.tolist() == [0]
+    x, y, w, h = boxes[0].tolist()
+    assert abs(x - 212) <= 1 and abs(y - 100) <= 1 and abs(w - 8) <= 1 and abs(h - 20) <= 1
+    # El objeto chico queda como pista para las pasadas siguientes
+    assert planner._hints[0][1:] == pytest.approx((x + w / 2, y + h / 2))
@@ -0,0 +1,44 @@
+import numpy as np
+
+from navicap_track import DetectScheduler, IoUTracker
+
+GENERAL, TLIGHT = 0.35, 0.12
+THRESHOLDS = np.array([GENERAL, TLIGHT], np.float32)   # id 0 = persona, id 1 = semaforo
+FRAME = np.zeros((48, 64, 3), np.uint8)
+
+
+def run(cid, seed_conf, frames=6, every=3):
+    tracker = IoUTracker()
+    sched = DetectScheduler(every=every, min_conf=0.25)
+    sched.set_class_thresholds(THRESHOLDS, GENERAL)
+    yolo = 0
+    for i in range(frames):
+        if sched.need_detect(FRAME, tracker):
+            yolo += 1
+            tracker.update([cid], [seed_conf], [(10, 10, 20, 40)], float(i))
+            sched.mark(FRAME, True)
+        else:
+            tracker.predict(float(i))
+            sched.mark(FRAME, False)
+    return yolo
+
+
+def test_traffic_light_track_does_not_force_yolo_every_frame():
+    # Semaforo apenas sobre su umbral: se sigue con el tracker como las demas clases
+    assert run(1, 0.13) == run(0, 0.37) == 2
+
+
+def test_class_floor_scales_with_threshold():
+    sched = DetectScheduler(min_conf=0.25)
+    sched.set_class_thresholds(THRESHOLDS, GENERAL)
+    assert sched.class_floors[0] == np.float32(0.25)
+    assert sched.class_floors[1] < TLIGHT
+
+
+def test_without_class_floors_uses_global_min_conf():
+    tracker = IoUTracker()
+    tracker.update([1], [0.13], [(10, 10, 20, 40)], 0.0)
+    sched = DetectScheduler(every=3, min_conf=0.25)
+    sched.need_detect(FRAME, tracker)
+    sched.mark(FRAME, True)
+    assert sched.need_detect(FRAME, tracker)
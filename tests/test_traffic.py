@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+import navicap_traffic
+from navicap_traffic import TrafficLightState, classify_roi
+
+BOX = (40, 30, 20, 40)
+
+
+def solid(bgr, shape=(120, 160)):
+    frame = np.zeros(shape + (3,), np.uint8)
+    frame[:] = bgr
+    return frame
+
+
+@pytest.mark.parametrize("bgr, color", [
+    ((0, 0, 255), 'red'),          # hue 0
+    ((40, 30, 220), 'red'),        # hue ~177, vuelve por el otro extremo
+    ((0, 255, 0), 'green'),        # hue 60
+    ((0, 191, 255), 'amber'),      # hue ~22
+])
+def test_classify_solid_roi(bgr, color):
+    assert classify_roi(solid(bgr), BOX) == (color, 1.0)
+
+
+def test_classify_dark_or_grey_roi_is_unknown():
+    assert classify_roi(solid((20, 20, 20)), BOX) == ('unknown', 0.0)      # apagado
+    assert classify_roi(solid((200, 200, 200)), BOX) == ('unknown', 0.0)   # sin saturacion
+    assert classify_roi(solid((0, 0, 255)), (500, 500, 10, 10)) == ('unknown', 0.0)
+
+
+class Votes:
+    """classify_roi falso que devuelve los colores en orden."""
+
+    def __init__(self, monkeypatch, colors):
+        self.colors = list(colors)
+        self.calls = 0
+        monkeypatch.setattr(navicap_traffic, 'classify_roi', self)
+
+    def __call__(self, frame, box):
+        self.calls += 1
+        return self.colors.pop(0), 1.0
+
+
+def run(state, n, t0=0.0, dt=0.5, box=BOX):
+    """n observaciones separadas mas que `recheck`; devuelve los colores votados."""
+    return [state.update(None, box, 1, t0 + i * dt)[0] for i in range(n)]
+
+
+def test_vote_switches_only_past_hysteresis_margin(monkeypatch):
+    Votes(monkeypatch, ['red'] * 3 + ['green'] * 3)
+    state = TrafficLightState(window=5, hold=5.0)
+    # 3 rojos; con 2 verdes (2 < 1.5 x 3) sigue rojo, con el 3ro (3 >= 1.5 x 2) cambia
+    assert run(state, 6) == ['red'] * 5 + ['green']
+
+
+def test_noisy_votes_do_not_flip_color(monkeypatch):
+    noisy = ['red', 'red', 'green', 'red', 'green', 'unknown', 'red', 'green', 'red', 'green']
+    Votes(monkeypatch, noisy)
+    state = TrafficLightState(window=5, hold=5.0)
+    assert run(state, len(noisy)) == ['red'] * len(noisy)
+
+
+def test_still_box_reuses_color_until_recheck(monkeypatch):
+    votes = Votes(monkeypatch, ['red'] * 3)
+    state = TrafficLightState(window=5, hold=5.0, recheck=0.3, move_px=2)
+    assert state.update(None, BOX, 1, 0.0)[0] == 'red'
+    # Caja quieta (1 px) dentro de recheck: no se vuelve a clasificar
+    assert state.update(None, (41, 30, 20, 40), 1, 0.1)[0] == 'red'
+    assert (votes.calls, state.reused) == (1, 1)
+    # Caja que se movio mas de move_px, o quieta pasado recheck: se clasifica
+    state.update(None, (45, 30, 20, 40), 1, 0.2)
+    state.update(None, (45, 30, 20, 40), 1, 0.6)
+    assert (votes.calls, state.computed) == (3, 3)
+
+
+def test_color_held_without_candidate(monkeypatch):
+    Votes(monkeypatch, ['green'])
+    state = TrafficLightState(window=5, hold=0.8)
+    state.update(None, BOX, 1, 10.0)
+    assert state.current(10.5) == ('green', 1.0)
+    assert state.current(10.7) == ('green', 1.0)
+    assert state.current(10.9) == ('unknown', 0.0)